@@ -19,20 +19,29 @@ import errno
 import hashlib
 import io
 import logging
+from multiprocessing import cpu_count
 import os
 from pprint import pformat
+import random
 import re
-from six.moves.urllib.parse import quote
+from six.moves.urllib.parse import quote, urlsplit
+import threading
 import time
 import xml.etree.ElementTree as XML
 
 import jenkins
+from requests import exceptions as req_exc
+from requests.adapters import HTTPAdapter, Retry
 
 from jenkins_jobs.alphanum import AlphanumSort
 from jenkins_jobs.cache import JobCache
 from jenkins_jobs.constants import MAGIC_MANAGE_STRING
+from jenkins_jobs.parallel import AdaptiveLimit
 from jenkins_jobs.parallel import concurrent
+from jenkins_jobs.parallel import concurrent_stream
+from jenkins_jobs import profiler
 from jenkins_jobs import utils
+from jenkins_jobs.xml_config import XmlJob
 
 __all__ = ["JenkinsManager"]
 
@@ -40,6 +49,104 @@ logger = logging.getLogger(__name__)
 
 _DEFAULT_TIMEOUT = object()
 
+# Upper bound of concurrent updates in adaptive mode, unless set by --workers.
+ADAPTIVE_MAX_WORKERS = 32
+
+# Statuses of requests which failed because Jenkins, or a proxy in front of
+# it, is overloaded or restarting. Jenkins also answers 500 to invalid job
+# configuration, so it is not retried.
+_RETRY_STATUSES = frozenset([429, 502, 503, 504])
+_RETRY_MAX_DELAY = 60
+
+
+def is_retryable(exc):
+    """Return True if request failed on an error worth retrying it for."""
+    if isinstance(
+        exc,
+        (
+            req_exc.ConnectionError,
+            req_exc.ChunkedEncodingError,
+            jenkins.TimeoutException,
+        ),
+    ):
+        return True
+    response = getattr(exc, "response", None)
+    return (
+        isinstance(exc, req_exc.HTTPError)
+        and response is not None
+        and response.status_code in _RETRY_STATUSES
+    )
+
+
+def retry_delay(n_retry, backoff, exc=None):
+    """Return seconds to wait before retry number ``n_retry`` (from 0).
+
+    Delay is drawn at random up to exponentially growing bound, so workers
+    failing at once do not retry at once. A ``Retry-After`` header sent
+    with the error is respected.
+    """
+    delay = random.uniform(0, min(_RETRY_MAX_DELAY, backoff * 2**n_retry))
+    response = getattr(exc, "response", None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            pass
+        else:
+            delay = max(delay, min(_RETRY_MAX_DELAY, retry_after))
+    return delay
+
+
+class PooledJenkins(jenkins.Jenkins):
+    """Jenkins client safe to share between update worker threads.
+
+    Requests are sent through one session with a pool of keep-alive
+    connections, so each worker reuses a connection instead of opening a
+    new one for every request. Authentication and crumb are negotiated once
+    and then used for all connections; the crumb is bound to the session
+    cookie, which all connections share.
+
+    :arg int pool_size: number of connections kept open; more may be
+        opened by concurrent requests, but are closed after use. Grown
+        with :meth:`ensure_pool_size` before starting more workers.
+    """
+
+    def __init__(self, url, username=None, password=None, pool_size=10, **kwargs):
+        super(PooledJenkins, self).__init__(url, username, password, **kwargs)
+        self._negotiate_lock = threading.RLock()
+        self._retries = kwargs.get("retries", jenkins.DEFAULT_RETRIES)
+        self.pool_size = 0
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size):
+        """Keep at least ``pool_size`` connections open.
+
+        Not thread safe; call it before workers using the client start.
+        """
+        if pool_size <= self.pool_size:
+            return
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=self._retries, backoff_factor=0.1),
+        )
+        # Session has default adapters mounted for "http://" and "https://",
+        # which win over the shorter scheme prefix used by the base class.
+        self._session.mount(urlsplit(self.server).scheme + "://", adapter)
+        self.pool_size = pool_size
+
+    def _maybe_add_auth(self):
+        if self._auth_resolved:
+            return
+        with self._negotiate_lock:
+            super(PooledJenkins, self)._maybe_add_auth()
+
+    def maybe_add_crumb(self, req):
+        if self.crumb is None:
+            with self._negotiate_lock:
+                return super(PooledJenkins, self).maybe_add_crumb(req)
+        return super(PooledJenkins, self).maybe_add_crumb(req)
+
 
 class JenkinsManager(object):
     def __init__(self, jjb_config):
@@ -47,14 +154,21 @@ class JenkinsManager(object):
         user = jjb_config.jenkins["user"]
         password = jjb_config.jenkins["password"]
         timeout = jjb_config.jenkins["timeout"]
+        pool_size = jjb_config.jenkins.get("pool_size") or cpu_count()
 
         if timeout != _DEFAULT_TIMEOUT:
-            self.jenkins = jenkins.Jenkins(url, user, password, timeout)
+            self.jenkins = PooledJenkins(
+                url, user, password, pool_size=pool_size, timeout=timeout
+            )
         else:
-            self.jenkins = jenkins.Jenkins(url, user, password)
+            self.jenkins = PooledJenkins(url, user, password, pool_size=pool_size)
+        if profiler.is_profiling():
+            profiler.profile_http(self.jenkins)
 
         self.cache = JobCache(
-            jjb_config.jenkins["url"], flush=jjb_config.builder["flush_cache"]
+            jjb_config.jenkins["url"],
+            flush=jjb_config.builder["flush_cache"],
+            backend=jjb_config.builder["cache_backend"],
         )
 
         self._plugins_list = jjb_config.builder["plugins_info"]
@@ -63,6 +177,12 @@ class JenkinsManager(object):
         self._views = None
         self._view_list = None
         self._jjb_config = jjb_config
+        self._update_retries = jjb_config.jenkins.get("update_retries", 3)
+        self._retry_backoff = jjb_config.jenkins.get("update_retry_backoff", 1.0)
+        self._n_retries = 0
+        self._n_retries_lock = threading.Lock()
+        # Set for incremental updates, see jenkins_jobs.depgraph.
+        self.dependency_graph = None
 
     def _setup_output(self, output, item, config_xml=False):
         output_dir = output
@@ -128,15 +248,95 @@ class JenkinsManager(object):
         else:
             return view_name
 
-    def update_job(self, job_name, xml):
-        if self.is_job(job_name):
+    def update_job(self, job_name, xml, limiter=None):
+        def update(retry):
+            # Failed create may still have created the job.
+            if self.is_job(job_name, use_cache=not retry):
+                logger.info(
+                    "Reconfiguring jenkins job {0}".format(self._job_format(job_name))
+                )
+                self.jenkins.reconfig_job(job_name, xml)
+            else:
+                logger.info(
+                    "Creating jenkins job {0}".format(self._job_format(job_name))
+                )
+                self.jenkins.create_job(job_name, xml)
+
+        self._call_with_retries(update, "job", job_name, limiter)
+
+    def _call_with_retries(self, func, element_type, name, limiter=None):
+        """Call ``func(retry)``, retrying it on errors from overloaded server.
+
+        ``func`` must be safe to call again after a failure; ``retry`` is
+        True for calls after the first one. With ``limiter``, an
+        :class:`~jenkins_jobs.parallel.AdaptiveLimit`, each call waits for
+        a slot and reports how it went.
+        """
+        n_retry = 0
+        while True:
+            ticket = limiter.acquire() if limiter else None
+            start = time.monotonic()
+            try:
+                func(n_retry > 0)
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                if limiter:
+                    limiter.release(ticket, time.monotonic() - start, retryable)
+                if not retryable or n_retry >= self._update_retries:
+                    raise
+                delay = retry_delay(n_retry, self._retry_backoff, exc)
+                logger.warning(
+                    "Updating %s %s failed, retrying in %.1fs: %s",
+                    element_type,
+                    name,
+                    delay,
+                    exc,
+                )
+                with self._n_retries_lock:
+                    self._n_retries += 1
+                n_retry += 1
+                time.sleep(delay)
+            else:
+                if limiter:
+                    limiter.release(ticket, time.monotonic() - start)
+                return
+
+    def _size_pool(self, n_workers):
+        """Keep a connection open for each of ``n_workers`` workers."""
+        self.jenkins.ensure_pool_size(n_workers or cpu_count())
+
+    def _adaptive_limit(self, n_workers, adaptive):
+        """Return number of workers and limit of concurrent updates to use."""
+        if not adaptive:
+            return n_workers, None
+        limit = AdaptiveLimit(
+            n_workers if n_workers and n_workers > 1 else ADAPTIVE_MAX_WORKERS
+        )
+        return limit.max_limit, limit
+
+    def _report_throughput(self, element_type, n_updated, elapsed, n_retries, limit):
+        rate = n_updated / elapsed if elapsed > 0 else 0.0
+        if limit:
             logger.info(
-                "Reconfiguring jenkins job {0}".format(self._job_format(job_name))
+                "Updated %d %ss in %.1fs (%.1f per second), retried %d requests, "
+                "concurrency %d at end, %d at peak",
+                n_updated,
+                element_type,
+                elapsed,
+                rate,
+                n_retries,
+                limit.limit,
+                limit.peak_limit,
             )
-            self.jenkins.reconfig_job(job_name, xml)
         else:
-            logger.info("Creating jenkins job {0}".format(self._job_format(job_name)))
-            self.jenkins.create_job(job_name, xml)
+            logger.info(
+                "Updated %d %ss in %.1fs (%.1f per second), retried %d requests",
+                n_updated,
+                element_type,
+                elapsed,
+                rate,
+                n_retries,
+            )
 
     def is_job(self, job_name, use_cache=True):
         if use_cache:
@@ -183,6 +383,38 @@ class JenkinsManager(object):
             self._job_list = None
         return self.jobs
 
+    def get_jobs_info(self, folder_depth_per_request=10):
+        """Return list of all jobs, including ones inside folders.
+
+        Each job is a dict with 'fullname' and, if reported by Jenkins,
+        'description' keys. Jobs are fetched using the ``tree`` query
+        parameter, with one request per ``folder_depth_per_request`` levels
+        of folders, instead of requesting each job separately.
+        """
+        query = "jobs"
+        for _ in range(folder_depth_per_request):
+            query = "jobs[name,description,{0}]".format(query)
+        query = "?tree=" + query
+
+        jobs_info = []
+        levels = [([], self.jenkins.get_info(query=query)["jobs"])]
+        for path, level_jobs in levels:
+            for job in level_jobs:
+                job_path = path + [job["name"]]
+                info = {"fullname": "/".join(job_path)}
+                if "description" in job:
+                    info["description"] = job["description"]
+                jobs_info.append(info)
+                children = job.get("jobs")
+                if not isinstance(children, list):
+                    continue
+                # Deeper than requested levels, Jenkins returns empty objects.
+                if any("name" not in child for child in children):
+                    url_path = "".join("/job/" + name for name in job_path)
+                    children = self.jenkins.get_info(url_path, query=query)["jobs"]
+                levels.append((job_path, children))
+        return jobs_info
+
     def is_managed_job(self, job_name):
         xml = self.jenkins.get_job_config(job_name)
         try:
@@ -193,36 +425,62 @@ class JenkinsManager(object):
             pass
         return False
 
+    @concurrent
+    def parallel_is_managed_job(self, job_name):
+        return self.is_managed_job(job_name)
+
     @property
     def plugins_list(self):
         if self._plugins_list is None:
             self._plugins_list = self.get_plugins_info()
         return self._plugins_list
 
-    def delete_old_managed_jobs(self, keep=None):
-        jobs = self.get_jobs()
-        deleted_jobs = 0
-        if keep is None:
-            keep = []
+    def delete_old_managed_jobs(self, keep=None, n_workers=None):
+        keep = set(keep or [])
+        jobs = []
+        for job in self.get_jobs_info():
+            if job["fullname"] in keep:
+                logger.debug("Keeping job %s", job["fullname"])
+            else:
+                jobs.append(job)
+
+        # Fetch configs of jobs Jenkins did not report description for.
+        unknown_jobs = [job for job in jobs if "description" not in job]
+        managed = {}
+        if unknown_jobs:
+            p_params = [{"job_name": job["fullname"]} for job in unknown_jobs]
+            self._size_pool(n_workers)
+            results = self.parallel_is_managed_job(
+                n_workers=n_workers, concurrent=p_params
+            )
+            if len(p_params) == 1:
+                results = [results]
+            for job, result in zip(unknown_jobs, results):
+                if isinstance(result, Exception):
+                    raise result
+                managed[job["fullname"]] = result
+
+        deleted_jobs = set()
         for job in jobs:
-            # python-jenkins stores the folder and name as 'fullname'
+            job_name = job["fullname"]
             # Check if the job was deleted when his parent folder was deleted
-            if job["fullname"] not in keep and self.is_job(
-                job["fullname"], use_cache=False
-            ):
-                if self.is_managed_job(job["fullname"]):
-                    logger.info(
-                        "Removing obsolete jenkins job {0}".format(job["fullname"])
-                    )
-                    self.delete_job(job["fullname"])
-                    deleted_jobs += 1
-                else:
-                    logger.debug(
-                        "Not deleting unmanaged jenkins job %s", job["fullname"]
-                    )
+            parts = job_name.split("/")
+            if any("/".join(parts[:i]) in deleted_jobs for i in range(1, len(parts))):
+                continue
+            if job_name in managed:
+                is_managed = managed[job_name]
             else:
-                logger.debug("Keeping job %s", job["fullname"])
-        return deleted_jobs
+                description = job["description"]
+                is_managed = bool(description) and description.endswith(
+                    MAGIC_MANAGE_STRING
+                )
+            if is_managed:
+                logger.info("Removing obsolete jenkins job {0}".format(job_name))
+                self.jenkins.delete_job(job_name)
+                deleted_jobs.add(job_name)
+            else:
+                logger.debug("Not deleting unmanaged jenkins job %s", job_name)
+        return len(deleted_jobs)
 
     def delete_jobs(self, jobs):
         if jobs is not None:
@@ -260,6 +518,63 @@ class JenkinsManager(object):
             logger.debug("'{0}' does not currently exist".format(job.name))
         return exists
 
+    def sync_cache_from_server(self, xml_items, n_workers=None, element_type="job"):
+        """Add items whose configuration on server is up to date to cache.
+
+        Configuration of every item missing from cache, or cached with
+        another md5, is fetched from Jenkins. If it is the same as generated
+        one, its md5 is stored in cache, so the item is not updated again.
+        Used to avoid updating everything when cache is lost or flushed.
+
+        :arg str element_type: "job" or "view"
+        :returns: number of items added to cache
+        """
+        items = [
+            item for item in xml_items if self.cache.has_changed(item.name, item.md5())
+        ]
+        if not items:
+            return 0
+        logger.info(
+            "Fetching %d %ss missing from cache from server", len(items), element_type
+        )
+        p_params = [{"item": item, "element_type": element_type} for item in items]
+        self._size_pool(n_workers)
+        results = self.parallel_server_md5(n_workers=n_workers, concurrent=p_params)
+        if len(p_params) == 1:
+            results = [results]
+        n_synced = 0
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                raise result
+            md5 = item.md5()
+            if result == md5:
+                self.cache.set(item.name, md5)
+                n_synced += 1
+        self.cache.save()
+        logger.info("Number of %ss up to date on server: %d", element_type, n_synced)
+        return n_synced
+
+    def server_md5(self, item, element_type="job"):
+        """Return md5 of item configuration on server, or None if missing."""
+        if element_type == "job":
+            get_config = self.jenkins.get_job_config
+        else:
+            get_config = self.jenkins.get_view_config
+        try:
+            xml_str = get_config(item.name)
+        except jenkins.JenkinsException as e:
+            logger.debug("Failed to fetch %s %s: %s", element_type, item.name, e)
+            return None
+        try:
+            return XmlJob.from_server_xml(xml_str, item.name).md5()
+        except XML.ParseError as e:
+            logger.debug("Failed to parse %s %s: %s", element_type, item.name, e)
+            return None
+
+    @concurrent
+    def parallel_server_md5(self, item, element_type):
+        return self.server_md5(item, element_type)
+
     def update_jobs(
         self,
         xml_jobs,
@@ -267,6 +582,7 @@ class JenkinsManager(object):
         n_workers=None,
         existing_only=None,
         config_xml=False,
+        adaptive=False,
     ):
         orig = time.time()
 
@@ -323,18 +639,31 @@ class JenkinsManager(object):
             logging.debug("Filtered for existing jobs in %ss", (time.time() - step))
 
         if not jobs:
+            self._update_dependency_graph("job", xml_jobs)
             return [], 0
 
         # Update the jobs
         logging.debug("Updating jobs")
         step = time.time()
         p_params = [{"job": job} for job in jobs]
-        results = self.parallel_update_job(n_workers=n_workers, concurrent=p_params)
+        n_workers, limit = self._adaptive_limit(n_workers, adaptive)
+        self._size_pool(n_workers)
+        n_retries = self._n_retries
+        results = self.parallel_update_job(
+            n_workers=n_workers, concurrent=p_params, limiter=limit
+        )
         logging.debug("Parsing results")
         # generalize the result parsing, as a concurrent job always returns a
         # list
         if len(p_params) in (1, 0):
             results = [results]
+        self._report_throughput(
+            "job",
+            len([r for r in results if not isinstance(r, Exception)]),
+            time.time() - step,
+            self._n_retries - n_retries,
+            limit,
+        )
         for result in results:
             if isinstance(result, Exception):
                 raise result
@@ -344,13 +673,104 @@ class JenkinsManager(object):
                 self.cache.set(j_name, j_md5)
         # write cache to disk
         self.cache.save()
-        logging.debug("Updated %d jobs in %ss", len(jobs), time.time() - step)
+        self._update_dependency_graph("job", xml_jobs)
         logging.debug("Total run took %ss", (time.time() - orig))
         return jobs, len(jobs)
 
+    def _update_dependency_graph(self, element_type, xml_items):
+        if self.dependency_graph is None:
+            return
+        self.dependency_graph.update(element_type, xml_items)
+        self.dependency_graph.save()
+
+    def update_jobs_stream(
+        self,
+        xml_jobs,
+        n_workers=None,
+        existing_only=None,
+        window=None,
+        sync_cache=False,
+        adaptive=False,
+    ):
+        """Update jobs as they are generated.
+
+        Unlike ``update_jobs``, ``xml_jobs`` may be a lazy iterable: each job
+        is checked, uploaded and dropped while following ones are still being
+        generated, with at most ``window`` jobs in flight. Jobs are not
+        sorted. With ``sync_cache``, jobs missing from cache are compared
+        with server configuration first, see ``sync_cache_from_server``.
+
+        :returns: names of all generated jobs and number of updated jobs
+        """
+        return self._update_stream(
+            "job",
+            xml_jobs,
+            self.update_job,
+            n_workers,
+            existing_only,
+            window,
+            sync_cache,
+            adaptive,
+        )
+
+    def _update_stream(
+        self,
+        element_type,
+        xml_items,
+        update_func,
+        n_workers,
+        existing_only,
+        window,
+        sync_cache,
+        adaptive=False,
+    ):
+        orig = time.time()
+        names = []
+        n_workers, limit = self._adaptive_limit(n_workers, adaptive)
+        self._size_pool(n_workers)
+        n_retries = self._n_retries
+
+        def items_to_update():
+            for item in xml_items:
+                names.append(item.name)
+                if not self.changed(item):
+                    continue
+                if existing_only and not self.exists(item):
+                    continue
+                yield item
+
+        def update(item):
+            md5 = item.md5()
+            if sync_cache and self.server_md5(item, element_type) == md5:
+                return md5, False
+            update_func(item.name, item.output().decode("utf-8"), limiter=limit)
+            return md5, True
+
+        n_updated = 0
+        try:
+            for item, (md5, updated) in concurrent_stream(
+                update, items_to_update(), n_workers, window
+            ):
+                self.cache.set(item.name, md5)
+                if updated:
+                    n_updated += 1
+        finally:
+            # write cache to disk, keeping items updated before a failure
+            self.cache.save()
+        logger.info("Number of %ss generated:  %d", element_type, len(names))
+        self._report_throughput(
+            element_type,
+            n_updated,
+            time.time() - orig,
+            self._n_retries - n_retries,
+            limit,
+        )
+        logging.debug("Total run took %ss", (time.time() - orig))
+        return names, n_updated
+
     @concurrent
-    def parallel_update_job(self, job):
-        self.update_job(job.name, job.output().decode("utf-8"))
+    def parallel_update_job(self, job, limiter=None):
+        self.update_job(job.name, job.output().decode("utf-8"), limiter=limiter)
         return (job.name, job.md5())
 
     ################
@@ -437,17 +857,23 @@ class JenkinsManager(object):
         # Need to clear the JJB cache after deletion
         self.cache.clear()
 
-    def update_view(self, view_name, xml):
-        if self.is_view(view_name):
-            logger.info(
-                "Reconfiguring jenkins view {0}".format(self._view_format(view_name))
-            )
-            self.jenkins.reconfig_view(view_name, xml)
-        else:
-            logger.info(
-                "Creating jenkins view {0}".format(self._view_format(view_name))
-            )
-            self.jenkins.create_view(view_name, xml)
+    def update_view(self, view_name, xml, limiter=None):
+        def update(retry):
+            # Failed create may still have created the view.
+            if self.is_view(view_name, use_cache=not retry):
+                logger.info(
+                    "Reconfiguring jenkins view {0}".format(
+                        self._view_format(view_name)
+                    )
+                )
+                self.jenkins.reconfig_view(view_name, xml)
+            else:
+                logger.info(
+                    "Creating jenkins view {0}".format(self._view_format(view_name))
+                )
+                self.jenkins.create_view(view_name, xml)
+
+        self._call_with_retries(update, "view", view_name, limiter)
 
     def update_views(
         self,
@@ -456,6 +882,7 @@ class JenkinsManager(object):
         n_workers=None,
         existing_only=None,
         config_xml=False,
+        adaptive=False,
     ):
         orig = time.time()
 
@@ -504,18 +931,31 @@ class JenkinsManager(object):
             logging.debug("Filtered for existing views in %ss", (time.time() - step))
 
         if not views:
+            self._update_dependency_graph("view", xml_views)
             return [], 0
 
         # Update the views
         logging.debug("Updating views")
         step = time.time()
         p_params = [{"view": view} for view in views]
-        results = self.parallel_update_view(n_workers=n_workers, concurrent=p_params)
+        n_workers, limit = self._adaptive_limit(n_workers, adaptive)
+        self._size_pool(n_workers)
+        n_retries = self._n_retries
+        results = self.parallel_update_view(
+            n_workers=n_workers, concurrent=p_params, limiter=limit
+        )
         logging.debug("Parsing results")
         # generalize the result parsing, as a concurrent view always returns a
         # list
         if len(p_params) in (1, 0):
             results = [results]
+        self._report_throughput(
+            "view",
+            len([r for r in results if not isinstance(r, Exception)]),
+            time.time() - step,
+            self._n_retries - n_retries,
+            limit,
+        )
         for result in results:
             if isinstance(result, Exception):
                 raise result
@@ -525,11 +965,32 @@ class JenkinsManager(object):
                 self.cache.set(v_name, v_md5)
         # write cache to disk
         self.cache.save()
-        logging.debug("Updated %d views in %ss", len(views), time.time() - step)
+        self._update_dependency_graph("view", xml_views)
         logging.debug("Total run took %ss", (time.time() - orig))
         return views, len(views)
 
+    def update_views_stream(
+        self,
+        xml_views,
+        n_workers=None,
+        existing_only=None,
+        window=None,
+        sync_cache=False,
+        adaptive=False,
+    ):
+        """Update views as they are generated, see ``update_jobs_stream``."""
+        return self._update_stream(
+            "view",
+            xml_views,
+            self.update_view,
+            n_workers,
+            existing_only,
+            window,
+            sync_cache,
+            adaptive,
+        )
+
     @concurrent
-    def parallel_update_view(self, view):
-        self.update_view(view.name, view.output().decode("utf-8"))
+    def parallel_update_view(self, view, limiter=None):
+        self.update_view(view.name, view.output().decode("utf-8"), limiter=limiter)
         return (view.name, view.md5())
@@ -16,10 +16,13 @@
 # Manage jobs in Jenkins server
 
 import errno
+import hashlib
 import io
 import logging
 import os
+import pickle
 import re
+import sqlite3
 import tempfile
 
 import fasteners
@@ -30,23 +33,142 @@ from jenkins_jobs import errors
 logger = logging.getLogger(__name__)
 
 
+class YamlCacheStorage(object):
+    """Keep cache in a YAML file, rewritten on each save."""
+
+    suffix = ".yml"
+
+    # see JobCache for why module references are kept
+    _os = os
+    _tempfile = tempfile
+    _yaml = yaml
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def load(self):
+        if not os.path.isfile(self.filename):
+            return {}
+        with io.open(self.filename, "r", encoding="utf-8") as yfile:
+            return yaml.safe_load(yfile)
+
+    def save(self, data, changed, cleared):
+        # write to tempfile under same directory and then replace to avoid
+        # issues around corruption such the process be killed
+        tfile = self._tempfile.NamedTemporaryFile(
+            dir=self._os.path.dirname(self.filename), delete=False
+        )
+        tfile.write(self._yaml.dump(data).encode("utf-8"))
+        # force contents to be synced on disk before overwriting cachefile
+        tfile.flush()
+        self._os.fsync(tfile.fileno())
+        tfile.close()
+        try:
+            self._os.rename(tfile.name, self.filename)
+        except OSError:
+            # On Windows, if dst already exists, OSError will be raised even if
+            # it is a file. Remove the file first in that case and try again.
+            self._os.remove(self.filename)
+            self._os.rename(tfile.name, self.filename)
+
+    def close(self):
+        pass
+
+
+class SqliteCacheStorage(object):
+    """Keep cache in a sqlite database, updating only changed entries.
+
+    On first use, entries are imported from the YAML cache file for the same
+    Jenkins, if there is one.
+    """
+
+    suffix = ".sqlite"
+
+    def __init__(self, filename, yaml_filename=None):
+        self.filename = filename
+        self._yaml_filename = yaml_filename
+        self._conn = None
+
+    def _connect(self):
+        is_new = not os.path.isfile(self.filename)
+        self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs"
+                " (name TEXT PRIMARY KEY NOT NULL, md5 TEXT NOT NULL)"
+            )
+        return is_new
+
+    def load(self):
+        if self._connect() and self._yaml_filename:
+            self._migrate()
+        return dict(self._conn.execute("SELECT name, md5 FROM jobs"))
+
+    def _migrate(self):
+        data = YamlCacheStorage(self._yaml_filename).load()
+        if not data:
+            return
+        logger.info(
+            "Importing %d entries from '%s' into '%s'",
+            len(data),
+            self._yaml_filename,
+            self.filename,
+        )
+        self.save(data, data, cleared=False)
+
+    def save(self, data, changed, cleared):
+        if self._conn is None:
+            self._connect()
+        with self._conn:
+            if cleared:
+                self._conn.execute("DELETE FROM jobs")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO jobs (name, md5) VALUES (?, ?)",
+                ((name, data[name]) for name in changed if name in data),
+            )
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+cache_storages = {
+    "yaml": YamlCacheStorage,
+    "sqlite": SqliteCacheStorage,
+}
+
+
 class JobCache(object):
     # ensure each instance of the class has a reference to the required
     # modules so that they are available to be used when the destructor
     # is being called since python will not guarantee that it won't have
     # removed global module references during teardown.
     _logger = logger
-    _os = os
-    _tempfile = tempfile
-    _yaml = yaml
 
-    def __init__(self, jenkins_url, flush=False):
+    def __init__(self, jenkins_url, flush=False, backend="yaml"):
         cache_dir = self.get_cache_dir()
         # One cache per remote Jenkins URL:
         host_vary = re.sub(r"[^A-Za-z0-9\-\~]", "_", jenkins_url)
-        self.cachefilename = os.path.join(
-            cache_dir, "cache-host-jobs-" + host_vary + ".yml"
+        try:
+            storage_class = cache_storages[backend]
+        except KeyError:
+            raise errors.JenkinsJobsException(
+                "Unknown cache backend '%s', known are: %s"
+                % (backend, ", ".join(cache_storages))
+            )
+        filename = os.path.join(
+            cache_dir, "cache-host-jobs-" + host_vary + storage_class.suffix
         )
+        if storage_class is YamlCacheStorage:
+            self._storage = YamlCacheStorage(filename)
+        else:
+            # Entries of an existing YAML cache are imported on first use.
+            yaml_filename = os.path.join(
+                cache_dir, "cache-host-jobs-" + host_vary + YamlCacheStorage.suffix
+            )
+            self._storage = storage_class(filename, yaml_filename)
+        self.cachefilename = self._storage.filename
 
         # generate named lockfile if none exists, and lock it
         self._locked = self._lock()
@@ -55,24 +177,15 @@ class JobCache(object):
                 "Unable to lock cache for '%s'" % jenkins_url
             )
 
-        if flush or not os.path.isfile(self.cachefilename):
+        # Entries set since last save, and if cache was cleared since then.
+        self._changed = set()
+        self._cleared = flush
+        if flush:
             self.data = {}
         else:
-            with io.open(self.cachefilename, "r", encoding="utf-8") as yfile:
-                self.data = yaml.safe_load(yfile)
+            self.data = self._storage.load()
         logger.debug("Using cache: '{0}'".format(self.cachefilename))
 
-    def _lock(self):
-        self._fastener = fasteners.InterProcessLock("%s.lock" % self.cachefilename)
-
-        return self._fastener.acquire(delay=1, max_delay=2, timeout=60)
-
-    def _unlock(self):
-        if getattr(self, "_locked", False):
-            if getattr(self, "_fastener", None) is not None:
-                self._fastener.release()
-            self._locked = None
-
     @staticmethod
     def get_cache_dir():
         home = os.path.expanduser("~")
@@ -93,11 +206,25 @@ class JobCache(object):
                     raise
         return path
 
+    def _lock(self):
+        self._fastener = fasteners.InterProcessLock("%s.lock" % self.cachefilename)
+
+        return self._fastener.acquire(delay=1, max_delay=2, timeout=60)
+
+    def _unlock(self):
+        if getattr(self, "_locked", False):
+            if getattr(self, "_fastener", None) is not None:
+                self._fastener.release()
+            self._locked = None
+
     def set(self, job, md5):
         self.data[job] = md5
+        self._changed.add(job)
 
     def clear(self):
         self.data.clear()
+        self._changed.clear()
+        self._cleared = True
 
     def is_cached(self, job):
         if job in self.data:
@@ -111,24 +238,11 @@ class JobCache(object):
 
     def save(self):
         # use self references to required modules in case called via __del__
-        # write to tempfile under same directory and then replace to avoid
-        # issues around corruption such the process be killed
-        tfile = self._tempfile.NamedTemporaryFile(
-            dir=self.get_cache_dir(), delete=False
-        )
-        tfile.write(self._yaml.dump(self.data).encode("utf-8"))
-        # force contents to be synced on disk before overwriting cachefile
-        tfile.flush()
-        self._os.fsync(tfile.fileno())
-        tfile.close()
-        try:
-            self._os.rename(tfile.name, self.cachefilename)
-        except OSError:
-            # On Windows, if dst already exists, OSError will be raised even if
-            # it is a file. Remove the file first in that case and try again.
-            self._os.remove(self.cachefilename)
-            self._os.rename(tfile.name, self.cachefilename)
-
+        if not self._changed and not self._cleared:
+            return
+        self._storage.save(self.data, self._changed, self._cleared)
+        self._changed = set()
+        self._cleared = False
         self._logger.debug("Cache written out to '%s'" % self.cachefilename)
 
     def __del__(self):
@@ -142,4 +256,114 @@ class JobCache(object):
                     "Failed to write to cache file '%s' on "
                     "exit: %s" % (self.cachefilename, e)
                 )
+        if getattr(self, "_storage", None) is not None:
+            self._storage.close()
         self._unlock()
+
+
+class ParseCache(object):
+    """On-disk cache of parsed YAML files.
+
+    Each source file gets its own entry, holding the digest of the text it
+    was parsed from and the resulting tree of LocDict/LocList objects,
+    including their source positions. An entry is used only while the file
+    contents are unchanged, so it is invalidated per file.
+
+    Yaml objects (``!include:``, ``!j2:`` etc) keep a reference to the loader
+    which constructed them. Loaders are not stored; they are replaced by a
+    persistent reference and rebound to a loader for the same file on load.
+    """
+
+    # Bump when layout of stored trees changes.
+    format_version = 2
+
+    _loader_ref = "loader"
+
+    def __init__(self, jjb_config, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(JobCache.get_cache_dir(), "parsed")
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError as ose:
+                if ose.errno != errno.EEXIST:
+                    raise
+        self.cache_dir = cache_dir
+        # Settings captured by yaml objects when they are constructed.
+        self._config_key = repr(
+            (
+                self.format_version,
+                jjb_config.yamlparser["include_path"],
+                jjb_config.yamlparser["filter_modules"],
+                jjb_config.yamlparser["allow_empty_variables"],
+            )
+        )
+
+    def _entry_path(self, source_path):
+        key = "{0}\0{1}".format(self._config_key, os.path.abspath(source_path))
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name + ".pickle")
+
+    @staticmethod
+    def _text_digest(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, source_path, text, loader):
+        """Return cached tree for file, or None if it is missing or stale.
+
+        :arg source_path: path of the parsed file
+        :arg str text: current contents of the file
+        :arg loader: loader for the file, bound to restored yaml objects
+        """
+        entry_path = self._entry_path(source_path)
+        try:
+            with io.open(entry_path, "rb") as f:
+                unpickler = pickle.Unpickler(f)
+                unpickler.persistent_load = lambda ref: loader
+                if unpickler.load() != self._text_digest(text):
+                    return None
+                data = unpickler.load()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug("Ignoring broken parse cache entry %r: %s", entry_path, e)
+            return None
+        logger.debug("Using parse cache entry for %r", str(source_path))
+        return data
+
+    def put(self, source_path, text, data, loader_type):
+        """Store parsed tree for a file.
+
+        :arg source_path: path of the parsed file
+        :arg str text: contents the tree was parsed from
+        :arg data: parsed tree
+        :arg type loader_type: class of loaders referenced from the tree
+        """
+        loader_ref = self._loader_ref
+
+        def persistent_id(obj):
+            if isinstance(obj, loader_type):
+                return loader_ref
+            return None
+
+        buf = io.BytesIO()
+        pickler = pickle.Pickler(buf, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = persistent_id
+        try:
+            pickler.dump(self._text_digest(text))
+            pickler.dump(data)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.debug("Not caching parsed %r: %s", str(source_path), e)
+            return
+        entry_path = self._entry_path(source_path)
+        tfile = tempfile.NamedTemporaryFile(dir=self.cache_dir, delete=False)
+        try:
+            tfile.write(buf.getvalue())
+            tfile.close()
+            os.replace(tfile.name, entry_path)
+        except OSError as e:
+            logger.debug("Failed to write parse cache entry %r: %s", entry_path, e)
+            try:
+                os.remove(tfile.name)
+            except OSError:
+                pass
@@ -17,14 +17,16 @@ import io
 import os
 import logging
 import platform
+import sys
 from pathlib import Path
 
-from stevedore import extension
 import yaml
 
 from jenkins_jobs.errors import JenkinsJobsException
-from jenkins_jobs.cli.parser import create_parser
+from jenkins_jobs.cli.parser import SUBCOMMAND_GROUP, create_parser
+from jenkins_jobs import entry_points
 from jenkins_jobs.config import JJBConfig
+from jenkins_jobs import profiler
 from jenkins_jobs import utils
 from jenkins_jobs import version
 
@@ -57,7 +59,7 @@ class JenkinsJobs(object):
     def __init__(self, args=None, **kwargs):
         if args is None:
             args = []
-        self.parser = create_parser()
+        self.parser = create_parser(args)
         self.options = self.parser.parse_args(args)
 
         self.jjb_config = JJBConfig(
@@ -149,13 +151,26 @@ class JenkinsJobs(object):
                 self.options.path = [Path(p) for p in paths]
 
     def execute(self):
-
-        extension_manager = extension.ExtensionManager(
-            namespace="jjb.cli.subcommands", invoke_on_load=True
+        # Only the selected subcommand is imported.
+        ep = next(
+            entry_points.iter_entry_points(
+                group=SUBCOMMAND_GROUP, name=self.options.command
+            )
         )
-
-        ext = extension_manager[self.options.command]
-        ext.obj.execute(self.options, self.jjb_config)
+        subcommand = ep.load()()
+        profile_path = getattr(self.options, "profile", None)
+        if not profile_path:
+            subcommand.execute(self.options, self.jjb_config)
+            return
+        with profiler.profiling() as profile:
+            try:
+                subcommand.execute(self.options, self.jjb_config)
+            finally:
+                profile.stop()
+                profile.write(profile_path)
+                logger.info("Profile report written to '%s'", profile_path)
+                for line in profile.summary():
+                    print(line, file=sys.stderr)
 
 
 def main():
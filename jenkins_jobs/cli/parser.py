@@ -17,8 +17,9 @@ import argparse
 import os
 
 import jenkins_jobs.version
+from jenkins_jobs import entry_points
 
-from stevedore import extension
+SUBCOMMAND_GROUP = "jjb.cli.subcommands"
 
 
 def __version__():
@@ -28,9 +29,16 @@ def __version__():
     )
 
 
-def create_parser():
-    """Create an ArgumentParser object usable by JenkinsJobs."""
-    parser = argparse.ArgumentParser()
+class _PreParseError(Exception):
+    pass
+
+
+class _PreParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise _PreParseError(message)
+
+
+def _add_global_options(parser):
     parser.add_argument(
         "--conf",
         dest="conf",
@@ -59,13 +67,6 @@ def create_parser():
         default=None,
         help="flush all the cache entries before updating",
     )
-    parser.add_argument(
-        "--version",
-        dest="version",
-        action="version",
-        version=__version__(),
-        help="show version",
-    )
     parser.add_argument(
         "--allow-empty-variables",
         action="store_true",
@@ -98,17 +99,51 @@ def create_parser():
         " [JJB_PASSWORD]",
     )
 
-    subparser = parser.add_subparsers(
-        dest="command", help="update, test, list or delete job"
-    )
 
-    extension_manager = extension.ExtensionManager(
-        namespace="jjb.cli.subcommands", invoke_on_load=True
+def _selected_command(args):
+    """Return name of command given in args, or None if it is not known yet."""
+    parser = _PreParser(add_help=False)
+    _add_global_options(parser)
+    parser.add_argument("command", nargs="?")
+    parser.add_argument("command_args", nargs=argparse.REMAINDER)
+    try:
+        options, _ = parser.parse_known_args(args)
+    except _PreParseError:
+        return None
+    return options.command
+
+
+def create_parser(args=None):
+    """Create an ArgumentParser object usable by JenkinsJobs.
+
+    If args are given, only the subcommand selected by them is imported and
+    gets its arguments; other subcommands are added by name only. Without
+    args, or when no subcommand is selected, all of them are loaded.
+    """
+    parser = argparse.ArgumentParser()
+    _add_global_options(parser)
+    parser.add_argument(
+        "--version",
+        dest="version",
+        action="version",
+        version=__version__(),
+        help="show version",
     )
 
-    def parse_subcommand_args(ext, subparser):
-        ext.obj.parse_args(subparser)
+    subparser = parser.add_subparsers(
+        dest="command", help="update, test, list or delete job"
+    )
 
-    extension_manager.map(parse_subcommand_args, subparser)
+    selected = None
+    subcommands = list(entry_points.iter_entry_points(group=SUBCOMMAND_GROUP))
+    if args is not None:
+        selected = _selected_command(args)
+        if selected not in [ep.name for ep in subcommands]:
+            selected = None
+    for ep in subcommands:
+        if selected is None or ep.name == selected:
+            ep.load()().parse_args(subparser)
+        else:
+            subparser.add_parser(ep.name)
 
     return parser
@@ -17,8 +17,11 @@ import abc
 import fnmatch
 import logging
 import time
+from functools import partial
 
 from jenkins_jobs.builder import JenkinsManager
+from jenkins_jobs.depgraph import DependencyGraph
+from jenkins_jobs.profiler import measure
 from jenkins_jobs.registry import ModuleRegistry
 from jenkins_jobs.roots import Roots
 from jenkins_jobs.xml_config import XmlJobGenerator
@@ -46,9 +49,23 @@ def filter_matching(item_list, glob_list):
     return [item for item in item_list if matches(item.name, glob_list)]
 
 
+def name_filter(glob_list):
+    """
+    Returns a predicate for ``Roots.generate_jobs`` and similar methods,
+    accepting names matching any of the glob patterns, or None if
+    ``glob_list`` is empty, so all names are accepted.
+
+    :arg iterable glob_list: glob patterns to match (list, tuple, set, etc.)
+    """
+    if not glob_list:
+        return None
+    return partial(matches, glob_list=glob_list)
+
+
 class BaseSubCommand(metaclass=abc.ABCMeta):
     """Base class for Jenkins Job Builder subcommands, intended to allow
-    subcommands to be loaded as stevedore extensions by third party users.
+    subcommands to be loaded from 'jjb.cli.subcommands' entry points by third
+    party users. A subcommand is imported only when it is selected.
     """
 
     def __init__(self):
@@ -98,6 +115,30 @@ class BaseSubCommand(metaclass=abc.ABCMeta):
             "uses standard globbing.",
         )
 
+    @staticmethod
+    def parse_option_render_workers(parser):
+        """Add '--render-workers' argument to given parser."""
+        parser.add_argument(
+            "--render-workers",
+            type=int,
+            default=1,
+            dest="render_workers",
+            help="number of processes to generate XML with, 0 for one per "
+            "CPU and 1 to generate in main process.",
+        )
+
+    @staticmethod
+    def parse_option_profile(parser):
+        """Add '--profile' argument to given parser."""
+        parser.add_argument(
+            "--profile",
+            dest="profile",
+            default=None,
+            metavar="REPORT",
+            help="measure time spent in each stage, write JSON report to "
+            "given file and print a summary of hotspots to stderr.",
+        )
+
 
 class JobsSubCommand(BaseSubCommand):
     """Base class for Jenkins Job Builder subcommands which generates jobs."""
@@ -107,29 +148,96 @@ class JobsSubCommand(BaseSubCommand):
         load_files(jjb_config, roots, path_list)
         return roots
 
-    def make_jobs_and_views_xml(self, jjb_config, path_list, glob_list):
+    def make_jobs_and_views_xml(
+        self, jjb_config, path_list, glob_list, incremental=False, render_workers=1
+    ):
         logger.info("Updating jobs in {0} ({1})".format(path_list, glob_list))
         orig = time.time()
 
-        roots = self.load_roots(jjb_config, path_list)
+        with measure("stage", "load"):
+            roots = self.load_roots(jjb_config, path_list)
 
         builder = JenkinsManager(jjb_config)
 
         registry = ModuleRegistry(jjb_config, builder.plugins_list)
         registry.set_macros(roots.macros)
 
-        jobs = filter_matching(roots.generate_jobs(), glob_list)
-        views = filter_matching(roots.generate_views(), glob_list)
+        with measure("stage", "expand"):
+            if incremental and not jjb_config.builder["ignore_cache"]:
+                jobs, views = self._generate_incremental(jjb_config, roots, builder)
+            else:
+                # Items with other names are not expanded.
+                jobs = roots.generate_jobs(name_filter=name_filter(glob_list))
+                views = roots.generate_views(name_filter=name_filter(glob_list))
+            jobs = filter_matching(jobs, glob_list)
+            views = filter_matching(views, glob_list)
 
-        registry.amend_job_dicts(jobs)
+        with measure("stage", "amend_job_dicts"):
+            registry.amend_job_dicts(jobs)
 
         xml_job_generator = XmlJobGenerator(registry)
         xml_view_generator = XmlViewGenerator(registry)
 
-        xml_jobs = xml_job_generator.generateXML(jobs)
-        xml_views = xml_view_generator.generateXML(views)
+        with measure("stage", "generate_xml"):
+            xml_jobs = xml_job_generator.generateXML(jobs, render_workers)
+            xml_views = xml_view_generator.generateXML(views, render_workers)
 
         step = time.time()
         logging.debug("%d XML files generated in %ss", len(jobs), str(step - orig))
 
         return builder, xml_jobs, xml_views
+
+    def iter_jobs_and_views_xml(self, jjb_config, path_list, glob_list):
+        """Same as ``make_jobs_and_views_xml``, but jobs and views are
+        expanded and rendered lazily, one by one, as returned iterators are
+        consumed.
+        """
+        logger.info("Streaming jobs in {0} ({1})".format(path_list, glob_list))
+
+        with measure("stage", "load"):
+            roots = self.load_roots(jjb_config, path_list)
+
+        builder = JenkinsManager(jjb_config)
+
+        registry = ModuleRegistry(jjb_config, builder.plugins_list)
+        registry.set_macros(roots.macros)
+
+        def iter_jobs():
+            for job in roots.iter_jobs(name_filter(glob_list)):
+                registry.amend_job_dicts([job])
+                yield job
+
+        def iter_views():
+            yield from roots.iter_views(name_filter(glob_list))
+
+        xml_jobs = XmlJobGenerator(registry).iterXML(iter_jobs())
+        xml_views = XmlViewGenerator(registry).iterXML(iter_views())
+
+        return builder, xml_jobs, xml_views
+
+    def _generate_incremental(self, jjb_config, roots, builder):
+        fingerprint = DependencyGraph.make_fingerprint(
+            jjb_config, builder.plugins_list, roots.load_inputs, roots
+        )
+        graph = DependencyGraph(
+            jjb_config.jenkins["url"], roots, builder.cache, fingerprint
+        )
+        jobs = roots.generate_jobs(graph.generate_unit)
+        views = roots.generate_views(graph.generate_unit)
+        if graph.has_skipped_duplicates("job", jobs) or graph.has_skipped_duplicates(
+            "view", views
+        ):
+            # Duplicate can not be resolved without skipped items.
+            logger.warning(
+                "Generated items duplicate unchanged ones, regenerating everything"
+            )
+            graph.reset()
+            jobs = roots.generate_jobs(graph.generate_unit)
+            views = roots.generate_views(graph.generate_unit)
+        builder.dependency_graph = graph
+        logger.info(
+            "Skipped %d unchanged jobs and %d unchanged views",
+            len(graph.skipped_names("job")),
+            len(graph.skipped_names("view")),
+        )
+        return jobs, views
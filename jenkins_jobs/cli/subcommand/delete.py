@@ -59,8 +59,9 @@ class DeleteSubCommand(base.JobsSubCommand):
 
         if options.path:
             roots = self.load_roots(jjb_config, options.path)
-            jobs = base.filter_matching(roots.generate_jobs(), options.name)
-            views = base.filter_matching(roots.generate_views(), options.name)
+            name_filter = base.name_filter(options.name)
+            jobs = roots.generate_jobs(name_filter=name_filter)
+            views = roots.generate_views(name_filter=name_filter)
             job_names = [j.name for j in jobs]
             view_names = [v.name for v in views]
         else:
@@ -48,7 +48,7 @@ class ListSubCommand(base.JobsSubCommand):
     def get_jobs(self, jjb_config, path_list, glob_list):
         if path_list:
             roots = self.load_roots(jjb_config, path_list)
-            jobs = base.filter_matching(roots.generate_jobs(), glob_list)
+            jobs = roots.generate_jobs(name_filter=base.name_filter(glob_list))
             job_names = [j.name for j in jobs]
         else:
             jenkins = JenkinsManager(jjb_config)
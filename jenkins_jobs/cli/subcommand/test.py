@@ -17,6 +17,8 @@ import logging
 import sys
 
 import jenkins_jobs.cli.subcommand.update as update
+from jenkins_jobs.errors import JenkinsJobsException
+from jenkins_jobs.profiler import measure
 
 
 logger = logging.getLogger(__name__)
@@ -45,6 +47,8 @@ class TestSubCommand(update.UpdateSubCommand):
             default=None,
             help="path to plugin info YAML file",
         )
+        self.parse_option_render_workers(test)
+        self.parse_option_profile(test)
         test.add_argument(
             "-o", dest="output_dir", default=sys.stdout, help="path to output XML"
         )
@@ -61,19 +65,28 @@ class TestSubCommand(update.UpdateSubCommand):
                 " `--config-xml` parameter."
             )
 
+        if options.render_workers < 0:
+            raise JenkinsJobsException(
+                "Number of render workers must be equal or greater than 0"
+            )
+
         builder, xml_jobs, xml_views = self.make_jobs_and_views_xml(
-            jjb_config, options.path, options.names
+            jjb_config,
+            options.path,
+            options.names,
+            render_workers=options.render_workers,
         )
 
-        builder.update_jobs(
-            xml_jobs,
-            output=options.output_dir,
-            n_workers=1,
-            config_xml=options.config_xml,
-        )
-        builder.update_views(
-            xml_views,
-            output=options.output_dir,
-            n_workers=1,
-            config_xml=options.config_xml,
-        )
+        with measure("stage", "write_output"):
+            builder.update_jobs(
+                xml_jobs,
+                output=options.output_dir,
+                n_workers=1,
+                config_xml=options.config_xml,
+            )
+            builder.update_views(
+                xml_views,
+                output=options.output_dir,
+                n_workers=1,
+                config_xml=options.config_xml,
+            )
@@ -16,13 +16,20 @@
 import logging
 import sys
 
+from jenkins_jobs.builder import ADAPTIVE_MAX_WORKERS
 from jenkins_jobs.errors import JenkinsJobsException
+from jenkins_jobs.profiler import measure
 import jenkins_jobs.cli.subcommand.base as base
 
 
 logger = logging.getLogger(__name__)
 
 
+def is_enabled(xml_job):
+    el = xml_job.xml.find("./disabled")
+    return el is None or el.text != "true"
+
+
 class UpdateSubCommand(base.JobsSubCommand):
     def parse_arg_path(self, parser):
         parser.add_argument(
@@ -67,6 +74,42 @@ class UpdateSubCommand(base.JobsSubCommand):
             help="number of workers to use, 0 for autodetection and 1 "
             "for just one worker.",
         )
+        update.add_argument(
+            "--adaptive",
+            action="store_true",
+            default=False,
+            dest="adaptive",
+            help="adapt number of concurrent updates to server latency and "
+            "errors, up to --workers if more than 1, else up to "
+            "{0}".format(ADAPTIVE_MAX_WORKERS),
+        )
+        self.parse_option_render_workers(update)
+        self.parse_option_profile(update)
+        update.add_argument(
+            "--incremental",
+            action="store_true",
+            default=False,
+            dest="incremental",
+            help="regenerate only jobs and views whose sources changed "
+            "since the previous incremental update",
+        )
+        update.add_argument(
+            "--stream",
+            action="store_true",
+            default=False,
+            dest="stream",
+            help="generate, render and upload jobs one by one, keeping "
+            "only those in flight in memory",
+        )
+        update.add_argument(
+            "--sync-cache-from-server",
+            action="store_true",
+            default=False,
+            dest="sync_cache",
+            help="before updating, fetch configuration of jobs and views "
+            "missing from cache from server, and add ones which are up to "
+            "date to cache",
+        )
         update.add_argument(
             "--existing-only",
             action="store_true",
@@ -106,20 +149,38 @@ class UpdateSubCommand(base.JobsSubCommand):
             raise JenkinsJobsException(
                 "Number of workers must be equal or greater than 0"
             )
+        if options.render_workers < 0:
+            raise JenkinsJobsException(
+                "Number of render workers must be equal or greater than 0"
+            )
+
+        if options.stream:
+            if options.incremental:
+                raise JenkinsJobsException(
+                    "--stream can not be combined with --incremental"
+                )
+            if options.render_workers != 1:
+                raise JenkinsJobsException(
+                    "--stream can not be combined with --render-workers"
+                )
+            if jjb_config.yamlparser["allow_duplicates"]:
+                raise JenkinsJobsException(
+                    "--stream can not be combined with allow_duplicates"
+                )
+            self.execute_stream(options, jjb_config)
+            return
 
         builder, xml_jobs, xml_views = self.make_jobs_and_views_xml(
-            jjb_config, options.path, options.names
+            jjb_config,
+            options.path,
+            options.names,
+            options.incremental,
+            options.render_workers,
         )
 
         if options.enabled_only:
             # filter out jobs which are disabled
-            xml_jobs_filtered = []
-            for xml_job in xml_jobs:
-                el = xml_job.xml.find("./disabled")
-                if el is not None:
-                    if el.text == "true":
-                        continue
-                xml_jobs_filtered.append(xml_job)
+            xml_jobs_filtered = [job for job in xml_jobs if is_enabled(job)]
 
             logging.info(
                 "Will only deploy enabled jobs "
@@ -129,27 +190,92 @@ class UpdateSubCommand(base.JobsSubCommand):
             )
             xml_jobs = xml_jobs_filtered
 
+        if options.sync_cache:
+            with measure("stage", "sync_cache_from_server"):
+                if options.update in {"jobs", "all"}:
+                    builder.sync_cache_from_server(
+                        xml_jobs, n_workers=options.n_workers, element_type="job"
+                    )
+                if options.update in {"views", "all"}:
+                    builder.sync_cache_from_server(
+                        xml_views, n_workers=options.n_workers, element_type="view"
+                    )
+
         if options.update in {"jobs", "all"}:
-            jobs, num_updated_jobs = builder.update_jobs(
-                xml_jobs,
-                n_workers=options.n_workers,
-                existing_only=options.existing_only,
-            )
+            with measure("stage", "update_jobs"):
+                jobs, num_updated_jobs = builder.update_jobs(
+                    xml_jobs,
+                    n_workers=options.n_workers,
+                    existing_only=options.existing_only,
+                    adaptive=options.adaptive,
+                )
             logger.info("Number of jobs updated: %d", num_updated_jobs)
         if options.update in {"views", "all"}:
-            views, num_updated_views = builder.update_views(
-                xml_views,
-                n_workers=options.n_workers,
-                existing_only=options.existing_only,
+            with measure("stage", "update_views"):
+                views, num_updated_views = builder.update_views(
+                    xml_views,
+                    n_workers=options.n_workers,
+                    existing_only=options.existing_only,
+                    adaptive=options.adaptive,
+                )
+            logger.info("Number of views updated: %d", num_updated_views)
+
+        if options.delete_old:
+            with measure("stage", "delete_old"):
+                self._delete_old(options, builder, xml_jobs, xml_views)
+
+    def _delete_old(self, options, builder, xml_jobs, xml_views):
+        if options.update in {"jobs", "all"}:
+            keep_jobs = [job.name for job in xml_jobs]
+            if builder.dependency_graph:
+                keep_jobs += builder.dependency_graph.skipped_names("job")
+            n = builder.delete_old_managed_jobs(
+                keep=keep_jobs, n_workers=options.n_workers
             )
+            logger.info("Number of jobs deleted: %d", n)
+        if options.update in {"views", "all"}:
+            keep_views = [view.name for view in xml_views]
+            if builder.dependency_graph:
+                keep_views += builder.dependency_graph.skipped_names("view")
+            n = builder.delete_old_managed_views(keep=keep_views)
+            logger.info("Number of views deleted: %d", n)
+
+    def execute_stream(self, options, jjb_config):
+        builder, xml_jobs, xml_views = self.iter_jobs_and_views_xml(
+            jjb_config, options.path, options.names
+        )
+
+        if options.enabled_only:
+            xml_jobs = (job for job in xml_jobs if is_enabled(job))
+
+        if options.update in {"jobs", "all"}:
+            with measure("stage", "update_jobs"):
+                job_names, num_updated_jobs = builder.update_jobs_stream(
+                    xml_jobs,
+                    n_workers=options.n_workers,
+                    existing_only=options.existing_only,
+                    adaptive=options.adaptive,
+                    sync_cache=options.sync_cache,
+                )
+            logger.info("Number of jobs updated: %d", num_updated_jobs)
+        if options.update in {"views", "all"}:
+            with measure("stage", "update_views"):
+                view_names, num_updated_views = builder.update_views_stream(
+                    xml_views,
+                    n_workers=options.n_workers,
+                    existing_only=options.existing_only,
+                    adaptive=options.adaptive,
+                    sync_cache=options.sync_cache,
+                )
             logger.info("Number of views updated: %d", num_updated_views)
 
         if options.delete_old:
-            if options.update in {"jobs", "all"}:
-                keep_jobs = [job.name for job in xml_jobs]
-                n = builder.delete_old_managed_jobs(keep=keep_jobs)
-                logger.info("Number of jobs deleted: %d", n)
-            if options.update in {"views", "all"}:
-                keep_views = [view.name for view in xml_views]
-                n = builder.delete_old_managed_views(keep=keep_views)
-                logger.info("Number of views deleted: %d", n)
+            with measure("stage", "delete_old"):
+                if options.update in {"jobs", "all"}:
+                    n = builder.delete_old_managed_jobs(
+                        keep=job_names, n_workers=options.n_workers
+                    )
+                    logger.info("Number of jobs deleted: %d", n)
+                if options.update in {"views", "all"}:
+                    n = builder.delete_old_managed_views(keep=view_names)
+                    logger.info("Number of views deleted: %d", n)
@@ -40,6 +40,8 @@ exclude=.*
 allow_duplicates=False
 allow_empty_variables=False
 retain_anchors=False
+parse_cache=False
+parse_workers=1
 filter_modules=
 
 # other named sections could be used in addition to the implicit [jenkins]
@@ -227,6 +229,18 @@ class JJBConfig(object):
             flush_cache = config.getboolean("job_builder", "flush_cache")
         self.builder["flush_cache"] = flush_cache
 
+        # check the cache_backend setting
+        cache_backend = "yaml"
+        if config.has_option("job_builder", "cache_backend"):
+            cache_backend = config.get("job_builder", "cache_backend")
+        if cache_backend not in ("yaml", "sqlite"):
+            raise JenkinsJobsException(
+                "cache_backend must be 'yaml' or 'sqlite', got {0!r}".format(
+                    cache_backend
+                )
+            )
+        self.builder["cache_backend"] = cache_backend
+
         # check the print_job_urls setting
         if config.has_option("job_builder", "print_job_urls"):
             self.print_job_urls = config.getboolean("job_builder", "print_job_urls")
@@ -268,6 +282,45 @@ class JJBConfig(object):
             timeout = builder._DEFAULT_TIMEOUT
         self.jenkins["timeout"] = timeout
 
+        # Connections kept open to Jenkins, shared by update workers.
+        # 0 -- one per CPU, as default number of workers.
+        try:
+            pool_size = config.getint(self._section, "pool_size")
+        except ValueError:
+            raise JenkinsJobsException("Jenkins pool_size config is invalid")
+        except (TypeError, configparser.NoOptionError):
+            pool_size = 0
+        if pool_size < 0:
+            raise JenkinsJobsException(
+                "Jenkins pool_size must be equal or greater than 0"
+            )
+        self.jenkins["pool_size"] = pool_size
+
+        # Retries of job and view updates failed on overloaded server, and
+        # base of their random exponential delay, in seconds.
+        try:
+            update_retries = config.getint(self._section, "update_retries")
+        except ValueError:
+            raise JenkinsJobsException("Jenkins update_retries config is invalid")
+        except (TypeError, configparser.NoOptionError):
+            update_retries = 3
+        if update_retries < 0:
+            raise JenkinsJobsException(
+                "Jenkins update_retries must be equal or greater than 0"
+            )
+        self.jenkins["update_retries"] = update_retries
+        try:
+            retry_backoff = config.getfloat(self._section, "update_retry_backoff")
+        except ValueError:
+            raise JenkinsJobsException("Jenkins update_retry_backoff config is invalid")
+        except (TypeError, configparser.NoOptionError):
+            retry_backoff = 1.0
+        if retry_backoff < 0:
+            raise JenkinsJobsException(
+                "Jenkins update_retry_backoff must be equal or greater than 0"
+            )
+        self.jenkins["update_retry_backoff"] = retry_backoff
+
         plugins_info = None
         if config.has_option(
             self._section, "query_plugins_info"
@@ -334,6 +387,20 @@ class JJBConfig(object):
             retain_anchors = config.getboolean("job_builder", "retain_anchors")
         self.yamlparser["retain_anchors"] = retain_anchors
 
+        # keep parsed yaml files in an on-disk cache between runs?
+        parse_cache = False
+        if config and config.has_option("job_builder", "parse_cache"):
+            parse_cache = config.getboolean("job_builder", "parse_cache")
+        self.yamlparser["parse_cache"] = parse_cache
+
+        # number of processes to parse yaml files with
+        parse_workers = 1
+        if config and config.has_option("job_builder", "parse_workers"):
+            parse_workers = config.getint("job_builder", "parse_workers")
+        if parse_workers < 0:
+            raise JenkinsJobsException("parse_workers must be equal or greater than 0")
+        self.yamlparser["parse_workers"] = parse_workers
+
         update = None
         if (
             config
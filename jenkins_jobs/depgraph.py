@@ -0,0 +1,307 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Track inputs of generated jobs and views to regenerate only changed ones.
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from contextlib import contextmanager
+
+from jenkins_jobs.cache import JobCache
+from jenkins_jobs import version
+
+__all__ = ["DependencyGraph", "is_recording", "record_input", "recording_inputs"]
+
+logger = logging.getLogger(__name__)
+
+_recorders = []  # Stack of active input sets.
+
+
+@contextmanager
+def recording_inputs():
+    """Collect inputs recorded by ``record_input`` calls inside the block.
+
+    Recording may be nested; an input is added to all active sets.
+    """
+    inputs = set()
+    _recorders.append(inputs)
+    try:
+        yield inputs
+    finally:
+        _recorders.pop()
+
+
+def is_recording():
+    return bool(_recorders)
+
+
+def record_input(kind, name):
+    """Record an input used while generating a job or view.
+
+    :arg str kind: input kind: "file", "defaults", "job-spec", "view-spec"
+      or "<component type> macro"
+    :arg str name: file path, or name of defaults, spec or macro
+    """
+    if name is None:
+        return
+    for inputs in _recorders:
+        inputs.add((kind, str(name)))
+
+
+def _pos_path(element):
+    pos = getattr(element, "pos", None)
+    if pos is None:
+        return ""
+    return str(pos.path)
+
+
+class InputResolver(object):
+    """Compute current value of inputs from loaded roots and files.
+
+    Value of an input is None if it can not be verified; such inputs are
+    always considered changed.
+    """
+
+    def __init__(self, roots):
+        self._roots = roots
+        self._file_digests = {}
+
+    def value(self, kind, name):
+        if kind == "file":
+            return self._file_digest(name)
+        if kind == "defaults":
+            return _pos_path(self._roots.defaults.get(name))
+        if kind == "job-spec":
+            return self._spec_value(
+                name,
+                [
+                    ("job", self._roots.jobs),
+                    ("job-template", self._roots.job_templates),
+                    ("job-group", self._roots.job_groups),
+                ],
+            )
+        if kind == "view-spec":
+            return self._spec_value(
+                name,
+                [
+                    ("view", self._roots.views),
+                    ("view-template", self._roots.view_templates),
+                    ("view-group", self._roots.view_groups),
+                ],
+            )
+        if kind.endswith(" macro"):
+            macro_type = kind[: -len(" macro")]
+            return _pos_path(self._roots.macros.get(macro_type, {}).get(name))
+        return None
+
+    @staticmethod
+    def _spec_value(name, kind_dict_list):
+        for kind, element_dict in kind_dict_list:
+            try:
+                element = element_dict[name]
+            except KeyError:
+                continue
+            return "{0} {1}".format(kind, _pos_path(element))
+        return ""
+
+    def _file_digest(self, path):
+        try:
+            return self._file_digests[path]
+        except KeyError:
+            pass
+        try:
+            with io.open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except (OSError, ValueError):
+            digest = None
+        self._file_digests[path] = digest
+        return digest
+
+    def values(self, inputs):
+        """Return dict of input key -> value, or None if any is unverifiable."""
+        result = {}
+        for kind, name in inputs:
+            value = self.value(kind, name)
+            if value is None:
+                return None
+            result["{0}:{1}".format(kind, name)] = value
+        return result
+
+    def is_unchanged(self, recorded_values):
+        for key, recorded in recorded_values.items():
+            kind, name = key.split(":", 1)
+            if self.value(kind, name) != recorded:
+                return False
+        return True
+
+
+class DependencyGraph(object):
+    """Persisted mapping of generation units to their inputs and outputs.
+
+    A unit is a top-level job, view or project, whose items are generated
+    together. For each unit the graph holds inputs it was generated from -
+    source files, included files, defaults, templates and macros it used -
+    and md5 of each job or view it produced. A unit whose inputs are
+    unchanged, and whose outputs are still in the job cache, is skipped by
+    the next run: it is neither expanded nor rendered.
+    """
+
+    format_version = 1
+
+    def __init__(self, jenkins_url, roots, cache, fingerprint):
+        host_vary = re.sub(r"[^A-Za-z0-9\-\~]", "_", jenkins_url)
+        self.filename = os.path.join(
+            JobCache.get_cache_dir(), "depgraph-host-" + host_vary + ".json"
+        )
+        self._resolver = InputResolver(roots)
+        self._cache = cache
+        self._fingerprint = fingerprint
+        self._units = {}
+        self._generated = {}  # unit id -> (element type, inputs, item names).
+        self._skipped = {}  # element type -> unit id -> item name list.
+        if fingerprint is None:
+            logger.info("Top-level includes can not be tracked, generating everything")
+            return
+        try:
+            with io.open(self.filename, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring broken dependency graph %r: %s", self.filename, e)
+            return
+        if data.get("fingerprint") == self._fingerprint:
+            self._units = data.get("units", {})
+        else:
+            logger.info("Configuration or plugins changed, regenerating everything")
+
+    @classmethod
+    def make_fingerprint(cls, jjb_config, plugins_list, load_inputs, roots):
+        """Digest of everything which may affect all units at once."""
+        config = jjb_config.config_parser
+        config_items = [
+            (section, sorted(config.items(section, raw=True)))
+            for section in config.sections()
+        ]
+        load_values = InputResolver(roots).values(load_inputs)
+        if load_values is None:
+            return None
+        data = json.dumps(
+            [
+                cls.format_version,
+                version.version_info.version_string(),
+                config_items,
+                dict(jjb_config.yamlparser),
+                list(plugins_list or []),
+                load_values,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def skipped_names(self, element_type):
+        unit_names = self._skipped.get(element_type, {}).values()
+        return [name for names in unit_names for name in names]
+
+    def is_fresh(self, unit_id):
+        try:
+            unit = self._units[unit_id]
+        except KeyError:
+            return False
+        if not self._resolver.is_unchanged(unit["inputs"]):
+            return False
+        return not any(
+            self._cache.has_changed(name, md5) for name, md5 in unit["items"].items()
+        )
+
+    def generate_unit(self, element_type, unit_id, generate):
+        """Generate items of unit, unless it is unchanged since last run.
+
+        :arg str element_type: "job" or "view"
+        :arg str unit_id: unit identifier, unique among all element types
+        :arg generate: callable returning items of unit
+        """
+        if self.is_fresh(unit_id):
+            logger.debug("Skipping unchanged %s", unit_id)
+            skipped = self._skipped.setdefault(element_type, {})
+            skipped[unit_id] = list(self._units[unit_id]["items"])
+            return []
+        with recording_inputs() as inputs:
+            items = list(generate())
+        # Files of elements items are generated from: projects, groups, templates.
+        for item in items:
+            for ctx in item.context:
+                path = _pos_path(ctx)
+                if path:
+                    inputs.add(("file", path))
+        names = [item.name for item in items]
+        self._generated[unit_id] = (element_type, inputs, names)
+        return items
+
+    def has_skipped_duplicates(self, element_type, items):
+        """Check if generated items duplicate items of skipped units."""
+        skipped_names = set(self.skipped_names(element_type))
+        return any(item.name in skipped_names for item in items)
+
+    def reset(self):
+        """Forget recorded units, so all of them are generated again."""
+        self._units = {}
+        self._generated = {}
+        self._skipped = {}
+
+    def update(self, element_type, xml_items):
+        """Record units whose items are all rendered and stored in cache."""
+        md5_by_name = {xml_item.name: xml_item.md5() for xml_item in xml_items}
+        # Inputs used by component modules and macros while rendering XML.
+        render_inputs = {
+            xml_item.name: xml_item.inputs or set() for xml_item in xml_items
+        }
+        for unit_id, (unit_type, inputs, names) in self._generated.items():
+            if unit_type != element_type:
+                continue
+            self._units.pop(unit_id, None)
+            if not all(name in md5_by_name for name in names):
+                continue
+            if any(self._cache.has_changed(name, md5_by_name[name]) for name in names):
+                continue
+            all_inputs = set(inputs)
+            for name in names:
+                all_inputs |= render_inputs[name]
+            values = self._resolver.values(all_inputs)
+            if values is None:
+                continue
+            self._units[unit_id] = {
+                "inputs": values,
+                "items": {name: md5_by_name[name] for name in names},
+            }
+
+    def save(self):
+        if self._fingerprint is None:
+            return
+        # Drop units which are no longer defined, or were not processed.
+        seen = set(self._generated)
+        for unit_names in self._skipped.values():
+            seen.update(unit_names)
+        units = {
+            unit_id: unit for unit_id, unit in self._units.items() if unit_id in seen
+        }
+        data = {"fingerprint": self._fingerprint, "units": units}
+        tmp_filename = self.filename + ".tmp"
+        with io.open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_filename, self.filename)
+        logger.debug("Dependency graph written out to '%s'", self.filename)
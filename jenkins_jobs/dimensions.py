@@ -14,7 +14,7 @@ import itertools
 from collections import namedtuple
 
 from .errors import Context, JenkinsJobsException
-from .loc_loader import LocList, LocDict
+from .loc_loader import LocList, LocDict, mark_constant
 from jenkins_jobs.expander import YamlObjectsExpander
 
 
@@ -47,7 +47,64 @@ def _decode_axis_value(axis, value, key_pos, value_pos):
         )
 
 
-def enum_dimensions_params(axes, params, defaults):
+def _prune_rules(exclude_list, dim_values):
+    """Index exclude rules by last dimension they refer to.
+
+    Rules are used to skip points before their parameters are expanded, so
+    they are used only if it gives the same result as ``is_point_included``
+    on expanded parameters: all rules refer to axes only, with values that
+    expansion does not change, and points do not override other axes.
+    Otherwise None is returned, and points are checked after expansion.
+    """
+    if not exclude_list or not isinstance(exclude_list, LocList):
+        return None
+    if not mark_constant(exclude_list):
+        return None
+    axis_depth = {}
+    for depth, values in enumerate(dim_values):
+        for dim in values:
+            if len(dim.params) != 1:
+                return None  # Point-specific parameters.
+        if not values or values[0].axis in axis_depth:
+            return None
+        axis_depth[values[0].axis] = depth
+    rules_by_depth = [[] for _ in dim_values]
+    for exclude in exclude_list:
+        if not isinstance(exclude, dict) or not exclude:
+            return None  # Reported by is_point_included.
+        rule = []
+        for axis, value in exclude.items():
+            try:
+                rule.append((axis_depth[axis], axis, value))
+            except KeyError:
+                return None  # Not an axis, or reported by is_point_included.
+        last_depth = max(depth for depth, axis, value in rule)
+        rules_by_depth[last_depth].append(rule)
+    return rules_by_depth
+
+
+def _enum_points(dim_values, rules_by_depth, point=()):
+    depth = len(point)
+    if depth == len(dim_values):
+        yield point
+        return
+    rules = rules_by_depth[depth]
+    for dim in dim_values[depth]:
+        next_point = (*point, dim)
+        if any(
+            all(next_point[d].params[axis] == value for d, axis, value in rule)
+            for rule in rules
+        ):
+            continue  # Skip all points starting with these values.
+        yield from _enum_points(dim_values, rules_by_depth, next_point)
+
+
+def enum_dimensions_params(axes, params, defaults, exclude_list=None):
+    """Enumerate parameters of points of dimensions defined by axes.
+
+    If ``exclude_list`` is passed, points it excludes may be skipped.
+    Callers should still check points with ``is_point_included``.
+    """
     expander = YamlObjectsExpander()
     if not axes:
         # No axes - instantiate one job/view.
@@ -69,7 +126,12 @@ def enum_dimensions_params(axes, params, defaults):
             for params in _decode_axis_value(axis, expanded_value, key_pos, value_pos)
         ]
         dim_values.append(value)
-    for dimensions in itertools.product(*dim_values):
+    rules_by_depth = _prune_rules(exclude_list, dim_values)
+    if rules_by_depth is None:
+        points = itertools.product(*dim_values)
+    else:
+        points = _enum_points(dim_values, rules_by_depth)
+    for dimensions in points:
         overrides = {}  # Axis -> overridden param.
         for dim in dimensions:
             for name, value in dim.params.items():
@@ -0,0 +1,91 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Find entry points of installed distributions, without importing them.
+
+import importlib
+from collections import namedtuple
+
+try:
+    from importlib import metadata
+except ImportError:  # Python < 3.8
+    metadata = None
+
+__all__ = ["EntryPoint", "iter_entry_points"]
+
+_groups = None  # Group name -> list of EntryPoint, filled on first use.
+
+
+class EntryPoint(namedtuple("EntryPoint", "name value group")):
+    """Entry point, as 'name = module:attr' declared in group of a distribution.
+
+    Only metadata is kept; the module is imported by ``load()``.
+    """
+
+    @property
+    def module_name(self):
+        return self.value.partition(":")[0].strip()
+
+    def load(self):
+        attrs = self.value.partition(":")[2]
+        # Drop extras, like 'module:attr [extra]'.
+        attrs = attrs.partition("[")[0].strip()
+        obj = importlib.import_module(self.module_name)
+        for attr in attrs.split("."):
+            if attr:
+                obj = getattr(obj, attr)
+        return obj
+
+
+def _read_metadata():
+    groups = {}
+    seen = set()
+    all_eps = metadata.entry_points()
+    if isinstance(all_eps, dict):
+        # Python < 3.12 returns dict of group -> entry points; dict.values()
+        # avoids deprecation warning of its 3.10 subclass.
+        items = [ep for group_eps in dict.values(all_eps) for ep in group_eps]
+    else:
+        items = all_eps
+    for ep in items:
+        # Distributions found twice on sys.path declare the same entry points.
+        key = (ep.group, ep.name, ep.value)
+        if key in seen:
+            continue
+        seen.add(key)
+        groups.setdefault(ep.group, []).append(EntryPoint(ep.name, ep.value, ep.group))
+    return groups
+
+
+def _read_pkg_resources(group):
+    import pkg_resources
+
+    return [
+        EntryPoint(ep.name, "{0}:{1}".format(ep.module_name, ".".join(ep.attrs)), group)
+        for ep in pkg_resources.iter_entry_points(group=group)
+    ]
+
+
+def iter_entry_points(group, name=None):
+    """Iterate entry points of group, optionally only those with given name.
+
+    Metadata of installed distributions is read once per process.
+    """
+    global _groups
+    if metadata is None:
+        if _groups is None:
+            _groups = {}
+        if group not in _groups:
+            _groups[group] = _read_pkg_resources(group)
+    elif _groups is None:
+        _groups = _read_metadata()
+    return (ep for ep in _groups.get(group, []) if name is None or ep.name == name)
@@ -12,7 +12,6 @@
 
 from functools import partial
 from itertools import filterfalse
-from jinja2 import StrictUndefined
 
 from .errors import Context, JenkinsJobsException
 from .formatter import CustomFormatter, enum_str_format_required_params
@@ -28,7 +27,30 @@ from .yaml_objects import (
 )
 
 
+def copy_constant(obj):
+    """Copy containers of a constant subtree; see mark_constant.
+
+    Containers are copied, not shared, as modules may modify expanded data.
+    Strings and other values are shared.
+    """
+    t = type(obj)
+    if t is LocDict:
+        result = LocDict(pos=obj.pos)
+        for key, value in obj.items():
+            result.set_item(
+                key, copy_constant(value), obj.key_pos.get(key), obj.value_pos.get(key)
+            )
+        return result
+    if t is LocList:
+        items = [copy_constant(item) for item in obj]
+        value_pos = [obj.value_pos[idx] for idx, _ in enumerate(obj)]
+        return LocList(items, obj.pos, value_pos)
+    return obj
+
+
 def expand_dict(expander, obj, params, key_pos, value_pos):
+    if expander.copy_constants and type(obj) is LocDict and obj.constant:
+        return copy_constant(obj)
     result = LocDict(pos=obj.pos)
     for key, value in obj.items():
         expanded_key = expander.expand(key, params, None)
@@ -42,6 +64,8 @@ def expand_dict(expander, obj, params, key_pos, value_pos):
 
 
 def expand_list(expander, obj, params, key_pos, value_pos):
+    if expander.copy_constants and type(obj) is LocList and obj.constant:
+        return copy_constant(obj)
     items = [
         expander.expand(item, params, None, obj.value_pos[idx])
         for idx, item in enumerate(obj)
@@ -59,8 +83,12 @@ class StrExpander:
         self._formatter = CustomFormatter(allow_empty_variables)
 
     def __call__(self, obj, params, key_pos, value_pos):
+        text = str(obj)
+        if "{" not in text and "}" not in text:
+            # Nothing to substitute or unescape.
+            return text
         try:
-            return self._formatter.format(str(obj), **params)
+            return self._formatter.vformat(text, (), params)
         except JenkinsJobsException as x:
             lines = str(obj).splitlines()
             start_ofs = value_pos.body.index(lines[0])
@@ -107,6 +135,9 @@ deprecated_yaml_tags = [
 
 # Expand strings and yaml objects.
 class Expander:
+    # Constant subtrees expand to copies of themselves.
+    copy_constants = True
+
     def __init__(self, config=None):
         if config:
             allow_empty_variables = config.yamlparser["allow_empty_variables"]
@@ -143,6 +174,9 @@ class Expander:
 
 # Expand only yaml objects.
 class YamlObjectsExpander(Expander):
+    # Strings are left as they are, keep LocString ones.
+    copy_constants = False
+
     def __init__(self, config=None):
         super().__init__(config)
         self.expanders.update(
@@ -221,8 +255,43 @@ def enum_required_params(obj, pos):
     return enumer(obj, pos)
 
 
-def expand_parameters(expander, param_dict):
-    expanded_params = LocDict()
+def cached_required_params(cache, obj, pos):
+    """Required parameters of obj, enumerated once per object.
+
+    Parameter values are not changed after they are loaded, so they are
+    cached by identity. Object is kept in cache too, so its id can not be
+    reused while cache is alive.
+    """
+    try:
+        return cache[id(obj)][1]
+    except KeyError:
+        pass
+    required_params = tuple(enum_required_params(obj, pos))
+    cache[id(obj)] = (obj, required_params)
+    return required_params
+
+
+def expand_parameters(
+    expander,
+    param_dict,
+    required_params_cache=None,
+    param_names=None,
+    expanded_params=None,
+):
+    """Expand parameters referencing other parameters.
+
+    Pass the same ``required_params_cache`` dict to calls expanding
+    parameters with the same values, like instances of a template for each
+    point of its dimensions.
+
+    If ``param_names`` is given, only 'name', these parameters and ones
+    they reference are expanded. Pass result as ``expanded_params`` to
+    expand the rest of them later; it is updated in place.
+    """
+    if required_params_cache is None:
+        required_params_cache = {}
+    if expanded_params is None:
+        expanded_params = LocDict()
     deps = {}  # Variable name -> variable pos.
 
     def deps_context():
@@ -239,6 +308,8 @@ def expand_parameters(expander, param_dict):
         try:
             format = param_dict[name]
         except KeyError:
+            from jinja2 import StrictUndefined
+
             return (StrictUndefined(name=name), None, None)
         key_pos = param_dict.key_pos.get(name)
         value_pos = param_dict.value_pos.get(name)
@@ -252,7 +323,9 @@ def expand_parameters(expander, param_dict):
         if name in disable_expand_for:
             value = format
         else:
-            required_params = list(enum_required_params(format, value_pos))
+            required_params = cached_required_params(
+                required_params_cache, format, value_pos
+            )
             deps[name] = (key_pos, value_pos)
             try:
                 params = LocDict.merge(expanded_params)
@@ -273,6 +346,9 @@ def expand_parameters(expander, param_dict):
         return (value, key_pos, value_pos)
 
     expand("name")  # expand 'name' parameter first
-    for name in filterfalse(lambda x: x == "name", param_dict):
-        expand(name)
+    if param_names is None:
+        param_names = param_dict
+    for name in filterfalse(lambda x: x == "name", param_names):
+        if name in param_dict:
+            expand(name)
     return expanded_params
@@ -18,16 +18,29 @@
 import _string
 import logging
 import re
+import sys
+from functools import lru_cache
 from string import Formatter
 
-from jinja2 import Undefined
-from jinja2.exceptions import UndefinedError
-
 from .errors import JenkinsJobsException
 
 logger = logging.getLogger(__name__)
 
 
+# Jinja2 is imported only when templates or undefined parameters are used.
+# Before that, no value can be undefined.
+def _is_undefined(value):
+    jinja2 = sys.modules.get("jinja2")
+    return jinja2 is not None and isinstance(value, jinja2.Undefined)
+
+
+def _format_errors():
+    jinja2 = sys.modules.get("jinja2")
+    if jinja2 is None:
+        return (JenkinsJobsException, ValueError)
+    return (JenkinsJobsException, jinja2.UndefinedError, ValueError)
+
+
 class CustomFormatter(Formatter):
     """
     Custom formatter to allow non-existing key references when formatting a
@@ -49,65 +62,37 @@ class CustomFormatter(Formatter):
         self.allow_empty = allow_empty
 
     def vformat(self, format_string, args, kwargs):
+        compiled = _compile(format_string)
         # Special case of returning the object preserving it's type if the entire string
         # matches a single parameter.
-        result = self._whole_matcher.match(format_string)
-        if result is not None:
+        if compiled.whole_key is not None:
             try:
-                value = kwargs[result.group("key")]
+                value = kwargs[compiled.whole_key]
             except KeyError:
                 pass
             else:
-                if not isinstance(value, Undefined):
+                if not _is_undefined(value):
                     return value
 
-        # handle multiple fields within string via a callback to re.sub()
-        def re_replace(match):
-            key = match.group("key")
-            default = match.group("default")
-
-            if default is not None:
-                if key not in kwargs or isinstance(kwargs[key], Undefined):
-                    return default
-                else:
-                    return "{%s}" % key
-            return match.group(0)
-
-        format_string = self._matcher.sub(re_replace, format_string)
+        format_string = compiled.prepare(kwargs)
 
         try:
             return super().vformat(format_string, args, kwargs)
-        except (JenkinsJobsException, UndefinedError, ValueError) as x:
+        except _format_errors() as x:
             if len(format_string) > 40:
                 short_fmt = format_string[:80] + "..."
             else:
                 short_fmt = format_string
             raise JenkinsJobsException(f"While formatting string {short_fmt!r}: {x}")
 
+    def parse(self, format_string):
+        return _parse(format_string)
+
     def enum_required_params(self, format_string):
-        def re_replace(match):
-            key = match.group("key")
-            return "{%s}" % key
-
-        prepared_format_string = self._matcher.sub(re_replace, format_string)
-        for literal_text, field_name, format_spec, conversion in self.parse(
-            prepared_format_string
-        ):
-            if field_name is None:
-                continue
-            arg_used, rest = _string.formatter_field_name_split(field_name)
-            if arg_used == "" or type(arg_used) is int:
-                raise JenkinsJobsException(
-                    f"Positional format arguments are not supported: {format_string!r}"
-                )
-            yield arg_used
+        yield from _compile(format_string).required_params()
 
     def enum_param_defaults(self, format_string):
-        for match in self._matcher.finditer(format_string):
-            key = match.group("key")
-            default = match.group("default")
-            if default is not None:
-                yield (key, default)
+        yield from _compile(format_string).defaults
 
     def get_value(self, key, args, kwargs):
         try:
@@ -121,14 +106,100 @@ class CustomFormatter(Formatter):
             raise JenkinsJobsException(f"Missing parameter: {key!r}")
 
 
+class _CompiledFormat:
+    """Format string split into literal text and parameter references.
+
+    References are kept with their text, key and default, so the string
+    passed to ``Formatter`` can be rebuilt for any set of parameters without
+    matching it again.
+    """
+
+    __slots__ = ["format_string", "whole_key", "refs", "tail", "defaults", "_required"]
+
+    def __init__(self, format_string):
+        self.format_string = format_string
+        match = CustomFormatter._whole_matcher.match(format_string)
+        self.whole_key = match.group("key") if match is not None else None
+        self.refs = []  # (literal text before, key, default, reference text)
+        pos = 0
+        for match in CustomFormatter._matcher.finditer(format_string):
+            self.refs.append(
+                (
+                    format_string[pos : match.start()],
+                    match.group("key"),
+                    match.group("default"),
+                    match.group(0),
+                )
+            )
+            pos = match.end()
+        self.tail = format_string[pos:]
+        self.defaults = tuple(
+            (key, default) for _, key, default, _ in self.refs if default is not None
+        )
+        self._required = None
+
+    def prepare(self, kwargs):
+        """Return string for Formatter, with defaults of missing keys applied."""
+        if not self.defaults:
+            # References without default are left as they are.
+            return self.format_string
+        parts = []
+        for literal, key, default, text in self.refs:
+            parts.append(literal)
+            if default is None:
+                parts.append(text)
+            elif key not in kwargs or _is_undefined(kwargs[key]):
+                parts.append(default)
+            else:
+                parts.append("{%s}" % key)
+        parts.append(self.tail)
+        return "".join(parts)
+
+    def required_params(self):
+        if self._required is None:
+            parts = []
+            for literal, key, _, _ in self.refs:
+                parts.append(literal)
+                parts.append("{%s}" % key)
+            parts.append(self.tail)
+            required = []
+            for literal_text, field_name, format_spec, conversion in _parse(
+                "".join(parts)
+            ):
+                if field_name is None:
+                    continue
+                arg_used, rest = _string.formatter_field_name_split(field_name)
+                if arg_used == "" or type(arg_used) is int:
+                    raise JenkinsJobsException(
+                        "Positional format arguments are not supported:"
+                        f" {self.format_string!r}"
+                    )
+                required.append(arg_used)
+            self._required = tuple(required)
+        return self._required
+
+
+# Template strings are expanded for each job they are used by; each distinct
+# one is parsed once, as long as it stays among the most recently used.
+FORMAT_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def _compile(format_string):
+    return _CompiledFormat(format_string)
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def _parse(format_string):
+    return tuple(_string.formatter_parser(format_string))
+
+
 def enum_str_format_required_params(format, pos):
-    formatter = CustomFormatter()
     try:
-        yield from formatter.enum_required_params(str(format))
+        yield from _compile(str(format)).required_params()
     except JenkinsJobsException as x:
         raise x.with_pos(pos)
 
 
 def enum_str_format_param_defaults(format):
-    formatter = CustomFormatter()
-    yield from formatter.enum_param_defaults(str(format))
+    yield from _compile(str(format)).defaults
@@ -0,0 +1,88 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Find and read files included by yaml objects, once per run.
+
+import io
+import os
+
+__all__ = ["IncludeResolver"]
+
+
+class IncludeResolver(object):
+    """Resolve include paths and read included files for a run.
+
+    Included files, like shell scripts, are often used by many job
+    instances. Each directory is listed once, when a file is first looked
+    up inside it, and file contents are kept until file size or
+    modification time changes.
+
+    One resolver is shared by all loaders of a run.
+    """
+
+    def __init__(self):
+        self._dir_files = {}  # Directory path -> set of names of files in it.
+        self._resolved = {}  # (search dirs, relative path) -> Path or None.
+        self._contents = {}  # Path -> (mtime, size, text).
+
+    def _is_file(self, path):
+        dir_path = str(path.parent)
+        names = self._dir_files.get(dir_path)
+        if names is None:
+            names = set()
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_file():
+                                names.add(entry.name)
+                        except OSError:
+                            pass
+            except OSError:
+                pass  # Missing or not a directory.
+            self._dir_files[dir_path] = names
+        if path.name in names:
+            return True
+        # Name may differ in case on case-insensitive file systems.
+        return os.path.isfile(path)
+
+    def find(self, dir_list, rel_path):
+        """Return path of first file found in directories, or None.
+
+        :arg dir_list: directories to search, as Path objects
+        :arg rel_path: path of file, relative to a directory
+        """
+        key = (tuple(dir_list), str(rel_path))
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        found = None
+        for dir in dir_list:
+            candidate = dir.joinpath(rel_path)
+            if self._is_file(candidate):
+                found = candidate
+                break
+        self._resolved[key] = found
+        return found
+
+    def read_text(self, path):
+        """Return contents of a file, read again only if it was changed."""
+        stat = os.stat(path)
+        cached = self._contents.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        # Same newline handling as Path.read_text.
+        with io.open(path, "r") as f:
+            text = f.read()
+        self._contents[path] = (stat.st_mtime_ns, stat.st_size, text)
+        return text
@@ -23,6 +23,9 @@ class JobBase(RootBase):
     project_type: str
     folder: str
 
+    # Folder is prepended to expanded name.
+    _name_keys = ("name", "folder")
+
     @classmethod
     def from_dict(cls, config, roots, data, pos):
         keep_descriptions = config.yamlparser["keep_descriptions"]
@@ -96,6 +99,8 @@ class JobGroup(Group):
     _jobs: dict
     _job_templates: dict
 
+    _spec_kind = "job-spec"
+
     @classmethod
     def add(cls, config, roots, data, pos):
         d = data.copy()
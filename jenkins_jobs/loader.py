@@ -9,34 +9,67 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
-import functools
 import io
 import logging
+import multiprocessing
+import os
+import pickle
 import warnings
 from functools import partial
 
+from .cache import ParseCache
+from .depgraph import recording_inputs
 from .errors import JenkinsJobsException
-from .loc_loader import LocLoader
+from .includes import IncludeResolver
+from .loc_loader import LocLoader, mark_constant
+from .profiler import measure
 from .yaml_objects import BaseYamlObject
 from .expander import YamlObjectsExpander, deprecated_yaml_tags, yaml_classes_list
 from .roots import root_adders
 
 logger = logging.getLogger(__name__)
 
+# Loader inherited by forked parse worker processes.
+_parse_loader = None
+
 
 class Loader(LocLoader):
     @classmethod
     def empty(cls, jjb_config):
-        return cls(io.StringIO(), jjb_config)
+        parse_cache = None
+        # With retained anchors, file contents depend on files loaded before it.
+        if (
+            jjb_config.yamlparser["parse_cache"]
+            and not jjb_config.yamlparser["retain_anchors"]
+        ):
+            parse_cache = ParseCache(jjb_config)
+        return cls(io.StringIO(), jjb_config, parse_cache=parse_cache)
 
     def __init__(
-        self, stream, jjb_config, source_path=None, source_dir=None, anchors=None
+        self,
+        stream,
+        jjb_config,
+        source_path=None,
+        source_dir=None,
+        anchors=None,
+        parse_cache=None,
+        include_resolver=None,
+        path_cache=None,
     ):
         super().__init__(stream, source_path)
         self.jjb_config = jjb_config
         self.source_path = source_path
         self.source_dir = source_dir
         self._retain_anchors = jjb_config.yamlparser["retain_anchors"]
+        self._parse_cache = parse_cache
+        # Shared by loaders of included files, as parse cache.
+        if include_resolver is None:
+            include_resolver = IncludeResolver()
+        self.include_resolver = include_resolver
+        # Absolute path -> parsed data, shared by loaders of a run.
+        if path_cache is None:
+            path_cache = {}
+        self._path_cache = path_cache
         if anchors:
             # Override default set by super class.
             self.anchors = anchors
@@ -53,25 +86,57 @@ class Loader(LocLoader):
         return node
 
     def _with_stream(self, stream, source_path, source_dir):
-        return Loader(stream, self.jjb_config, source_path, source_dir, self.anchors)
+        return Loader(
+            stream,
+            self.jjb_config,
+            source_path,
+            source_dir,
+            self.anchors,
+            self._parse_cache,
+            self.include_resolver,
+            self._path_cache,
+        )
 
     def load_fp(self, fp):
         return self.load(fp)
 
-    # 1024 cache size seems like a reasonable balance between memory requirement and performance gain
-    @functools.lru_cache(maxsize=1024)
     def load_path(self, path):
         # Caching parsed file outputs is safe even with _retain_anchors set to True because:
         # PyYAML does not allow updating anchor values, it is considered as anchor duplication
         # So we can safely cache a parsed YAML for a file containing an alias since the alias can be defined
         # only once and must be defined before use. The alias value will remain same irrespective of the number
         # times a file is parsed
-        return self.load(path.read_text(), source_path=path, source_dir=path.parent)
+        key = os.path.abspath(path)
+        try:
+            return self._path_cache[key]
+        except KeyError:
+            pass
+        data = self._parse_path(path)
+        self._path_cache[key] = data
+        return data
+
+    def add_parsed_path(self, path, data):
+        """Use data parsed elsewhere, like in a worker process, for path."""
+        self._path_cache[os.path.abspath(path)] = data
+
+    def _parse_path(self, path):
+        text = path.read_text()
+        if self._parse_cache is None:
+            return self.load(text, source_path=path, source_dir=path.parent)
+        # Yaml objects from cache are bound to a fresh loader for the same file.
+        file_loader = self._with_stream(io.StringIO(), path, path.parent)
+        data = self._parse_cache.get(path, text, file_loader)
+        if data is None:
+            data = self.load(text, source_path=path, source_dir=path.parent)
+            self._parse_cache.put(path, text, data, Loader)
+        return data
 
     def load(self, stream, source_path=None, source_dir=None):
         loader = self._with_stream(stream, source_path, source_dir)
         try:
-            return loader.get_single_data()
+            data = loader.get_single_data()
+            mark_constant(data)
+            return data
         finally:
             loader.dispose()
             if self._retain_anchors:
@@ -124,14 +189,90 @@ def enum_expanded_paths(path_list):
             yield from real(path)
 
 
+def _parse_in_worker(path):
+    try:
+        data = _parse_loader.load_path(path)
+    except Exception as e:
+        # Parsed again by main process, to raise error from there.
+        logger.debug("Failed to parse %r in worker: %s", str(path), e)
+        return None
+
+    # Loaders are not sent back; yaml objects are bound to main process one.
+    def persistent_id(obj):
+        if isinstance(obj, Loader):
+            return "loader"
+        return None
+
+    buf = io.BytesIO()
+    pickler = pickle.Pickler(buf, pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = persistent_id
+    try:
+        pickler.dump(data)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        logger.debug("Failed to send parsed %r from worker: %s", str(path), e)
+        return None
+    return buf.getvalue()
+
+
+def _parse_in_processes(config, loader, path_list):
+    """Parse files using worker processes.
+
+    Returns dict of path to parsed data. Files failed to be parsed by
+    workers are missing from it.
+    """
+    global _parse_loader
+    n_workers = config.yamlparser["parse_workers"]
+    if n_workers == 0:
+        n_workers = multiprocessing.cpu_count()
+    if n_workers < 2 or len(path_list) < 2:
+        return {}
+    # Same reason as parse cache is not used in Loader.empty.
+    if config.yamlparser["retain_anchors"]:
+        return {}
+    if "fork" not in multiprocessing.get_all_start_methods():
+        logger.warning(
+            "Worker processes are not supported on this platform,"
+            " parsing files in one process"
+        )
+        return {}
+    n_workers = min(n_workers, len(path_list))
+    _parse_loader = loader
+    try:
+        context = multiprocessing.get_context("fork")
+        with measure("parse", "worker processes"):
+            with context.Pool(n_workers) as pool:
+                results = pool.map(_parse_in_worker, path_list)
+    finally:
+        _parse_loader = None
+    parsed = {}
+    for path, pickled in zip(path_list, results):
+        if pickled is None:
+            continue
+        unpickler = pickle.Unpickler(io.BytesIO(pickled))
+        file_loader = loader._with_stream(io.StringIO(), path, path.parent)
+        unpickler.persistent_load = lambda ref: file_loader
+        parsed[path] = unpickler.load()
+        # Files included by other files are not parsed again.
+        loader.add_parsed_path(path, parsed[path])
+    return parsed
+
+
 def load_files(config, roots, path_list):
     expander = YamlObjectsExpander(config)
     loader = Loader.empty(config)
-    for path in enum_expanded_paths(path_list):
+    path_list = list(enum_expanded_paths(path_list))
+    parsed = _parse_in_processes(
+        config, loader, [path for path in path_list if not is_stdin(path)]
+    )
+    for path in path_list:
         if is_stdin(path):
-            data = loader.load_fp(path)
+            with measure("parse", "<stdin>"):
+                data = loader.load_fp(path)
+        elif path in parsed:
+            data = parsed[path]
         else:
-            data = loader.load_path(path)
+            with measure("parse", path):
+                data = loader.load_path(path)
         if data is None:
             continue
         if not isinstance(data, list):
@@ -156,7 +297,9 @@ def load_files(config, roots, path_list):
             if kind.startswith("_"):
                 continue
             if isinstance(contents, BaseYamlObject):
-                contents = contents.expand(expander, params={})
+                with recording_inputs() as inputs:
+                    contents = contents.expand(expander, params={})
+                roots.load_inputs |= inputs
             try:
                 adder = root_adders[kind]
             except KeyError:
@@ -21,11 +21,14 @@ from .position import Pos
 class LocDict(dict):
     """dict implementation with added source position information"""
 
+    __slots__ = ["pos", "key_pos", "value_pos", "constant"]
+
     def __init__(self, value=None, pos=None, key_pos=None, value_pos=None):
         super().__init__(value or [])
         self.pos = pos
         self.key_pos = key_pos or {}  # key -> key pos.
         self.value_pos = value_pos or {}  # key -> value pos.
+        self.constant = None  # Set by mark_constant for loaded trees.
 
     def item_with_pos(self, key):
         value = self[key]  # KeyError is propagated from here.
@@ -99,17 +102,51 @@ class LocDict(dict):
 class LocList(list):
     """list implementation with added source position information"""
 
+    __slots__ = ["pos", "value_pos", "constant"]
+
     def __init__(self, value=None, pos=None, value_pos=None):
         if value is None:
             value = []
         super().__init__(value)
         self.pos = pos
         self.value_pos = value_pos or [None for _ in value]  # Value pos list.
+        self.constant = None  # Set by mark_constant for loaded trees.
 
     def copy(self):
         return LocList(self, self.pos, self.value_pos)
 
 
+def mark_constant(obj):
+    """Mark subtrees of loaded data which do not depend on parameters.
+
+    A LocDict or LocList is constant if it holds no strings with braces, which
+    format would substitute or unescape, and no yaml objects. Expander copies
+    such subtrees instead of expanding them; loaded trees are not modified
+    afterwards, so marks stay valid.
+
+    Returns True if obj is constant.
+    """
+    t = type(obj)
+    if t is str:
+        return "{" not in obj and "}" not in obj
+    if t in (bool, int, float, type(None)):
+        return True
+    if t is LocDict:
+        items = [item for pair in obj.items() for item in pair]
+    elif t is LocList:
+        items = obj
+    else:
+        return False
+    if obj.constant is not None:
+        # Visited already, through an alias.
+        return obj.constant
+    obj.constant = False
+    # Visit all items, to mark their subtrees too.
+    constant = all([mark_constant(item) for item in items])
+    obj.constant = constant
+    return constant
+
+
 class LocString(UserString):
     """str implementation with added source position information"""
 
@@ -128,9 +165,12 @@ class LocLoader(yaml.Loader):
             self.name = file_path
         self._line_ofs = line_ofs
         self._column_ofs = column_ofs
+        self._source = None  # Shared by positions of this file.
 
     def pos_from_node(self, node):
-        return Pos.from_node(node, self._line_ofs, self._column_ofs)
+        pos = Pos.from_node(node, self._line_ofs, self._column_ofs, self._source)
+        self._source = pos.source
+        return pos
 
     def construct_yaml_map(self, node):
         data = LocDict(pos=self.pos_from_node(node))
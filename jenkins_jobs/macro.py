@@ -13,6 +13,7 @@
 from dataclasses import dataclass
 from functools import partial
 
+from .depgraph import record_input
 from .root_base import ElementBase
 from .expander import Expander, StringsOnlyExpander
 from .yaml_objects import BaseYamlObject
@@ -80,6 +81,7 @@ class Macro(ElementBase):
         return f"{self._type_name} macro {self.name!r}"
 
     def dispatch_elements(self, registry, xml_parent, component_data, job_data, params):
+        record_input("file", self.pos.path)
         defaults = self._pick_defaults(self.defaults_name)
         full_params = LocDict.merge(
             defaults.params,
@@ -45,6 +45,10 @@ class Base(object):
     #: doesn't have components.
     component_list_type = None
 
+    #: Top-level job keys ``amend_job_dict`` reacts to. It is called only
+    #: for jobs having any of them. Set to None to be called for all jobs.
+    amend_keys = None
+
     def __init__(self, registry):
         self.registry = registry
 
@@ -186,6 +186,8 @@ ZUUL_POST_PARAMETERS = [
 class Zuul(jenkins_jobs.modules.base.Base):
     sequence = 0
 
+    amend_keys = ("triggers",)
+
     def amend_job_dict(self, job):
         triggers = job.get("triggers", [])
         if "zuul" not in triggers and "zuul-post" not in triggers:
@@ -15,6 +15,7 @@
 
 # Concurrent execution helper functions and classes
 
+from concurrent import futures
 from functools import wraps
 import logging
 from multiprocessing import cpu_count
@@ -151,3 +152,135 @@ def concurrent(func):
         return results
 
     return concurrentized
+
+
+def concurrent_stream(func, items, n_workers=0, window=None):
+    """
+    Run ``func(item)`` for each of ``items`` in worker threads, yielding
+    ``(item, result)`` pairs in order of completion.
+
+    Unlike :func:`concurrent`, items are taken from the iterable only when
+    there is room for them, so it may be a lazy generator producing items
+    while earlier ones are processed. An exception raised by ``func`` is
+    re-raised once its item completes; items not started yet are cancelled.
+
+    :arg int n_workers: number of workers to use, by default and if '0'
+        passed will autodetect the number of cores and use that.
+    :arg int window: maximum number of items taken but not completed yet,
+        twice the number of workers by default.
+    """
+    if not n_workers:
+        n_workers = cpu_count()
+    if not window:
+        window = n_workers * 2
+    logging.debug("Running concurrent stream with %d workers", n_workers)
+    in_flight = {}  # future -> item
+    executor = futures.ThreadPoolExecutor(n_workers)
+    try:
+        for item in items:
+            in_flight[executor.submit(func, item)] = item
+            while len(in_flight) >= window:
+                done, _ = futures.wait(in_flight, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+        for future in futures.as_completed(list(in_flight)):
+            yield in_flight.pop(future), future.result()
+    finally:
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class AdaptiveLimit(object):
+    """
+    Number of calls allowed to run at once, adapted to how the calls go.
+
+    Callers take a slot with :meth:`acquire` before a call and give it back
+    with :meth:`release`, reporting call latency and if the call failed
+    because the server is overloaded. The limit starts low and is doubled
+    each time as many calls as allowed succeed, until it is first lowered;
+    after that it grows by one per such round (as TCP congestion control).
+    It is halved when a call fails on overload, and cut by a quarter when
+    average latency rises above ``latency_tolerance`` times the lowest one
+    seen. Calls started before the limit was lowered, or in the first round
+    after that, do not lower it again.
+
+    :arg int max_limit: limit never grows above it
+    :arg int min_limit: limit never drops below it
+    :arg int initial_limit: limit to start with, 2 by default
+    :arg float latency_tolerance: factor of lowest average latency above
+        which the limit is lowered
+    """
+
+    # Latency rises smaller than this, in seconds, are taken as noise.
+    latency_slack = 0.1
+
+    def __init__(
+        self, max_limit, min_limit=1, initial_limit=None, latency_tolerance=2.0
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        if initial_limit is None:
+            initial_limit = 2
+        self.limit = max(self.min_limit, min(max_limit, initial_limit))
+        self.peak_limit = self.limit
+        self.latency_tolerance = latency_tolerance
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._n_started = 0
+        self._hold_until = 0  # Calls started up to this one don't lower limit.
+        self._slow_start = True
+        self._credit = 0.0  # Fraction of a round succeeded at current limit.
+        self._latency = None  # Moving average of call latency.
+        self._base_latency = None  # Lowest moving average seen.
+
+    def acquire(self):
+        """Wait until a call may start, return ticket to release it with."""
+        with self._cond:
+            while self._in_use >= self.limit:
+                self._cond.wait()
+            self._in_use += 1
+            self._n_started += 1
+            return self._n_started
+
+    def release(self, ticket, latency, overloaded=False):
+        """Mark call as completed and adapt limit.
+
+        :arg ticket: value returned by :meth:`acquire` for this call
+        :arg float latency: call duration, in seconds
+        :arg bool overloaded: call failed because the server is overloaded
+        """
+        with self._cond:
+            self._in_use -= 1
+            if overloaded:
+                self._lower(ticket, 0.5)
+            elif self._latency_rose(latency):
+                self._lower(ticket, 0.75)
+            else:
+                self._credit += 1.0 / self.limit
+                if self._credit >= 1 or self._slow_start:
+                    self._credit = 0.0
+                    self.limit = min(self.max_limit, self.limit + 1)
+                    self.peak_limit = max(self.peak_limit, self.limit)
+            self._cond.notify_all()
+
+    def _latency_rose(self, latency):
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency = 0.8 * self._latency + 0.2 * latency
+        if self._base_latency is None or self._latency < self._base_latency:
+            self._base_latency = self._latency
+        return self._latency > max(
+            self._base_latency * self.latency_tolerance,
+            self._base_latency + self.latency_slack,
+        )
+
+    def _lower(self, ticket, factor):
+        if ticket <= self._hold_until:
+            return
+        self._slow_start = False
+        self._credit = 0.0
+        self.limit = max(self.min_limit, int(self.limit * factor))
+        self._hold_until = self._n_started + self.limit
+        logger.debug("Lowered concurrency limit to %d", self.limit)
@@ -10,82 +10,96 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import sys
 import yaml
 
-if sys.version_info >= (3, 8):
-    from functools import cached_property
-else:
-    from .cached_property import cached_property
-
 
 LINE_SEPARATORS = "\0\r\n\x85\u2028\u2029"
 WHITESPACE_CHARS = " \t"
 
 
+class Source:
+    """Path and text of a parsed file, shared by all positions inside it."""
+
+    __slots__ = ["path", "text"]
+
+    def __init__(self, path, text):
+        self.path = path
+        self.text = text  # None if parsed from a stream.
+
+
 class Pos:
+    """Position inside a source file.
+
+    Positions are kept for every key and value of loaded files, so only
+    integers and a reference to shared source are stored. Snippet and body
+    text are extracted from source when requested, for error messages.
+    """
+
+    __slots__ = ["source", "line", "column", "ptr"]
+
     @classmethod
-    def from_node(cls, node, line_ofs=0, column_ofs=0):
+    def from_node(cls, node, line_ofs=0, column_ofs=0, source=None):
+        """Position of yaml node start.
+
+        Pass source of a position from an earlier node of the same file, to
+        share it.
+        """
         mark = node.start_mark
-        return cls(mark, mark.name, mark.line + line_ofs, mark.column + column_ofs)
+        if source is None or source.text is not mark.buffer or source.path != mark.name:
+            source = Source(mark.name, mark.buffer)
+        return cls(source, mark.line + line_ofs, mark.column + column_ofs, mark.pointer)
 
     @classmethod
     def from_file(cls, path, text):
-        mark = yaml.Mark(str(path), 0, 0, 0, text, 0)
-        return cls(mark, path, 0, 0)
+        return cls(Source(path, text), 0, 0, 0)
 
-    def __init__(self, mark, path, line, column):
-        self._mark = mark
-        self.path = path
+    def __init__(self, source, line, column, ptr):
+        self.source = source
         self.line = line  # Starts from 0.
         self.column = column  # Starts from 0.
+        self.ptr = ptr  # Offset in source text.
 
     def __repr__(self):
         return f"<Pos {self.path}:{self.line}:{self.column}>"
 
+    @property
+    def path(self):
+        return self.source.path
+
     def with_offset(self, line_ofs=0, column_ofs=0):
         line_ptr = self._move_ptr_by_lines(line_ofs)
         ptr = line_ptr + column_ofs
-        mark = self._clone_mark(self._mark, ptr)
         if line_ofs:
             column = column_ofs  # Start from new line.
         else:
             column = self.column + column_ofs
-        return Pos(mark, self.path, self.line + line_ofs, column)
+        return Pos(self.source, self.line + line_ofs, column, ptr)
 
     def with_contents_start(self):
-        ptr = self._mark.pointer
-        buf = self._mark.buffer
+        ptr = self.ptr
+        buf = self.source.text
         while (
             ptr < len(buf)
             and buf[ptr] not in LINE_SEPARATORS
             and buf[ptr] in WHITESPACE_CHARS
         ):
             ptr += 1
-        mark = self._clone_mark(self._mark, ptr)
-        return Pos(mark, self.path, self.line, self.column + ptr - self._mark.pointer)
+        return Pos(self.source, self.line, self.column + ptr - self.ptr, ptr)
 
-    @cached_property
+    @property
     def snippet(self):
-        return self._mark.get_snippet(max_length=100)
+        mark = yaml.Mark(
+            self.path, self.ptr, self.line, self.column, self.source.text, self.ptr
+        )
+        return mark.get_snippet(max_length=100)
 
-    @cached_property
+    @property
     def body(self):
-        return self._mark.buffer[self._mark.pointer :]
-
-    def _clone_mark(self, mark, ptr):
-        return yaml.Mark(
-            mark.name,
-            mark.index,
-            mark.line,
-            mark.column,
-            mark.buffer,
-            ptr,
-        )
+        return self.source.text[self.ptr :]
 
     def _move_ptr_by_lines(self, line_ofs):
-        ptr = self._mark.pointer
-        buf = self._mark.buffer
+        ptr = self.ptr
+        buf = self.source.text
         while line_ofs > 0 and ptr < len(buf):
             if buf[ptr] in LINE_SEPARATORS:
                 line_ofs -= 1
@@ -0,0 +1,156 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Record time spent in each stage of a run, for the --profile option.
+
+import io
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+
+__all__ = ["Profile", "is_profiling", "measure", "profile_http", "profiling"]
+
+_profile = None  # Active Profile, if any.
+_null = nullcontext()
+
+
+class Profile(object):
+    """Count and total time of measured operations, by category and name.
+
+    Measurements may be nested, so time of an operation includes time of
+    operations it called, as for macros dispatching other components.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # (category, name) -> [count, total, max]
+        self._start = time.perf_counter()
+        self.total = None
+
+    def add(self, category, name, seconds):
+        with self._lock:
+            entry = self._entries.get((category, name))
+            if entry is None:
+                self._entries[(category, name)] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def stop(self):
+        if self.total is None:
+            self.total = time.perf_counter() - self._start
+
+    def report(self):
+        """Return report as dict, entries of each category slowest first."""
+        categories = {}
+        with self._lock:
+            entries = list(self._entries.items())
+        for (category, name), (count, total, max_time) in entries:
+            categories.setdefault(category, []).append(
+                {"name": name, "count": count, "total": total, "max": max_time}
+            )
+        for items in categories.values():
+            items.sort(key=lambda item: item["total"], reverse=True)
+        return {"total": self.total, "categories": categories}
+
+    def write(self, path):
+        with io.open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+    def summary(self, top=5):
+        """Return lines with top hotspots of each category."""
+        report = self.report()
+        lines = []
+        if report["total"] is not None:
+            lines.append("Total: {0:.3f}s".format(report["total"]))
+        for category, items in sorted(report["categories"].items()):
+            lines.append("{0}:".format(category))
+            for item in items[:top]:
+                lines.append(
+                    "  {0:10.3f}s {1:8d}x  {2}".format(
+                        item["total"], item["count"], item["name"]
+                    )
+                )
+            if len(items) > top:
+                lines.append("  ... {0} more".format(len(items) - top))
+        return lines
+
+
+class _Measure(object):
+    __slots__ = ["_profile", "_category", "_name", "_start"]
+
+    def __init__(self, profile, category, name):
+        self._profile = profile
+        self._category = category
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._profile.add(self._category, self._name, time.perf_counter() - self._start)
+
+
+@contextmanager
+def profiling():
+    """Collect measurements made inside the block into a Profile."""
+    global _profile
+    profile = Profile()
+    _profile = profile
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        _profile = None
+
+
+def is_profiling():
+    return _profile is not None
+
+
+def measure(category, *name_parts):
+    """Return context manager recording time spent in a block.
+
+    Parts of name are joined only if profiling is enabled; otherwise this
+    is a no-op, cheap enough to be used in hot paths.
+
+    :arg str category: kind of operation, like "parse" or "dispatch"
+    :arg name_parts: operation name, like file path or component name
+    """
+    profile = _profile
+    if profile is None:
+        return _null
+    return _Measure(profile, category, " ".join(str(part) for part in name_parts))
+
+
+_item_path_re = re.compile(r"/(job|view)/[^/]+")
+
+
+def profile_http(jenkins_client):
+    """Record HTTP requests made by a python-jenkins client.
+
+    Requests are named by method and URL path, with job and view names
+    replaced by '*', so requests of the same kind are counted together.
+    """
+    request = jenkins_client.jenkins_request
+
+    def measured_request(req, *args, **kwargs):
+        path = _item_path_re.sub(r"/\1/*", urlsplit(req.url).path)
+        with measure("http", req.method, path):
+            return request(req, *args, **kwargs)
+
+    jenkins_client.jenkins_request = measured_request
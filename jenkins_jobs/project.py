@@ -65,14 +65,24 @@ class Project(GroupBase):
     def _my_params(self):
         return {"name": self.name}
 
-    def generate_jobs(self):
+    def generate_jobs(self, name_filter=None):
         root_dicts = [self._jobs, self._job_templates, self._job_groups]
         return self._generate_items(
-            root_dicts, self.job_specs, self.defaults_name, params={}
+            root_dicts,
+            self.job_specs,
+            self.defaults_name,
+            {},
+            "job-spec",
+            name_filter,
         )
 
-    def generate_views(self):
+    def generate_views(self, name_filter=None):
         root_dicts = [self._views, self._view_templates, self._view_groups]
         return self._generate_items(
-            root_dicts, self.view_specs, self.defaults_name, params={}
+            root_dicts,
+            self.view_specs,
+            self.defaults_name,
+            {},
+            "view-spec",
+            name_filter,
         )
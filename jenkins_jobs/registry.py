@@ -15,18 +15,21 @@
 
 # Manage Jenkins plugin module registry.
 
+import importlib
 import inspect
 import logging
 import operator
-import pkg_resources
 import sys
 import types
-from pkg_resources.extern.packaging.version import InvalidVersion
 
 from six import PY2
 
 from jenkins.plugins import PluginVersion
+from jenkins_jobs import entry_points
+from jenkins_jobs.depgraph import is_recording, record_input
 from jenkins_jobs.errors import JenkinsJobsException
+from jenkins_jobs.modules.base import Base
+from jenkins_jobs.profiler import measure
 
 __all__ = ["ModuleRegistry"]
 
@@ -40,12 +43,20 @@ class ModuleRegistry(object):
     _component_type_cache = {}
 
     def __init__(self, jjb_config, plugins_list=None):
-        self.modules = []
+        # Modules are imported on first use, see modules property and
+        # _get_component_module.
+        self._modules = None
+        self._module_eps = list(
+            entry_points.iter_entry_points(group="jenkins_jobs.modules")
+        )
+        self._loaded_modules = {}  # Entry point -> module instance.
         self.modules_by_component_type = {}
         self.handlers = {}
         self.jjb_config = jjb_config
         self.masked_warned = {}
         self._macros = {}
+        # (component type, name) -> (macro, function, pass job_data).
+        self._dispatch_table = {}
 
         if plugins_list is None:
             self._plugin_version = {}
@@ -53,16 +64,46 @@ class ModuleRegistry(object):
             # PluginVersion by short and long plugin name.
             self._plugin_version = self._get_plugins_versions(plugins_list)
 
-        for entrypoint in pkg_resources.iter_entry_points(group="jenkins_jobs.modules"):
-            Mod = entrypoint.load()
-            mod = Mod(self)
-            self.modules.append(mod)
-            self.modules.sort(key=operator.attrgetter("sequence"))
-            if mod.component_type is not None:
-                self.modules_by_component_type[mod.component_type] = entrypoint
+    @property
+    def modules(self):
+        """Instances of all modules, ordered by their sequence."""
+        if self._modules is None:
+            modules = [self._load_module(ep) for ep in self._module_eps]
+            self._modules = sorted(modules, key=operator.attrgetter("sequence"))
+        return self._modules
+
+    def _load_module(self, entrypoint):
+        try:
+            return self._loaded_modules[entrypoint]
+        except KeyError:
+            pass
+        Mod = entrypoint.load()
+        mod = Mod(self)
+        self._loaded_modules[entrypoint] = mod
+        if mod.component_type is not None:
+            self.modules_by_component_type[mod.component_type] = entrypoint
+        return mod
+
+    def _get_component_module(self, component_type):
+        """Return entry point of module defining component type, or None.
+
+        Modules are imported until one defining it is found.
+        """
+        for entrypoint in self._module_eps:
+            if component_type in self.modules_by_component_type:
+                break
+            self._load_module(entrypoint)
+        return self.modules_by_component_type.get(component_type)
 
     @staticmethod
     def _get_plugins_versions(plugins_list):
+        # Imported here, pkg_resources is slow to import and only needed
+        # when plugins info is known.
+        try:
+            from packaging.version import InvalidVersion, Version
+        except ImportError:
+            from pkg_resources.extern.packaging.version import InvalidVersion, Version
+
         plugin_version = {}
 
         for plugin_info in plugins_list:
@@ -76,7 +117,7 @@ class ModuleRegistry(object):
                 version = plugin_info["version"]
 
             try:
-                pkg_resources.parse_version(version)
+                Version(version)
             except InvalidVersion:
                 plugin_name = short_name or long_name
                 if plugin_name:
@@ -95,14 +136,6 @@ class ModuleRegistry(object):
 
         return plugin_version
 
-    @staticmethod
-    def _filter_kwargs(func, **kwargs):
-        arg_spec = getargspec(func)
-        for name in list(kwargs.keys()):
-            if name not in arg_spec.args:
-                del kwargs[name]
-        return kwargs
-
     def get_plugin_version(self, plugin_name, alt_plugin_name=None, default=None):
         """Provide plugin version to be used from a module's impl of Base.gen_xml.
 
@@ -161,14 +194,32 @@ class ModuleRegistry(object):
 
     def set_macros(self, macros):
         self._macros = macros
+        self._dispatch_table = {}
 
     def amend_job_dicts(self, job_data_list):
+        # Modules not overriding amend_job_dict never change jobs.
+        amenders = [
+            module
+            for module in self.modules
+            if type(module).amend_job_dict is not Base.amend_job_dict
+        ]
+        if not amenders:
+            return
+        for job in job_data_list:
+            self._amend_job_dict(job.data, amenders)
+
+    @staticmethod
+    def _amend_job_dict(data, amenders):
+        # Modules are called again until none of them changes the job.
+        # Other jobs are not affected by it.
         while True:
             changed = False
-            for job in job_data_list:
-                for module in self.modules:
-                    if module.amend_job_dict(job.data):
-                        changed = True
+            for module in amenders:
+                keys = getattr(module, "amend_keys", None)
+                if keys is not None and not any(key in data for key in keys):
+                    continue
+                if module.amend_job_dict(data):
+                    changed = True
             if not changed:
                 break
 
@@ -176,7 +227,7 @@ class ModuleRegistry(object):
         if entry_point in self._component_type_cache:
             return self._component_type_cache[entry_point]
 
-        # pkg_resources.EntryPoint.load() is costly, cache it.
+        # EntryPoint.load() is costly, cache it.
         component_list_type = entry_point.load().component_list_type
         logging.info("Caching type %s of %s", component_list_type, entry_point)
         self._component_type_cache[entry_point] = component_list_type
@@ -212,91 +263,97 @@ class ModuleRegistry(object):
         this method.
         """
 
-        if component_type not in self.modules_by_component_type:
-            raise JenkinsJobsException(
-                "Unknown component type: " "'{0}'.".format(component_type)
-            )
-
-        entry_point = self.modules_by_component_type[component_type]
-        component_list_type = self.get_component_list_type(entry_point)
-
         if isinstance(component, dict):
             # The component is a singleton dictionary of name: dict(args)
             name, component_data = next(iter(component.items()))
-            if template_data:
-                paramdict = {}
-                paramdict.update(template_data)
-                paramdict.update(job_data or {})
         else:
             # The component is a simple string name, eg "run-tests"
             name = component
             component_data = {}
 
+        try:
+            macro, func, pass_job_data = self._dispatch_table[component_type, name]
+        except KeyError:
+            macro, func, pass_job_data = self._resolve_component(component_type, name)
+        if is_recording():
+            record_input(f"{component_type} macro", name)
+        with measure("dispatch", component_type, name):
+            if macro:
+                if component_data is None:
+                    component_data = {}
+                params = {**component_data, **(job_data or {})}
+                try:
+                    macro.dispatch_elements(
+                        self, xml_parent, component_data, job_data, params
+                    )
+                except JenkinsJobsException as x:
+                    if component_pos is not None:
+                        raise x.with_context(
+                            f"While expanding {component_type} macro call {name!r}",
+                            pos=component_pos,
+                        )
+                    else:
+                        raise
+            else:
+                try:
+                    if pass_job_data:
+                        func(self, xml_parent, component_data, job_data=job_data)
+                    else:
+                        func(self, xml_parent, component_data)
+                except JenkinsJobsException as x:
+                    raise x.with_context(
+                        f"In {component_type} {name!r}",
+                        pos=component.pos,
+                    )
+
+    def _resolve_component(self, component_type, name):
+        """Find what dispatching a component runs, and add it to dispatch table.
+
+        Returns tuple of macro (or None), component function (or None) and
+        whether the function accepts job_data.
+        """
+        entry_point = self._get_component_module(component_type)
+        if entry_point is None:
+            raise JenkinsJobsException(
+                "Unknown component type: " "'{0}'.".format(component_type)
+            )
+
+        component_list_type = self.get_component_list_type(entry_point)
+
         # Look for a component function defined in an entry point
         eps = self._entry_points_cache.get(component_list_type)
         if eps is None:
             eps = self._load_eps(component_list_type, component_type, entry_point, name)
 
-        macro_dict = self.macros.get(component_type, {})
-        macro = macro_dict.get(name)
+        macro = self.macros.get(component_type, {}).get(name)
         if macro:
-            try:
-                self._dispatch_macro(
-                    component_data,
-                    component_type,
-                    eps,
-                    job_data,
-                    macro,
-                    name,
-                    xml_parent,
+            if name in eps and name not in self.masked_warned:
+                self.masked_warned[name] = True
+                logger.warning(
+                    "You have a macro ('%s') defined for '%s' "
+                    "component type that is masking an inbuilt "
+                    "definition" % (name, component_type)
                 )
-            except JenkinsJobsException as x:
-                if component_pos is not None:
-                    raise x.with_context(
-                        f"While expanding {component_type} macro call {name!r}",
-                        pos=component_pos,
-                    )
-                else:
-                    raise
+            entry = (macro, None, False)
         elif name in eps:
-            try:
-                func = eps[name]
-                kwargs = self._filter_kwargs(func, job_data=job_data)
-                func(self, xml_parent, component_data, **kwargs)
-            except JenkinsJobsException as x:
-                raise x.with_context(
-                    f"In {component_type} {name!r}",
-                    pos=component.pos,
-                )
+            func = eps[name]
+            if isinstance(func, entry_points.EntryPoint):
+                # Explicit entry points are imported on first use.
+                func = eps[name] = func.load()
+            entry = (None, func, "job_data" in getargspec(func).args)
         else:
             raise JenkinsJobsException(
                 "Unknown entry point or macro '{0}' "
                 "for component type: '{1}'.".format(name, component_type)
             )
-
-    def _dispatch_macro(
-        self, component_data, component_type, eps, job_data, macro, name, xml_parent
-    ):
-        if name in eps and name not in self.masked_warned:
-            self.masked_warned[name] = True
-            logger.warning(
-                "You have a macro ('%s') defined for '%s' "
-                "component type that is masking an inbuilt "
-                "definition" % (name, component_type)
-            )
-        if component_data is None:
-            component_data = {}
-        params = {**component_data, **(job_data or {})}
-        macro.dispatch_elements(self, xml_parent, component_data, job_data, params)
+        self._dispatch_table[component_type, name] = entry
+        return entry
 
     def _load_eps(self, component_list_type, component_type, entry_point, name):
         logging.debug("Caching entrypoints for %s" % component_list_type)
         module_eps = []
         # auto build entry points by inferring from base component_types
-        mod = pkg_resources.EntryPoint(
-            "__all__", entry_point.module_name, dist=entry_point.dist
-        )
-        Mod = mod.load()
+        Mod = importlib.import_module(entry_point.module_name)
         func_eps = [
             Mod.__dict__.get(a)
             for a in dir(Mod)
@@ -320,36 +377,31 @@ class ModuleRegistry(object):
                 )
                 continue
 
-            module_eps.append(
-                pkg_resources.EntryPoint(
-                    ep_name,
-                    entry_point.module_name,
-                    dist=entry_point.dist,
-                    attrs=(func_ep.__name__,),
-                )
-            )
+            module_eps.append((ep_name, func_ep))
             logger.debug(
-                "Adding auto EP '%s=%s:%s'"
-                % (ep_name, entry_point.module_name, func_ep.__name__)
+                "Adding auto EP '%s=%s:%s'",
+                ep_name,
+                entry_point.module_name,
+                func_ep.__name__,
             )
-        # load from explicitly defined entry points
+        # load from explicitly defined entry points; they are not imported
+        # until a component using them is dispatched
         module_eps.extend(
-            list(
-                pkg_resources.iter_entry_points(
-                    group="jenkins_jobs.{0}".format(component_list_type)
-                )
+            (module_ep.name, module_ep)
+            for module_ep in entry_points.iter_entry_points(
+                group="jenkins_jobs.{0}".format(component_list_type)
             )
         )
         eps = {}
-        for module_ep in module_eps:
-            if module_ep.name in eps:
+        for ep_name, func_or_ep in module_eps:
+            if ep_name in eps:
                 raise JenkinsJobsException(
                     "Duplicate entry point found for component type: "
                     "'{0}', '{0}',"
                     "name: '{1}'".format(component_type, name)
                 )
 
-            eps[module_ep.name] = module_ep.load()
+            eps[ep_name] = func_or_ep
         # cache both sets of entry points
         self._entry_points_cache[component_list_type] = eps
         logger.debug("Cached entry point group %s = %s", component_list_type, eps)
@@ -15,11 +15,13 @@ from dataclasses import dataclass, field
 from typing import List
 
 from .constants import MAGIC_MANAGE_STRING
+from .depgraph import record_input
 from .errors import Context, JenkinsJobsException
 from .loc_loader import LocDict, LocString
 from .position import Pos
+from .profiler import measure
 from .formatter import enum_str_format_required_params, enum_str_format_param_defaults
-from .expander import Expander, expand_parameters
+from .expander import Expander, enum_required_params, expand_parameters
 from .defaults import Defaults
 from .dimensions import enum_dimensions_params, is_point_included
 
@@ -51,6 +53,7 @@ class ElementBase:
         return str(self).capitalize()
 
     def _pick_defaults(self, name):
+        record_input("defaults", name)
         try:
             defaults = self._defaults[name]
         except KeyError:
@@ -60,6 +63,8 @@ class ElementBase:
                 f"{self.title} wants defaults {name!r}, but it was never defined",
                 pos=name.pos,
             )
+        if defaults.pos is not None:
+            record_input("file", defaults.pos.path)
         if name == "global":
             return defaults
         return defaults.merged_with_global(self._pick_defaults("global"))
@@ -78,6 +83,9 @@ class RootBase(ElementBase):
     defaults_name: str
     _contents: dict
 
+    # Contents making up item name.
+    _name_keys = ("name",)
+
     @property
     def id(self):
         if self._id:
@@ -100,9 +108,23 @@ class RootBase(ElementBase):
             expanded_contents["description"] = amended_description
         return expanded_contents
 
+    def _name_contents(self, contents):
+        name_contents = LocDict()
+        for key in self._name_keys:
+            try:
+                value, key_pos, value_pos = contents.item_with_pos(key)
+            except KeyError:
+                continue
+            name_contents.set_item(key, value, key_pos, value_pos)
+        return name_contents
+
+    def _expand_name(self, name_contents, params):
+        """Expand item name only, without expanding rest of its contents."""
+        return self._expand_contents(name_contents, params)["name"]
+
 
 class NonTemplateRootMixin:
-    def top_level_generate_items(self):
+    def top_level_generate_items(self, name_filter=None):
         try:
             defaults = self._pick_defaults(self.defaults_name)
             item_params = LocDict.merge(
@@ -114,20 +136,29 @@ class NonTemplateRootMixin:
                 self.contents,
                 pos=self.pos,
             )
+            if name_filter is not None:
+                name = self._expand_name(self._name_contents(contents), item_params)
+                if not name_filter(name):
+                    return
             expanded_contents = self._expand_contents(contents, item_params)
             context = [Context(f"In {self}", self.pos)]
             yield JobViewData(expanded_contents, context)
         except JenkinsJobsException as x:
             raise x.with_context(f"In {self}", pos=self.pos)
 
-    def generate_items(self, defaults_name, params):
+    def generate_items(self, defaults_name, params, name_filter=None):
         # Do not produce jobs/views from under project - they are produced when
         # processed directly from roots, by top_level_generate_items.
         return []
 
 
 class TemplateRootMixin:
-    def generate_items(self, defaults_name, params):
+    def generate_items(self, defaults_name, params, name_filter=None):
+        """Generate items for each point of template dimensions.
+
+        If ``name_filter`` is given, contents are expanded only for items
+        with names it accepts.
+        """
         try:
             defaults = self._pick_defaults(defaults_name or self.defaults_name)
             item_params = LocDict.merge(
@@ -145,19 +176,48 @@ class TemplateRootMixin:
             )
             axes = list(enum_str_format_required_params(self.name, self.name.pos))
             axes_defaults = dict(enum_str_format_param_defaults(self.name))
-            for dim_params in enum_dimensions_params(axes, item_params, axes_defaults):
-                instance_params = LocDict.merge(
-                    item_params,
-                    dim_params,
+            # Parameter values are shared by all points.
+            required_params_cache = {}
+            if name_filter is not None:
+                name_contents = self._name_contents(contents)
+                name_param_names = set(
+                    enum_required_params(name_contents, name_contents.pos)
                 )
-                expanded_params = expand_parameters(self._expander, instance_params)
-                if not is_point_included(
-                    exclude_list=expanded_params.get("exclude"),
-                    params=expanded_params,
-                    key_pos=expanded_params.key_pos.get("exclude"),
-                ):
-                    continue
-                expanded_contents = self._expand_contents(contents, expanded_params)
+            # Points excluded by rules on plain axis values are skipped early.
+            dim_params_iter = enum_dimensions_params(
+                axes, item_params, axes_defaults, item_params.get("exclude")
+            )
+            for dim_params in dim_params_iter:
+                with measure("template", self):
+                    instance_params = LocDict.merge(
+                        item_params,
+                        dim_params,
+                    )
+                    if name_filter is not None:
+                        name_params = expand_parameters(
+                            self._expander,
+                            instance_params,
+                            required_params_cache,
+                            name_param_names,
+                        )
+                        name = self._expand_name(name_contents, name_params)
+                        if not name_filter(name):
+                            continue
+                    else:
+                        name_params = None
+                    expanded_params = expand_parameters(
+                        self._expander,
+                        instance_params,
+                        required_params_cache,
+                        expanded_params=name_params,
+                    )
+                    if not is_point_included(
+                        exclude_list=expanded_params.get("exclude"),
+                        params=expanded_params,
+                        key_pos=expanded_params.key_pos.get("exclude"),
+                    ):
+                        continue
+                    expanded_contents = self._expand_contents(contents, expanded_params)
                 context = [Context(f"In {self}", self.pos)]
                 yield JobViewData(expanded_contents, context)
         except JenkinsJobsException as x:
@@ -207,9 +267,12 @@ class GroupBase:
                 )
         return cls.Spec(name, params, pos)
 
-    def _generate_items(self, root_dicts, spec_list, defaults_name, params):
+    def _generate_items(
+        self, root_dicts, spec_list, defaults_name, params, spec_kind, name_filter=None
+    ):
         try:
             for spec in spec_list:
+                record_input(spec_kind, spec.name)
                 item = self._pick_spec_item(root_dicts, spec)
                 item_params = LocDict.merge(
                     params,
@@ -217,7 +280,9 @@ class GroupBase:
                     self._my_params,
                     spec.params,
                 )
-                for job_data in item.generate_items(defaults_name, item_params):
+                for job_data in item.generate_items(
+                    defaults_name, item_params, name_filter
+                ):
                     yield (
                         job_data.with_context("Defined here", spec.pos).with_context(
                             f"In {self}", self.pos
@@ -249,5 +314,12 @@ class Group(GroupBase):
     specs: list  # list[Spec]
     params: dict
 
-    def generate_items(self, defaults_name, params):
-        return self._generate_items(self._root_dicts, self.specs, defaults_name, params)
+    def generate_items(self, defaults_name, params, name_filter=None):
+        return self._generate_items(
+            self._root_dicts,
+            self.specs,
+            defaults_name,
+            params,
+            self._spec_kind,
+            name_filter,
+        )
@@ -12,6 +12,7 @@
 
 import logging
 from collections import defaultdict
+from functools import partial
 
 from .errors import Context, JenkinsJobsException
 from .defaults import Defaults
@@ -19,6 +20,7 @@ from .job import Job, JobTemplate, JobGroup
 from .view import View, ViewTemplate, ViewGroup
 from .project import Project
 from .macro import macro_adders
+from .profiler import measure
 
 logger = logging.getLogger(__name__)
 
@@ -50,22 +52,105 @@ class Roots:
         self.view_groups = {}
         self.projects = {}
         self.macros = defaultdict(dict)  # type -> name -> Macro
+        # Inputs used while expanding top-level yaml tags.
+        self.load_inputs = set()
 
-    def generate_jobs(self):
-        expanded_jobs = []
-        for job in self.jobs.values():
-            expanded_jobs += job.top_level_generate_items()
-        for project in self.projects.values():
-            expanded_jobs += project.generate_jobs()
-        return self._remove_duplicates(expanded_jobs, "job")
-
-    def generate_views(self):
-        expanded_views = []
-        for view in self.views.values():
-            expanded_views += view.top_level_generate_items()
-        for project in self.projects.values():
-            expanded_views += project.generate_views()
-        return self._remove_duplicates(expanded_views, "view")
+    def generate_jobs(self, generate_unit=None, name_filter=None):
+        """Generate all jobs.
+
+        If ``name_filter(name)`` is given, only jobs with names it accepts
+        are expanded and returned. Duplicates are not detected among
+        skipped jobs.
+        """
+        return self._generate_units(self._job_units(name_filter), "job", generate_unit)
+
+    def generate_views(self, generate_unit=None, name_filter=None):
+        """Generate all views, see ``generate_jobs``."""
+        return self._generate_units(
+            self._view_units(name_filter), "view", generate_unit
+        )
+
+    def iter_jobs(self, name_filter=None):
+        """Generate jobs lazily, one top-level job or project at a time.
+
+        Unlike ``generate_jobs``, duplicates are detected as they appear.
+        They can not be allowed: the last definition, which wins in
+        ``generate_jobs``, is not known until all jobs are generated.
+        """
+        return self._iter_units(self._job_units(name_filter), "job")
+
+    def iter_views(self, name_filter=None):
+        """Generate views lazily, see ``iter_jobs``."""
+        return self._iter_units(self._view_units(name_filter), "view")
+
+    def _job_units(self, name_filter=None):
+        return [
+            *(
+                (f"job {id}", partial(job.top_level_generate_items, name_filter))
+                for id, job in self.jobs.items()
+            ),
+            *(
+                (f"project {name} jobs", partial(project.generate_jobs, name_filter))
+                for name, project in self.projects.items()
+            ),
+        ]
+
+    def _view_units(self, name_filter=None):
+        return [
+            *(
+                (f"view {id}", partial(view.top_level_generate_items, name_filter))
+                for id, view in self.views.items()
+            ),
+            *(
+                (
+                    f"project {name} views",
+                    partial(project.generate_views, name_filter),
+                )
+                for name, project in self.projects.items()
+            ),
+        ]
+
+    def _iter_units(self, units, element_type):
+        if self._allow_duplicates:
+            raise JenkinsJobsException(
+                f"Can not generate {element_type}s lazily"
+                " when duplicates are allowed"
+            )
+        return self._iter_unique_units(units, element_type)
+
+    def _iter_unique_units(self, units, element_type):
+        seen = {}  # name -> (pos, context) of first definition.
+        for _, generate in units:
+            for job_or_view in generate():
+                name = job_or_view.name
+                if name in seen:
+                    origin_pos, origin_ctx = seen[name]
+                    self._handle_dups(
+                        element_type,
+                        name,
+                        job_or_view.data.pos,
+                        origin_pos,
+                        # Skip job context, leave only project context.
+                        job_or_view.context[:-1],
+                        origin_ctx[:-1],
+                    )
+                seen[name] = (job_or_view.data.pos, job_or_view.context)
+                yield job_or_view
+
+    def _generate_units(self, units, element_type, generate_unit):
+        """Generate items of each unit - a top-level job, view or project.
+
+        If given, ``generate_unit(element_type, unit_id, generate)`` is called
+        instead of ``generate()`` to produce items of each unit.
+        """
+        expanded = []
+        for unit_id, generate in units:
+            with measure("expand", unit_id):
+                if generate_unit:
+                    expanded += generate_unit(element_type, unit_id, generate)
+                else:
+                    expanded += generate()
+        return self._remove_duplicates(expanded, element_type)
 
     def assign(self, container, id, value, element_type):
         if id in container:
@@ -83,6 +83,8 @@ class ViewGroup(Group):
     _views: dict
     _view_templates: dict
 
+    _spec_kind = "view-spec"
+
     @classmethod
     def add(cls, config, roots, data, pos):
         d = data.copy()
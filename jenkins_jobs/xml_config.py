@@ -16,15 +16,26 @@
 # Manage Jenkins XML config file output.
 
 import hashlib
-import pkg_resources
+import io
+import logging
+import multiprocessing
+import re
 import sys
 from xml.dom import minidom
 import xml.etree.ElementTree as XML
 
+from jenkins_jobs import entry_points
+from jenkins_jobs.depgraph import recording_inputs
 from jenkins_jobs.errors import JenkinsJobsException
+from jenkins_jobs.profiler import measure
 
 __all__ = ["XmlJobGenerator", "XmlJob"]
 
+logger = logging.getLogger(__name__)
+
+# Generator and data list inherited by forked render worker processes.
+_render_state = None
+
 
 def remove_ignorable_whitespace(node):
     """Remove insignificant whitespace from XML nodes
@@ -48,23 +59,156 @@ def remove_ignorable_whitespace(node):
         remove_ignorable_whitespace(child)
 
 
+def _minidom_escapes(write):
+    # Escaping done by minidom differs between python versions.
+    escapes = []
+    for char in "&<>\"'":  # '&' goes first.
+        escaped = write(char)
+        if escaped != char:
+            escapes.append((char, escaped))
+    return escapes
+
+
+def _minidom_text(data):
+    node = minidom.Text()
+    node.data = data
+    buf = io.StringIO()
+    node.writexml(buf)
+    return buf.getvalue()
+
+
+def _minidom_attr_value(value):
+    node = minidom.Document().createElement("a")
+    node.setAttribute("b", value)
+    buf = io.StringIO()
+    node.writexml(buf)
+    return buf.getvalue()[len('<a b="') : -len('"/>')]
+
+
+_TEXT_ESCAPES = _minidom_escapes(_minidom_text)
+_ATTR_ESCAPES = _minidom_escapes(_minidom_attr_value)
+_NAME_RE = re.compile(r"[^\W\d][\w.:-]*\Z")
+_INVALID_CHAR_RE = re.compile("[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+# Round trip of these through attribute value differs between python versions.
+_ATTR_FALLBACK_RE = re.compile("[\t\n\r]")
+
+
+def _escape(data, escapes):
+    for char, escaped in escapes:
+        if char in data:
+            data = data.replace(char, escaped)
+    return data
+
+
+class _Unsupported(Exception):
+    """Element tree can not be serialized by _pretty_xml."""
+
+
+def _pretty_xml(root):
+    """Serialize element tree into the same bytes as
+    ``minidom.parseString(XML.tostring(root)).toprettyxml(indent="  ")``
+    produces, without the round trip through DOM.
+
+    Raises _Unsupported for parts where the round trip is not trivial:
+    namespaces, comments, processing instructions, characters not allowed
+    in XML and special whitespace in attribute values.
+    """
+    if root.tail and root.tail.strip():
+        raise _Unsupported()
+    out = ['<?xml version="1.0" encoding="utf-8"?>\n']
+    _write_element(out, root, "")
+    return "".join(out).encode("utf-8")
+
+
+def _check_text(text):
+    if not isinstance(text, str) or _INVALID_CHAR_RE.search(text):
+        raise _Unsupported()
+    if "\r" in text:
+        # XML parsers normalize line endings.
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _write_element(out, element, indent):
+    tag = element.tag
+    if not isinstance(tag, str) or not _NAME_RE.match(tag):
+        raise _Unsupported()
+    out.append(indent + "<" + tag)
+    attrib = element.attrib.items()
+    if sys.version_info[:2] < (3, 8):
+        attrib = sorted(attrib)
+    for name, value in attrib:
+        if not isinstance(name, str) or not _NAME_RE.match(name):
+            raise _Unsupported()
+        value = _check_text(value)
+        if _ATTR_FALLBACK_RE.search(value):
+            raise _Unsupported()
+        out.append(' {0}="{1}"'.format(name, _escape(value, _ATTR_ESCAPES)))
+    text = element.text
+    if text:
+        text = _check_text(text)
+    if not len(element):
+        if text:
+            out.append(">" + _escape(text, _TEXT_ESCAPES) + "</" + tag + ">\n")
+        else:
+            out.append("/>\n")
+        return
+    out.append(">\n")
+    child_indent = indent + "  "
+    if text:
+        out.append(_escape(child_indent + text + "\n", _TEXT_ESCAPES))
+    for child in element:
+        _write_element(out, child, child_indent)
+        tail = child.tail
+        if tail:
+            tail = _check_text(tail)
+            out.append(_escape(child_indent + tail + "\n", _TEXT_ESCAPES))
+    out.append(indent + "</" + tag + ">\n")
+
+
 class XmlJob(object):
-    def __init__(self, xml, name):
+    def __init__(self, xml, name, inputs=None):
         self.xml = xml
         self.name = name
+        # Inputs (included files, macros) recorded while generating the XML.
+        self.inputs = inputs
+        # Memoized, so xml should not be changed once output is requested.
+        self._output = None
+        self._md5 = None
 
     def md5(self):
-        if sys.version_info[:2] >= (3, 6):
-            # allows md5 use on fips-enabled systems
-            hash_func = hashlib.new("md5", usedforsecurity=False)
-            hash_func.update(self.output())
-            return hash_func.hexdigest()
-        else:
-            return hashlib.md5(self.output()).hexdigest()
+        if self._md5 is None:
+            output = self.output()
+            with measure("serialize", "md5"):
+                if sys.version_info[:2] >= (3, 6):
+                    # allows md5 use on fips-enabled systems
+                    hash_func = hashlib.new("md5", usedforsecurity=False)
+                    hash_func.update(output)
+                    self._md5 = hash_func.hexdigest()
+                else:
+                    self._md5 = hashlib.md5(output).hexdigest()
+        return self._md5
+
+    @classmethod
+    def from_server_xml(cls, xml_str, name):
+        """Make XmlJob from config as stored by Jenkins.
+
+        Indentation is dropped, so output of returned XmlJob is the same as
+        output of generated XmlJob for the same configuration.
+        """
+        xml = XML.fromstring(xml_str.encode("utf-8"))
+        remove_ignorable_whitespace(xml)
+        return cls(xml, name)
 
     def output(self):
-        out = minidom.parseString(XML.tostring(self.xml, encoding="UTF-8"))
-        return out.toprettyxml(indent="  ", encoding="utf-8")
+        if self._output is None:
+            with measure("serialize", "output"):
+                try:
+                    self._output = _pretty_xml(self.xml)
+                except _Unsupported:
+                    out = minidom.parseString(XML.tostring(self.xml, encoding="UTF-8"))
+                    self._output = out.toprettyxml(indent="  ", encoding="utf-8")
+        return self._output
 
 
 class XmlGenerator(object):
@@ -77,27 +221,72 @@ class XmlGenerator(object):
     module so found will be used to generate the XML object.
     """
 
+    # (entry point group, kind) -> module classes, shared by all generators.
+    _module_classes = {}
+
     def __init__(self, registry):
         self.registry = registry
 
-    def generateXML(self, data_list):
+    def generateXML(self, data_list, n_workers=1):
+        """Generate XmlJob for each of JobViewData in data_list.
+
+        :arg int n_workers: number of worker processes, 0 for one per CPU
+          and 1 to generate in this process.
+        """
+        if n_workers == 0:
+            n_workers = multiprocessing.cpu_count()
+        if n_workers > 1 and len(data_list) > 1:
+            if "fork" in multiprocessing.get_all_start_methods():
+                return self._generate_xml_in_processes(data_list, n_workers)
+            logger.warning(
+                "Worker processes are not supported on this platform,"
+                " generating XML in one process"
+            )
+        return [self._generate_one(data) for data in data_list]
+
+    def iterXML(self, data_iter):
+        """Generate XmlJob for each of JobViewData in data_iter, lazily."""
+        for data in data_iter:
+            yield self._generate_one(data)
+
+    def _generate_one(self, data):
+        try:
+            with recording_inputs() as inputs:
+                obj = self._getXMLForData(data.data)
+        except JenkinsJobsException as x:
+            raise x.with_ctx_list(data.context)
+        obj.inputs = inputs
+        return obj
+
+    def _generate_xml_in_processes(self, data_list, n_workers):
+        # Workers are forked, so they inherit data list, registry and macros
+        # without pickling them; each worker then uses its own registry copy.
+        # Only rendered XML is sent back.
+        global _render_state
+        n_workers = min(n_workers, len(data_list))
+        chunksize = max(1, len(data_list) // (n_workers * 4))
+        _render_state = (self, data_list)
+        try:
+            context = multiprocessing.get_context("fork")
+            with context.Pool(n_workers) as pool:
+                results = pool.map(_render_in_worker, range(len(data_list)), chunksize)
+        finally:
+            _render_state = None
         xml_objs = []
-        for data in data_list:
-            try:
-                xml_objs.append(self._getXMLForData(data.data))
-            except JenkinsJobsException as x:
-                raise x.with_ctx_list(data.context)
+        for data, (xml_str, output, md5, inputs) in zip(data_list, results):
+            obj = XmlJob(XML.fromstring(xml_str), data.data["name"], inputs)
+            obj._output = output
+            obj._md5 = md5
+            xml_objs.append(obj)
         return xml_objs
 
     def _getXMLForData(self, data):
         kind = data.get(self.kind_attribute, self.kind_default)
 
-        for ep in pkg_resources.iter_entry_points(
-            group=self.entry_point_group, name=kind
-        ):
-            Mod = ep.load()
+        for Mod in self._get_module_classes(kind):
             mod = Mod(self.registry)
-            xml = mod.root_xml(data)
+            with measure("gen_xml", Mod.__name__, "root_xml"):
+                xml = mod.root_xml(data)
             if "view-type" not in data:
                 self._gen_xml(xml, data)
             obj = XmlJob(xml, data["name"])
@@ -105,7 +294,7 @@ class XmlGenerator(object):
 
         names = [
             ep.name
-            for ep in pkg_resources.iter_entry_points(group=self.entry_point_group)
+            for ep in entry_points.iter_entry_points(group=self.entry_point_group)
         ]
         raise JenkinsJobsException(
             "Unrecognized {}: {} (supported types are: {})".format(
@@ -113,10 +302,26 @@ class XmlGenerator(object):
             )
         )
 
+    def _get_module_classes(self, kind):
+        key = (self.entry_point_group, kind)
+        try:
+            return self._module_classes[key]
+        except KeyError:
+            pass
+        classes = [
+            ep.load()
+            for ep in entry_points.iter_entry_points(
+                group=self.entry_point_group, name=kind
+            )
+        ]
+        self._module_classes[key] = classes
+        return classes
+
     def _gen_xml(self, xml, data):
         for module in self.registry.modules:
             if hasattr(module, "gen_xml"):
-                module.gen_xml(xml, data)
+                with measure("gen_xml", type(module).__name__):
+                    module.gen_xml(xml, data)
 
 
 class XmlJobGenerator(XmlGenerator):
@@ -139,3 +344,14 @@ class XmlViewGenerator(XmlGenerator):
     entry_point_group = "jenkins_jobs.views"
     kind_attribute = "view-type"
     kind_default = "list"
+
+
+def _render_in_worker(index):
+    generator, data_list = _render_state
+    try:
+        obj = generator._generate_one(data_list[index])
+    except JenkinsJobsException as x:
+        # Subclasses may not be unpickled by parent; keep message and context.
+        raise JenkinsJobsException(x.message, x.pos, x.ctx)
+    xml_str = XML.tostring(obj.xml, encoding="UTF-8")
+    return (xml_str, obj.output(), obj.md5(), obj.inputs)
@@ -174,12 +174,12 @@ import importlib
 import logging
 import traceback
 import sys
+from functools import lru_cache
 from pathlib import Path
 
-import jinja2
-import jinja2.meta
 import yaml
 
+from .depgraph import is_recording, record_input
 from .errors import Context, JenkinsJobsException
 from .loc_loader import LocList
 from .position import Pos
@@ -192,6 +192,34 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# Templates compiled from distinct texts kept by _compile_jinja2_template.
+JINJA2_TEMPLATE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=None)
+def _get_jinja2_env(search_path, filter_modules):
+    """Return Jinja2 environment, shared by objects with same settings.
+
+    :arg tuple search_path: directories to look templates up in
+    :arg tuple filter_modules: names of modules with FILTERS to add
+    """
+    # Jinja2 is slow to import, it is imported only when used.
+    import jinja2
+
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(list(search_path)),
+        undefined=jinja2.StrictUndefined,
+    )
+    for module_name in filter_modules:
+        module = importlib.import_module(module_name)
+        env.filters.update(module.FILTERS)
+    return env
+
+
+@lru_cache(maxsize=JINJA2_TEMPLATE_CACHE_SIZE)
+def _compile_jinja2_template(env, template_text):
+    return env.from_string(template_text)
+
 
 class BaseYamlObject(metaclass=abc.ABCMeta):
     @staticmethod
@@ -236,38 +264,50 @@ class BaseYamlObject(metaclass=abc.ABCMeta):
     def _find_file(self, rel_path, pos):
         search_path = self._search_path
         if "." not in search_path:
-            search_path.append(".")
-        dir_list = [Path(d).expanduser() for d in self._search_path]
-        for dir in dir_list:
-            candidate = dir.joinpath(rel_path)
-            if candidate.is_file():
-                logger.debug("Including file %r from path %r", str(rel_path), str(dir))
-                return candidate
+            search_path = [*search_path, "."]
+        dir_list = [Path(d).expanduser() for d in search_path]
+        candidate = self._loader.include_resolver.find(dir_list, rel_path)
+        if candidate is not None:
+            logger.debug(
+                "Including file %r from path %r", str(rel_path), str(candidate.parent)
+            )
+            record_input("file", candidate)
+            return candidate
         dir_list_str = ",".join(str(d) for d in dir_list)
         raise JenkinsJobsException(
             f"File {rel_path} does not exist in any of include directories: {dir_list_str}",
             pos=pos,
         )
 
+    def _read_file(self, path):
+        return self._loader.include_resolver.read_text(path)
+
     def _expand_path_list(self, path_list, *args):
         for idx, path in enumerate(path_list):
             yield self._expand_path(path, path_list.value_pos[idx], *args)
 
 
 class J2BaseYamlObject(BaseYamlObject):
-    def __init__(self, jjb_config, loader, pos):
-        super().__init__(jjb_config, loader, pos)
-        self._filters = {}
-        for module_name in self._filter_modules:
-            module = importlib.import_module(module_name)
-            self._filters.update(module.FILTERS)
-        self._jinja2_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(self._search_path),
-            undefined=jinja2.StrictUndefined,
-        )
-        self._jinja2_env.filters.update(self._filters)
+    @property
+    def _jinja2_env(self):
+        return _get_jinja2_env(tuple(self._search_path), tuple(self._filter_modules))
+
+    def _compile(self, template_text):
+        return _compile_jinja2_template(self._jinja2_env, template_text)
+
+    def _referenced_files(self, template_text):
+        """Find files of (nested) templates included from template"""
+        import jinja2.meta
+
+        ast = self._jinja2_env.parse(template_text)
+        for rt in jinja2.meta.find_referenced_templates(ast):
+            path = self._find_file(rt, 0)
+            yield path
+            yield from self._referenced_files(self._read_file(path))
 
     def _render_template(self, pos, template_text, template, params):
+        import jinja2
+
         try:
             return template.render(params)
         except jinja2.UndefinedError as x:
@@ -299,18 +339,19 @@ class J2Template(J2BaseYamlObject):
     def __init__(self, jjb_config, loader, pos, template_text):
         super().__init__(jjb_config, loader, pos)
         self._template_text = template_text
-        self._template = self._jinja2_env.from_string(template_text)
 
     def _params_from_referenced_templates(self, template_text):
         """
         Find recursively undeclared jinja2 variables from any
         (nested) included template(s)
         """
+        import jinja2.meta
+
         required_params = set()
         ast = self._jinja2_env.parse(template_text)
         for rt in jinja2.meta.find_referenced_templates(ast):
             # recursive call to find params also from nested includes
-            template_text = Path(self._find_file(rt, 0)).read_text()
+            template_text = self._read_file(self._find_file(rt, 0))
             required_params.update(
                 self._params_from_referenced_templates(template_text)
             )
@@ -321,10 +362,15 @@ class J2Template(J2BaseYamlObject):
     def required_params(self):
         return self._params_from_referenced_templates(self._template_text)
 
+    @cached_property
+    def _referenced_paths(self):
+        return list(self._referenced_files(self._template_text))
+
     def _render(self, params):
-        return self._render_template(
-            self._pos, self._template_text, self._template, params
-        )
+        for path in self._referenced_paths:
+            record_input("file", path)
+        template = self._compile(self._template_text)
+        return self._render_template(self._pos, self._template_text, template, params)
 
 
 class J2String(J2Template):
@@ -370,8 +416,12 @@ class IncludeJinja2(J2BaseYamlObject):
     def _expand_path(self, path_template, pos, expander, params):
         rel_path = self._formatter.format(path_template, **params)
         full_path = self._find_file(rel_path, pos)
-        template_text = full_path.read_text()
-        template = self._jinja2_env.from_string(template_text)
+        template_text = self._read_file(full_path)
+        if is_recording():
+            # Includes are resolved by jinja2, record them too.
+            for path in self._referenced_files(template_text):
+                record_input("file", path)
+        template = self._compile(template_text)
         pos = Pos.from_file(full_path, template_text)
         try:
             return self._render_template(pos, template_text, template, params)
@@ -428,7 +478,7 @@ class IncludeRawExpand(IncludeRawBase):
     def _expand_path(self, rel_path_template, pos, params):
         rel_path = self._formatter.format(rel_path_template, **params)
         full_path = self._find_file(rel_path, pos)
-        template = full_path.read_text()
+        template = self._read_file(full_path)
         try:
             return self._formatter.format(template, **params)
         except JenkinsJobsException as x:
@@ -441,7 +491,7 @@ class IncludeRawVerbatim(IncludeRawBase):
     def _expand_path(self, rel_path_template, pos, params):
         rel_path = self._formatter.format(rel_path_template, **params)
         full_path = self._find_file(rel_path, pos)
-        return full_path.read_text()
+        return self._read_file(full_path)
 
 
 class YamlListJoin:
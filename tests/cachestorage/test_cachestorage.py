@@ -18,6 +18,8 @@ import os.path
 import pytest
 
 import jenkins_jobs
+import jenkins_jobs.cache
+import jenkins_jobs.errors
 
 
 # Override fixture - do not use this mock.
@@ -50,3 +52,60 @@ def test_cache_file(mocker):
     mocker.patch("yaml.safe_load")
     mocker.patch("jenkins_jobs.builder.JobCache._lock")
     jenkins_jobs.builder.JobCache("dummy").data = None
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    return tmp_path / "jenkins_jobs"
+
+
+def test_sqlite_roundtrip(cache_dir):
+    cache = jenkins_jobs.cache.JobCache("http://example.com", backend="sqlite")
+    assert cache.cachefilename.endswith(".sqlite")
+    cache.set("job-a", "md5-a")
+    cache.set("job-b", "md5-b")
+    cache.save()
+    cache.set("job-b", "md5-b2")
+    del cache
+
+    cache = jenkins_jobs.cache.JobCache("http://example.com", backend="sqlite")
+    assert cache.data == {"job-a": "md5-a", "job-b": "md5-b2"}
+    assert not cache.has_changed("job-b", "md5-b2")
+
+
+def test_sqlite_flush(cache_dir):
+    cache = jenkins_jobs.cache.JobCache("http://example.com", backend="sqlite")
+    cache.set("job-a", "md5-a")
+    del cache
+
+    cache = jenkins_jobs.cache.JobCache(
+        "http://example.com", flush=True, backend="sqlite"
+    )
+    cache.set("job-b", "md5-b")
+    del cache
+
+    cache = jenkins_jobs.cache.JobCache("http://example.com", backend="sqlite")
+    assert cache.data == {"job-b": "md5-b"}
+
+
+def test_sqlite_migrates_yaml_cache(cache_dir):
+    cache = jenkins_jobs.cache.JobCache("http://example.com")
+    cache.set("job-a", "md5-a")
+    yaml_filename = cache.cachefilename
+    del cache
+
+    cache = jenkins_jobs.cache.JobCache("http://example.com", backend="sqlite")
+    assert cache.data == {"job-a": "md5-a"}
+    cache.set("job-a", "md5-a2")
+    del cache
+
+    # YAML cache is left in place, and imported only once.
+    assert os.path.isfile(yaml_filename)
+    cache = jenkins_jobs.cache.JobCache("http://example.com", backend="sqlite")
+    assert cache.data == {"job-a": "md5-a2"}
+
+
+def test_unknown_backend(cache_dir):
+    with pytest.raises(jenkins_jobs.errors.JenkinsJobsException):
+        jenkins_jobs.cache.JobCache("http://example.com", backend="unknown")
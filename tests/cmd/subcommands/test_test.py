@@ -20,6 +20,7 @@
 
 import filecmp
 import io
+import json
 import difflib
 import os
 import yaml
@@ -470,3 +471,37 @@ def test_recursive_multi_path_with_excludes(
         output_dir,
         MatchesDir(fixtures_dir / "multi-path/output_recursive_with_excludes"),
     )
+
+
+def test_profile(
+    capsys, tmp_path, fixtures_dir, default_config_file, execute_jenkins_jobs
+):
+    """
+    Run test mode with profiling and verify that report is written and
+    summary printed.
+    """
+    report_path = tmp_path / "profile.json"
+    args = [
+        "--conf",
+        default_config_file,
+        "test",
+        str(fixtures_dir / "cmd-001.yaml"),
+        "-o",
+        str(tmp_path / "out"),
+        "--profile",
+        str(report_path),
+    ]
+    execute_jenkins_jobs(args)
+
+    report = json.loads(report_path.read_text())
+    assert report["total"] > 0
+    categories = report["categories"]
+    stages = {item["name"] for item in categories["stage"]}
+    assert {"load", "expand", "amend_job_dicts", "generate_xml"} <= stages
+    assert [item["name"] for item in categories["parse"]] == [
+        str(fixtures_dir / "cmd-001.yaml")
+    ]
+    assert categories["template"][0]["name"] == "job template 'foo-job'"
+    assert categories["serialize"]
+    assert "gen_xml" in categories
+    assert "Total:" in capsys.readouterr().err
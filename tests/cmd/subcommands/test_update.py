@@ -20,8 +20,13 @@
 
 from unittest import mock
 
+import jenkins
 import pytest
 
+import jenkins_jobs.cache
+from jenkins_jobs.errors import JenkinsJobsException
+from jenkins_jobs.xml_config import XmlJobGenerator
+
 
 def test_update_jobs(mocker, fixtures_dir, default_config_file, execute_jenkins_jobs):
     """
@@ -123,6 +128,14 @@ def test_update_jobs_and_delete_old(
     jenkins_get_all_jobs.return_value = [
         {"fullname": name} for name in yaml_jobs + extra_jobs
     ]
+    mocker.patch(
+        "jenkins_jobs.builder.jenkins.Jenkins.get_info",
+        return_value={
+            "jobs": [
+                {"name": job["fullname"]} for job in jenkins_get_all_jobs.return_value
+            ]
+        },
+    )
 
     mocker.patch(
         "jenkins_jobs.builder.JenkinsManager.is_managed_job",
@@ -321,6 +334,9 @@ def test_update_views_and_delete_old(
 ):
     """Test update behaviour with --delete-old option for views."""
     mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_all_jobs")
+    mocker.patch(
+        "jenkins_jobs.builder.jenkins.Jenkins.get_info", return_value={"jobs": []}
+    )
     mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.view_exists")
     jenkins_get_all_views = mocker.patch(
         "jenkins_jobs.builder.jenkins.Jenkins.get_views"
@@ -405,6 +421,14 @@ def test_update_views_and_delete_old_jobs_only(
     jenkins_get_all_jobs.return_value = [
         {"fullname": name} for name in yaml_jobs + extra_managed_jobs + unmanaged_jobs
     ]
+    mocker.patch(
+        "jenkins_jobs.builder.jenkins.Jenkins.get_info",
+        return_value={
+            "jobs": [
+                {"name": job["fullname"]} for job in jenkins_get_all_jobs.return_value
+            ]
+        },
+    )
     jenkins_get_all_views.return_value = [
         {"name": name} for name in yaml_views + extra_managed_views + unmanaged_views
     ]
@@ -437,3 +461,303 @@ def test_update_timeout_not_set():
 def test_update_timeout_set():
     """Validate update timeout behavior when timeout is explicitly configured."""
     pass
+
+
+def test_update_incremental(
+    mocker, monkeypatch, tmp_path, default_config_file, execute_jenkins_jobs
+):
+    """
+    Test --incremental generates only jobs whose sources changed
+    """
+    mocker.patch("jenkins_jobs.builder.JobCache", jenkins_jobs.cache.JobCache)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.job_exists")
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_all_jobs")
+    reconfig_job = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.reconfig_job")
+    generate_xml = mocker.spy(XmlJobGenerator, "generateXML")
+
+    jobs_dir = tmp_path / "jobs"
+    jobs_dir.mkdir()
+    (jobs_dir / "project.yaml").write_text(
+        "- project:\n"
+        "    name: sample\n"
+        "    jobs:\n"
+        "      - 'templated-{num}':\n"
+        "          num: [1, 2]\n"
+    )
+    template_path = jobs_dir / "template.yaml"
+    template_path.write_text(
+        "- job-template:\n"
+        "    name: 'templated-{num}'\n"
+        "    description: original\n"
+    )
+    (jobs_dir / "plain.yaml").write_text("- job:\n" "    name: plain\n")
+    args = ["--conf", default_config_file, "update", "--incremental", str(jobs_dir)]
+
+    def generated_names():
+        jobs = generate_xml.call_args.args[1]
+        return sorted(job.name for job in jobs)
+
+    execute_jenkins_jobs(args)
+    assert generated_names() == ["plain", "templated-1", "templated-2"]
+    assert reconfig_job.call_count == 3
+
+    execute_jenkins_jobs(args)
+    assert generated_names() == []
+    assert reconfig_job.call_count == 3
+
+    template_path.write_text(
+        "- job-template:\n" "    name: 'templated-{num}'\n" "    description: changed\n"
+    )
+    execute_jenkins_jobs(args)
+    assert generated_names() == ["templated-1", "templated-2"]
+    assert reconfig_job.call_count == 5
+
+
+def test_update_incremental_defaults_changed(
+    mocker, monkeypatch, tmp_path, default_config_file, execute_jenkins_jobs
+):
+    """
+    Test --incremental regenerates jobs using changed defaults
+    """
+    mocker.patch("jenkins_jobs.builder.JobCache", jenkins_jobs.cache.JobCache)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.job_exists")
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_all_jobs")
+    reconfig_job = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.reconfig_job")
+    generate_xml = mocker.spy(XmlJobGenerator, "generateXML")
+
+    jobs_dir = tmp_path / "jobs"
+    jobs_dir.mkdir()
+    (jobs_dir / "jobs.yaml").write_text(
+        "- job:\n"
+        "    name: with-defaults\n"
+        "    defaults: custom\n"
+        "- job:\n"
+        "    name: with-global\n"
+    )
+    defaults_path = jobs_dir / "defaults.yaml"
+    global_path = jobs_dir / "global.yaml"
+    defaults_path.write_text(
+        "- defaults:\n" "    name: custom\n" "    description: original\n"
+    )
+    global_path.write_text(
+        "- defaults:\n" "    name: global\n" "    concurrent: false\n"
+    )
+    args = ["--conf", default_config_file, "update", "--incremental", str(jobs_dir)]
+
+    def generated_names():
+        jobs = generate_xml.call_args.args[1]
+        return sorted(job.name for job in jobs)
+
+    execute_jenkins_jobs(args)
+    assert generated_names() == ["with-defaults", "with-global"]
+
+    defaults_path.write_text(
+        "- defaults:\n" "    name: custom\n" "    description: changed\n"
+    )
+    execute_jenkins_jobs(args)
+    assert generated_names() == ["with-defaults"]
+    assert "changed" in reconfig_job.call_args.args[1]
+
+    # Both jobs merge global defaults.
+    global_path.write_text(
+        "- defaults:\n" "    name: global\n" "    concurrent: true\n"
+    )
+    execute_jenkins_jobs(args)
+    assert generated_names() == ["with-defaults", "with-global"]
+
+
+def test_update_jobs_stream(
+    mocker, fixtures_dir, default_config_file, execute_jenkins_jobs
+):
+    """
+    Test update_job is called with --stream
+    """
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.job_exists")
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_all_jobs")
+    reconfig_job = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.reconfig_job")
+
+    path = fixtures_dir / "cmd-002.yaml"
+    args = ["--conf", default_config_file, "update", "--stream", str(path)]
+
+    execute_jenkins_jobs(args)
+
+    reconfig_job.assert_has_calls(
+        [
+            mock.call(job_name, mock.ANY)
+            for job_name in ["bar001", "bar002", "baz001", "bam001"]
+        ],
+        any_order=True,
+    )
+    assert reconfig_job.call_count == 4
+
+
+def test_update_jobs_stream_and_delete_old(
+    mocker, fixtures_dir, default_config_file, execute_jenkins_jobs
+):
+    """
+    Test --stream keeps all generated jobs with --delete-old
+    """
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.job_exists")
+    get_all_jobs = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_all_jobs")
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.reconfig_job")
+    delete_job = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.delete_job")
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_views")
+    mocker.patch(
+        "jenkins_jobs.builder.JenkinsManager.is_managed_job", return_value=True
+    )
+
+    yaml_jobs = ["bar001", "bar002", "baz001", "bam001"]
+    get_all_jobs.return_value = [
+        {"fullname": name} for name in yaml_jobs + ["old_job001"]
+    ]
+    mocker.patch(
+        "jenkins_jobs.builder.jenkins.Jenkins.get_info",
+        return_value={
+            "jobs": [{"name": job["fullname"]} for job in get_all_jobs.return_value]
+        },
+    )
+
+    path = fixtures_dir / "cmd-002.yaml"
+    args = [
+        "--conf",
+        default_config_file,
+        "update",
+        "--stream",
+        "--delete-old",
+        str(path),
+    ]
+
+    execute_jenkins_jobs(args)
+
+    delete_job.assert_called_once_with("old_job001")
+
+
+def test_update_stream_incremental(
+    fixtures_dir, default_config_file, execute_jenkins_jobs
+):
+    """
+    Test --stream can not be combined with --incremental
+    """
+    path = fixtures_dir / "cmd-002.yaml"
+    args = [
+        "--conf",
+        default_config_file,
+        "update",
+        "--stream",
+        "--incremental",
+        str(path),
+    ]
+
+    with pytest.raises(JenkinsJobsException) as excinfo:
+        execute_jenkins_jobs(args)
+    assert "--incremental" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("allow_duplicates", [False, True])
+def test_update_stream_duplicates(
+    mocker, tmp_path, fixtures_dir, execute_jenkins_jobs, allow_duplicates
+):
+    """
+    Test --stream deploys same jobs as plain update from duplicated names,
+    or is refused
+    """
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.job_exists")
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_all_jobs")
+    reconfig_job = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.reconfig_job")
+    config_file = tmp_path / "jenkins_jobs.ini"
+    config_file.write_text(
+        (fixtures_dir / "empty_builder.ini").read_text()
+        + "\n[job_builder]\nallow_duplicates={0}\n".format(allow_duplicates)
+    )
+    path = tmp_path / "jobs.yaml"
+    path.write_text(
+        "- job-template:\n"
+        "    name: '{prefix}-job'\n"
+        "    description: '{desc}'\n"
+        "- project:\n"
+        "    name: first\n"
+        "    prefix: dup\n"
+        "    desc: first\n"
+        "    jobs: ['{prefix}-job']\n"
+        "- project:\n"
+        "    name: last\n"
+        "    prefix: dup\n"
+        "    desc: last\n"
+        "    jobs: ['{prefix}-job']\n"
+    )
+
+    def deploy(*options):
+        reconfig_job.reset_mock()
+        args = ["--conf", str(config_file), "update", *options, str(path)]
+        try:
+            execute_jenkins_jobs(args)
+        except JenkinsJobsException as x:
+            return str(x)
+        return [(c.args[0], "last" in c.args[1]) for c in reconfig_job.call_args_list]
+
+    plain = deploy()
+    stream = deploy("--stream")
+    if allow_duplicates:
+        # Last definition wins.
+        assert plain == [("dup-job", True)]
+        assert "can not be combined with allow_duplicates" in stream
+    else:
+        assert "Previous job definition" in plain
+        assert stream == plain
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_update_sync_cache_from_server(
+    mocker,
+    monkeypatch,
+    tmp_path,
+    fixtures_dir,
+    default_config_file,
+    execute_jenkins_jobs,
+    stream,
+):
+    """
+    Test --sync-cache-from-server updates only jobs which differ on server
+    """
+    mocker.patch("jenkins_jobs.builder.JobCache", jenkins_jobs.cache.JobCache)
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.job_exists")
+    mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_all_jobs")
+    reconfig_job = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.reconfig_job")
+
+    path = fixtures_dir / "cmd-002.yaml"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "first"))
+    execute_jenkins_jobs(["--conf", default_config_file, "update", str(path)])
+    # Jenkins stores configs with its own xml declaration.
+    server_configs = {
+        name: xml.replace(
+            '<?xml version="1.0" encoding="utf-8"?>',
+            "<?xml version='1.1' encoding='UTF-8'?>",
+        )
+        for (name, xml), _ in reconfig_job.call_args_list
+    }
+    server_configs["bar002"] = server_configs["bar002"].replace(
+        "My second job", "Changed on server"
+    )
+    del server_configs["bam001"]
+
+    def get_job_config(name):
+        try:
+            return server_configs[name]
+        except KeyError:
+            raise jenkins.NotFoundException()
+
+    mocker.patch(
+        "jenkins_jobs.builder.jenkins.Jenkins.get_job_config",
+        side_effect=get_job_config,
+    )
+    reconfig_job.reset_mock()
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "second"))
+    args = ["--conf", default_config_file, "update", "--sync-cache-from-server"]
+    if stream:
+        args.append("--stream")
+    execute_jenkins_jobs([*args, str(path)])
+
+    updated = sorted(name for (name, _), _ in reconfig_job.call_args_list)
+    assert updated == ["bam001", "bar002"]
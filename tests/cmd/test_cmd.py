@@ -1,6 +1,9 @@
 import pytest
 
+from jenkins_jobs import entry_points
 from jenkins_jobs.cli import entry
+from jenkins_jobs.cli.parser import SUBCOMMAND_GROUP
+from jenkins_jobs.entry_points import EntryPoint
 
 
 def test_with_empty_args(mocker):
@@ -9,3 +12,34 @@ def test_with_empty_args(mocker):
     """
     with pytest.raises(SystemExit):
         entry.JenkinsJobs([])
+
+
+@pytest.fixture
+def broken_subcommand(mocker):
+    """Add a subcommand whose module can not be imported."""
+    real_iter_entry_points = entry_points.iter_entry_points
+    broken_ep = EntryPoint("broken", "not_installed_module:Broken", SUBCOMMAND_GROUP)
+
+    def iter_entry_points(group, name=None):
+        yield from real_iter_entry_points(group, name)
+        if group == SUBCOMMAND_GROUP and name in (None, "broken"):
+            yield broken_ep
+
+    mocker.patch(
+        "jenkins_jobs.entry_points.iter_entry_points", side_effect=iter_entry_points
+    )
+
+
+def test_only_selected_subcommand_is_imported(
+    broken_subcommand, default_config_file, fixtures_dir
+):
+    args = ["--conf", default_config_file, "test", str(fixtures_dir / "cmd-001.yaml")]
+    jenkins_jobs = entry.JenkinsJobs(args)
+    assert jenkins_jobs.options.command == "test"
+    with pytest.raises(ImportError):
+        entry.JenkinsJobs(["--conf", default_config_file, "broken"])
+
+
+def test_help_imports_all_subcommands(broken_subcommand):
+    with pytest.raises(ImportError):
+        entry.JenkinsJobs(["--help"])
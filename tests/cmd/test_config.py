@@ -5,6 +5,8 @@ import pytest
 
 from jenkins_jobs.cli import entry
 from jenkins_jobs import builder
+from jenkins_jobs.config import JJBConfig
+from jenkins_jobs.errors import JenkinsJobsException
 
 
 global_conf = "/etc/jenkins_jobs/jenkins_jobs.ini"
@@ -189,3 +191,32 @@ def test_filter_modules_set(mocker, fixtures_dir):
 
     jjb_config = jenkins_jobs.jjb_config
     assert jjb_config.yamlparser["filter_modules"] == ["my_filter", "my_other_filter"]
+
+
+def test_pool_size(tmp_path):
+    config_file = tmp_path / "jenkins_jobs.ini"
+    config_file.write_text("[jenkins]\npool_size=3\n")
+    jjb_config = JJBConfig(str(config_file))
+    jjb_config.validate()
+    assert jjb_config.jenkins["pool_size"] == 3
+
+    config_file.write_text("[jenkins]\npool_size=-1\n")
+    with pytest.raises(JenkinsJobsException):
+        JJBConfig(str(config_file))
+
+
+def test_update_retries(tmp_path):
+    config_file = tmp_path / "jenkins_jobs.ini"
+    config_file.write_text("[jenkins]\n")
+    jjb_config = JJBConfig(str(config_file))
+    assert jjb_config.jenkins["update_retries"] == 3
+    assert jjb_config.jenkins["update_retry_backoff"] == 1.0
+
+    config_file.write_text("[jenkins]\nupdate_retries=0\nupdate_retry_backoff=0.5\n")
+    jjb_config = JJBConfig(str(config_file))
+    assert jjb_config.jenkins["update_retries"] == 0
+    assert jjb_config.jenkins["update_retry_backoff"] == 0.5
+
+    config_file.write_text("[jenkins]\nupdate_retries=many\n")
+    with pytest.raises(JenkinsJobsException):
+        JJBConfig(str(config_file))
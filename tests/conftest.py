@@ -1,5 +1,4 @@
 import configparser
-import pkg_resources
 import xml.etree.ElementTree as XML
 from pathlib import Path
 
@@ -9,6 +8,7 @@ import yaml
 from jenkins.plugins import Plugin
 from jenkins_jobs.alphanum import AlphanumSort
 from jenkins_jobs.config import JJBConfig
+from jenkins_jobs.entry_points import EntryPoint
 from jenkins_jobs.loader import Loader
 from jenkins_jobs.modules import project_externaljob
 from jenkins_jobs.modules import project_flow
@@ -53,9 +53,8 @@ def mock_iter_entry_points():
         for line in config["entry_points"][key].split("\n"):
             if "" == line.strip():
                 continue
-            groups[key].append(
-                pkg_resources.EntryPoint.parse(line, dist=pkg_resources.Distribution())
-            )
+            name, value = line.split("=", 1)
+            groups[key].append(EntryPoint(name.strip(), value.strip(), key))
 
     def iter_entry_points(group, name=None):
         return (entry for entry in groups[group] if name is None or name == entry.name)
@@ -79,7 +78,10 @@ def plugins_info(scenario):
 
 @pytest.fixture
 def registry(mocker, mock_iter_entry_points, jjb_config, plugins_info):
-    mocker.patch("pkg_resources.iter_entry_points", side_effect=mock_iter_entry_points)
+    mocker.patch(
+        "jenkins_jobs.entry_points.iter_entry_points",
+        side_effect=mock_iter_entry_points,
+    )
     return ModuleRegistry(jjb_config, plugins_info)
 
 
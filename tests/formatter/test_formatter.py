@@ -4,6 +4,7 @@ from jinja2 import StrictUndefined
 from jenkins_jobs.errors import JenkinsJobsException
 from jenkins_jobs.formatter import (
     CustomFormatter,
+    _compile,
     enum_str_format_required_params,
     enum_str_format_param_defaults,
 )
@@ -214,3 +215,20 @@ def test_undefined_with_default():
     params = {"missing": StrictUndefined(name="missing")}
     result = formatter.format(format, **params)
     assert result == "[default_value]"
+
+
+def test_format_string_parsed_once():
+    formatter = CustomFormatter(allow_empty=False)
+    format = "{a}-{b|dflt}-unique-to-test_format_string_parsed_once"
+    misses = _compile.cache_info().misses
+    assert (
+        formatter.format(format, a=1, b=2)
+        == "1-2-unique-to-test_format_string_parsed_once"
+    )
+    assert (
+        formatter.format(format, a=3)
+        == "3-dflt-unique-to-test_format_string_parsed_once"
+    )
+    assert list(enum_str_format_required_params(format, pos=None)) == ["a", "b"]
+    assert list(enum_str_format_param_defaults(format)) == [("b", "dflt")]
+    assert _compile.cache_info().misses == misses + 1
@@ -14,11 +14,22 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import http.server
+import json
+import logging
+import threading
+import time
 from unittest import mock
+from xml.etree import ElementTree as XML
+from xml.sax.saxutils import escape
 
+import jenkins
 import pytest
+import requests
 
 from jenkins_jobs.config import JJBConfig
+from jenkins_jobs.constants import MAGIC_MANAGE_STRING
+from jenkins_jobs.xml_config import XmlJob
 import jenkins_jobs.builder
 
 
@@ -56,20 +67,63 @@ def test_delete_old_managed_jobs(mocker, jjb_config):
 
     patches = mocker.patch.multiple(
         "jenkins_jobs.builder.JenkinsManager",
-        get_jobs=mock.DEFAULT,
-        is_job=mock.DEFAULT,
+        get_jobs_info=mock.DEFAULT,
         is_managed_job=mock.DEFAULT,
-        delete_job=mock.DEFAULT,
     )
-    patches["get_jobs"].return_value = [
+    delete_job = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.delete_job")
+    patches["get_jobs_info"].return_value = [
         {"fullname": "job1"},
         {"fullname": "job2"},
     ]
     patches["is_managed_job"].side_effect = [True, True]
-    patches["is_job"].side_effect = [True, True]
 
     builder.delete_old_managed_jobs()
-    assert patches["delete_job"].call_count == 2
+    assert delete_job.call_count == 2
+
+
+def test_delete_old_managed_jobs_in_folders(mocker, jjb_config):
+    jjb_config.builder["plugins_info"] = None
+    builder = jenkins_jobs.builder.JenkinsManager(jjb_config)
+    managed = "managed" + MAGIC_MANAGE_STRING
+    depth_limited_jobs = {
+        "jobs": [
+            {"name": "keep", "description": managed},
+            {"name": "unmanaged", "description": None},
+            {
+                "name": "folder",
+                "description": managed,
+                "jobs": [{"name": "old", "description": managed}],
+            },
+            {
+                "name": "deep",
+                "description": "",
+                # Deeper than requested levels.
+                "jobs": [{"_class": "hudson.model.FreeStyleProject"}],
+            },
+        ]
+    }
+    deep_jobs = {
+        "jobs": [
+            {"name": "old", "description": managed},
+            {"name": "other", "description": "other"},
+        ]
+    }
+
+    def get_info(item="", query=None):
+        return deep_jobs if item else depth_limited_jobs
+
+    get_info_mock = mocker.patch(
+        "jenkins_jobs.builder.jenkins.Jenkins.get_info", side_effect=get_info
+    )
+    get_job_config = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.get_job_config")
+    delete_job = mocker.patch("jenkins_jobs.builder.jenkins.Jenkins.delete_job")
+
+    assert builder.delete_old_managed_jobs(keep=["keep"]) == 2
+    # Job in deleted folder is deleted with it.
+    delete_job.assert_has_calls([mock.call("folder"), mock.call("deep/old")])
+    assert delete_job.call_count == 2
+    assert get_info_mock.call_count == 2
+    assert get_job_config.call_count == 0
 
 
 def test_delete_old_managed_views(mocker, jjb_config):
@@ -101,3 +155,222 @@ def test_get_plugins_info_error(mocker, jjb_config, error_string):
     mocker.patch.object(builder.jenkins, "get_plugins", side_effect=exception)
     plugins_info = builder.get_plugins_info()
     assert [_plugins_info["plugin1"]] == plugins_info
+
+
+class _JenkinsStandIn(http.server.BaseHTTPRequestHandler):
+    """Answers crumb and job config requests, recording connections."""
+
+    protocol_version = "HTTP/1.1"  # Keep connections alive.
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections.add(self.client_address)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.paths.append(self.path)
+            self.server.crumbs.append(self.headers.get("Jenkins-Crumb"))
+        time.sleep(self.server.delay)
+        if self.path.startswith("/crumbIssuer/"):
+            body = b'{"crumbRequestField": "Jenkins-Crumb", "crumb": "abc"}'
+        elif "/api/json" in self.path:
+            name = self.path.split("/")[2]
+            body = json.dumps({"name": name}).encode("utf-8")
+        else:
+            body = (
+                "<project><description>{0}</description></project>".format(
+                    escape(MAGIC_MANAGE_STRING)
+                )
+            ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self._send_connection_header()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.paths.append(self.path)
+            overloaded = self.server.n_overloaded > 0
+            if overloaded:
+                self.server.n_overloaded -= 1
+        if overloaded:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self._send_connection_header()
+        self.end_headers()
+
+    def _send_connection_header(self):
+        # Set when client asked to close connection after response.
+        if self.close_connection:
+            self.send_header("Connection", "close")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def jenkins_stand_in():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _JenkinsStandIn)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.paths = []
+    server.crumbs = []
+    server.n_overloaded = 0  # Number of POST requests to answer with 503.
+    server.delay = 0  # Seconds to wait before answering a request.
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_workers_reuse_pooled_connections(monkeypatch, tmp_path, jenkins_stand_in):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setenv("NO_PROXY", "*")
+    n_workers = 12
+    n_jobs = 120
+    config = JJBConfig()
+    config.validate()
+    config.jenkins["url"] = "http://127.0.0.1:{0}/".format(
+        jenkins_stand_in.server_address[1]
+    )
+    config.jenkins["pool_size"] = n_workers
+    # Keep all workers sending requests at once.
+    jenkins_stand_in.delay = 0.01
+
+    def run(builder):
+        jenkins_stand_in.connections.clear()
+        jenkins_stand_in.paths.clear()
+        jenkins_stand_in.crumbs.clear()
+        results = builder.parallel_is_managed_job(
+            n_workers=n_workers,
+            concurrent=[{"job_name": "job-{0}".format(i)} for i in range(n_jobs)],
+        )
+        assert results == [True] * n_jobs
+        return len(jenkins_stand_in.paths) / len(jenkins_stand_in.connections)
+
+    builder = jenkins_jobs.builder.JenkinsManager(config)
+    requests_per_connection = run(builder)
+
+    paths = jenkins_stand_in.paths
+    assert len(paths) == n_jobs + 1
+    # Crumb is fetched once and sent with all other requests.
+    assert len([p for p in paths if p.startswith("/crumbIssuer/")]) == 1
+    assert jenkins_stand_in.crumbs.count("abc") == n_jobs
+    # Each worker keeps using its own connection.
+    assert len(jenkins_stand_in.connections) == n_workers
+    assert requests_per_connection > n_jobs / n_workers
+
+    # Checks above fail for a client opening a connection per request.
+    builder = jenkins_jobs.builder.JenkinsManager(config)
+    builder.jenkins._session.headers["Connection"] = "close"
+    assert run(builder) == 1
+    assert len(jenkins_stand_in.connections) > n_workers
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+@pytest.mark.parametrize(
+    "error,retryable",
+    [
+        (requests.exceptions.ConnectionError("Connection reset by peer"), True),
+        (jenkins.TimeoutException("Error in request: timed out"), True),
+        (_http_error(429), True),
+        (_http_error(503), True),
+        (_http_error(400), False),
+        (jenkins.JenkinsException("Possibly authentication failed [500]"), False),
+    ],
+)
+def test_is_retryable(error, retryable):
+    assert jenkins_jobs.builder.is_retryable(error) == retryable
+
+
+def test_adaptive_update_retries_overloaded_server(
+    monkeypatch, tmp_path, caplog, jenkins_stand_in
+):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setenv("NO_PROXY", "*")
+    caplog.set_level(logging.INFO, logger="jenkins_jobs.builder")
+    config = JJBConfig()
+    config.validate()
+    config.jenkins["url"] = "http://127.0.0.1:{0}/".format(
+        jenkins_stand_in.server_address[1]
+    )
+    config.jenkins["update_retry_backoff"] = 0
+    builder = jenkins_jobs.builder.JenkinsManager(config)
+    names = ["job-{0}".format(i) for i in range(40)]
+    builder._job_list = set(names)
+    jenkins_stand_in.n_overloaded = 10
+
+    jobs, n_updated = builder.update_jobs(
+        [XmlJob(XML.Element("project"), name) for name in names],
+        n_workers=8,
+        adaptive=True,
+    )
+
+    assert n_updated == 40
+    posts = [p for p in jenkins_stand_in.paths if p.endswith("/config.xml")]
+    assert len(posts) == 50
+    assert sorted(set(posts)) == sorted(
+        "/job/{0}/config.xml".format(name) for name in names
+    )
+    reports = [r.getMessage() for r in caplog.records if "per second" in r.message]
+    assert len(reports) == 1
+    assert "Updated 40 jobs" in reports[0]
+    assert "retried 10 requests" in reports[0]
+
+
+def test_update_gives_up_after_retries(monkeypatch, tmp_path, jenkins_stand_in):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setenv("NO_PROXY", "*")
+    config = JJBConfig()
+    config.validate()
+    config.jenkins["url"] = "http://127.0.0.1:{0}/".format(
+        jenkins_stand_in.server_address[1]
+    )
+    config.jenkins["update_retries"] = 2
+    config.jenkins["update_retry_backoff"] = 0
+    builder = jenkins_jobs.builder.JenkinsManager(config)
+    builder._job_list = {"job-0"}
+    jenkins_stand_in.n_overloaded = 5
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        builder.update_job("job-0", "<project/>")
+    assert jenkins_stand_in.n_overloaded == 2
+
+
+def test_pool_grown_to_number_of_workers(monkeypatch, tmp_path, jenkins_stand_in):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setenv("NO_PROXY", "*")
+    n_workers = 12
+    config = JJBConfig()
+    config.validate()
+    config.jenkins["url"] = "http://127.0.0.1:{0}/".format(
+        jenkins_stand_in.server_address[1]
+    )
+    config.jenkins["pool_size"] = 2
+    builder = jenkins_jobs.builder.JenkinsManager(config)
+    names = ["job-{0}".format(i) for i in range(120)]
+    builder._job_list = set(names)
+    # Keep all workers sending requests at once.
+    jenkins_stand_in.delay = 0.02
+
+    builder.update_jobs(
+        [XmlJob(XML.Element("project"), name) for name in names],
+        n_workers=n_workers,
+    )
+
+    assert builder.jenkins.pool_size == n_workers
+    assert 1 <= len(jenkins_stand_in.connections) <= n_workers
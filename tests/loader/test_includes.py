@@ -0,0 +1,91 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import os
+
+from jenkins_jobs.config import JJBConfig
+from jenkins_jobs.includes import IncludeResolver
+from jenkins_jobs.loader import load_files
+from jenkins_jobs.roots import Roots
+
+
+def test_directory_listed_once(mocker, tmp_path):
+    (tmp_path / "a.sh").write_text("a")
+    (tmp_path / "sub").mkdir()
+    scandir_spy = mocker.spy(os, "scandir")
+    resolver = IncludeResolver()
+    dir_list = [tmp_path / "missing", tmp_path]
+
+    assert resolver.find(dir_list, "a.sh") == tmp_path / "a.sh"
+    assert resolver.find(dir_list, "b.sh") is None
+    assert resolver.find(dir_list, "sub") is None
+    assert resolver.find(dir_list, "a.sh") == tmp_path / "a.sh"
+    assert scandir_spy.call_count == 2
+
+
+def test_name_missing_from_listing_is_checked(mocker, tmp_path):
+    (tmp_path / "a.sh").write_text("a")
+
+    def isfile(path):
+        # As on case-insensitive file system.
+        return os.path.basename(path).lower() == "a.sh"
+
+    mocker.patch.object(os.path, "isfile", side_effect=isfile)
+    resolver = IncludeResolver()
+
+    assert resolver.find([tmp_path], "A.sh") == tmp_path / "A.sh"
+    assert resolver.find([tmp_path], "b.sh") is None
+
+
+def test_contents_read_again_when_changed(mocker, tmp_path):
+    path = tmp_path / "a.sh"
+    path.write_text("echo 1\n")
+    open_spy = mocker.spy(io, "open")
+    resolver = IncludeResolver()
+
+    assert resolver.read_text(path) == "echo 1\n"
+    assert resolver.read_text(path) == "echo 1\n"
+    assert open_spy.call_count == 1
+
+    path.write_text("echo 10\n")
+    open_spy.reset_mock()
+    assert resolver.read_text(path) == "echo 10\n"
+    assert open_spy.call_count == 1
+
+
+def test_included_file_read_once_per_run(mocker, tmp_path):
+    (tmp_path / "build.sh").write_text("make {target}\n")
+    (tmp_path / "jobs.yaml").write_text(
+        "- job-template:\n"
+        "    name: 'build-{target}'\n"
+        "    builders:\n"
+        "      - shell: !include-raw-expand: build.sh\n"
+        "- project:\n"
+        "    name: project\n"
+        "    target: [all, check, install, dist]\n"
+        "    jobs:\n"
+        "      - 'build-{target}'\n"
+    )
+    config = JJBConfig()
+    config.validate()
+    roots = Roots(config)
+    load_files(config, roots, [tmp_path])
+    read_spy = mocker.spy(IncludeResolver, "read_text")
+    open_spy = mocker.spy(io, "open")
+
+    jobs = roots.generate_jobs()
+
+    builders = sorted(job.data["builders"][0]["shell"] for job in jobs)
+    assert builders == ["make all\n", "make check\n", "make dist\n", "make install\n"]
+    assert read_spy.call_count == 4
+    assert open_spy.call_count == 1
@@ -19,10 +19,13 @@ from pathlib import Path
 from yaml import safe_dump
 
 import json
+import os
 import pytest
 from yaml.composer import ComposerError
 
+import jenkins_jobs.expander
 from jenkins_jobs.config import JJBConfig
+from jenkins_jobs.expander import Expander
 
 from jenkins_jobs.roots import Roots
 from jenkins_jobs.loader import Loader, load_files
@@ -200,3 +203,264 @@ def test_retain_anchors_enabled_j2_yaml():
     registry.set_macros(roots.macros)
     jobs = roots.generate_jobs()
     assert "docker run ubuntu:latest" == jobs[0].data["builders"][0]["shell"]
+
+
+@pytest.mark.parametrize(
+    "fname",
+    [
+        "include001.yaml",
+        "include-raw-expand-template.yaml",
+        "../../yamlparser/job_fixtures/jinja-string01.yaml",
+        "../../yamlparser/job_fixtures/jinja-yaml01.yaml",
+    ],
+)
+def test_parse_cache(monkeypatch, tmp_path, fname):
+    """
+    Verify that files loaded from parse cache produce same jobs
+    as freshly parsed ones, and that cached files are not parsed again.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    config = JJBConfig()
+    config.yamlparser["parse_cache"] = True
+    config.validate()
+
+    roots = Roots(config)
+    load_files(config, roots, [fixtures_dir / fname])
+    expected = [j.data for j in roots.generate_jobs()]
+    assert list((tmp_path / "jenkins_jobs" / "parsed").iterdir())
+
+    roots = Roots(config)
+    with monkeypatch.context() as m:
+        m.setattr(Loader, "load", lambda *args, **kw: pytest.fail("Parsed again"))
+        load_files(config, roots, [fixtures_dir / fname])
+    assert [j.data for j in roots.generate_jobs()] == expected
+
+
+def test_parse_cache_invalidated(monkeypatch, tmp_path):
+    """
+    Verify that changed file is parsed again.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    config = JJBConfig()
+    config.yamlparser["parse_cache"] = True
+    config.validate()
+
+    path = tmp_path / "jobs.yaml"
+
+    def job_names(text):
+        path.write_text(text)
+        roots = Roots(config)
+        load_files(config, roots, [path])
+        return [j.name for j in roots.generate_jobs()]
+
+    assert job_names("- job:\n    name: job-1\n") == ["job-1"]
+    assert job_names("- job:\n    name: job-2\n") == ["job-2"]
+
+
+def test_parse_workers(monkeypatch):
+    """
+    Verify that files parsed by worker processes produce same jobs,
+    in same order, as files parsed by main process.
+    """
+    path_list = [
+        fixtures_dir / "include001.yaml",
+        fixtures_dir / "include-raw-expand-template.yaml",
+        fixtures_dir / "../../yamlparser/job_fixtures/jinja-string01.yaml",
+        fixtures_dir / "../../yamlparser/job_fixtures/jinja-yaml01.yaml",
+    ]
+    config = JJBConfig()
+    config.validate()
+
+    roots = Roots(config)
+    load_files(config, roots, path_list)
+    expected = [j.data for j in roots.generate_jobs()]
+
+    config.yamlparser["parse_workers"] = 2
+    main_pid = os.getpid()
+    orig_load = Loader.load
+
+    def load(*args, **kw):
+        if os.getpid() == main_pid:
+            pytest.fail("Parsed by main process")
+        return orig_load(*args, **kw)
+
+    roots = Roots(config)
+    with monkeypatch.context() as m:
+        m.setattr(Loader, "load", load)
+        load_files(config, roots, path_list)
+    assert [j.data for j in roots.generate_jobs()] == expected
+
+
+def test_parse_workers_included_file_parsed_once(mocker, tmp_path):
+    """
+    Verify that a file parsed by a worker process is not parsed again by
+    main process when it is also included by another file.
+    """
+    shared_path = tmp_path / "shared.yaml"
+    shared_path.write_text("[]\n")
+    (tmp_path / "jobs.yaml").write_text(
+        "- job:\n"
+        "    name: job-1\n"
+        "    builders: !include: shared.yaml\n"
+        "- job:\n"
+        "    name: job-2\n"
+        "    builders: !include: shared.yaml\n"
+    )
+    config = JJBConfig()
+    config.yamlparser["parse_workers"] = 2
+    config.yamlparser["include_path"] = [str(tmp_path)]
+    config.validate()
+    roots = Roots(config)
+    load_files(config, roots, [tmp_path])
+    load_spy = mocker.spy(Loader, "load")
+
+    jobs = roots.generate_jobs()
+
+    assert [job.data["builders"] for job in jobs] == [[], []]
+    assert load_spy.call_count == 0
+
+
+def test_parse_workers_error(tmp_path):
+    """
+    Verify that parse errors in worker processes are reported as usual.
+    """
+    (tmp_path / "good.yaml").write_text("- job:\n    name: job-1\n")
+    (tmp_path / "bad.yaml").write_text("- job:\n    name: [job-2\n")
+    config = JJBConfig()
+    config.yamlparser["parse_workers"] = 2
+    config.validate()
+
+    with pytest.raises(Exception) as excinfo:
+        load_files(config, Roots(config), [tmp_path])
+    assert "bad.yaml" in str(excinfo.value)
+
+
+def test_required_params_enumerated_once_per_template_instance(mocker, tmp_path):
+    """
+    Verify that parameters are analyzed once, not for each point of axes.
+    """
+    (tmp_path / "jobs.yaml").write_text(
+        "- job-template:\n"
+        "    name: 'job-{x}-{y}'\n"
+        "    description: 'opts: {opts}'\n"
+        "- project:\n"
+        "    name: project\n"
+        "    x: [1, 2, 3, 4, 5]\n"
+        "    y: [a, b, c, d, e]\n"
+        "    opts:\n"
+        "      first: '{x}'\n"
+        "    jobs:\n"
+        "      - 'job-{x}-{y}'\n"
+    )
+    config = JJBConfig()
+    config.validate()
+    roots = Roots(config)
+    load_files(config, roots, [tmp_path])
+    enum_spy = mocker.spy(jenkins_jobs.expander, "enum_required_params")
+
+    jobs = roots.generate_jobs()
+
+    assert len(jobs) == 25
+    assert jobs[0].data["description"].startswith("opts: {'first': 1}")
+    opts_calls = [c for c in enum_spy.call_args_list if isinstance(c.args[0], dict)]
+    assert len(opts_calls) == 1
+
+
+def test_constant_subtrees_are_copied():
+    """
+    Verify that subtrees without parameters are copied, not expanded.
+    """
+    config = JJBConfig()
+    config.validate()
+    loader = Loader.empty(config)
+    data = loader.load(
+        "- job:\n"
+        "    name: 'job-{x}'\n"
+        "    builders:\n"
+        "      - shell: 'echo static'\n"
+        "      - shell: 'echo {x}'\n"
+        "    publishers:\n"
+        "      - archive:\n"
+        "          artifacts: '*.tar.gz'\n"
+    )
+    job = data[0]["job"]
+    assert not job.constant
+    assert not job["builders"].constant
+    assert job["builders"][0].constant
+    assert job["publishers"].constant
+
+    expanded = Expander(config).expand(job, {"x": "1"})
+
+    assert expanded["builders"] == [{"shell": "echo static"}, {"shell": "echo 1"}]
+    assert expanded["publishers"] == job["publishers"]
+    # Modules may modify expanded data, so containers are not shared.
+    assert expanded["publishers"] is not job["publishers"]
+    assert expanded["publishers"][0] is not job["publishers"][0]
+    # Strings are shared.
+    assert expanded["builders"][0]["shell"] is job["builders"][0]["shell"]
+
+
+def test_j2_templates_share_environment(mocker):
+    """
+    Verify that !j2: tags share Jinja2 environment and are compiled on use.
+    """
+    import jenkins_jobs.yaml_objects
+
+    config = JJBConfig()
+    config.validate()
+    compile_spy = mocker.spy(jenkins_jobs.yaml_objects, "_compile_jinja2_template")
+    loader = Loader.empty(config)
+    data = loader.load(
+        "- first: !j2: 'value {{ x }}'\n"
+        "  second: !j2: 'value {{ x }}'\n"
+        "  third: !j2: 'other {{ x }}'\n"
+    )[0]
+    assert compile_spy.call_count == 0
+    assert data["first"]._jinja2_env is data["third"]._jinja2_env
+
+    expander = Expander(config)
+    assert expander.expand(data["first"], {"x": 1}) == "value 1"
+    assert expander.expand(data["second"], {"x": 2}) == "value 2"
+    assert expander.expand(data["third"], {"x": 3}) == "other 3"
+    templates = [call.args[1] for call in compile_spy.call_args_list]
+    assert templates == ["value {{ x }}", "value {{ x }}", "other {{ x }}"]
+    assert compile_spy.spy_return_list[0] is compile_spy.spy_return_list[1]
+
+
+def test_name_filter_skips_expansion(mocker, tmp_path):
+    """
+    Verify that contents are expanded only for jobs with matching names.
+    """
+    (tmp_path / "jobs.yaml").write_text(
+        "- job-template:\n"
+        "    name: '{team}-build-{n}'\n"
+        "    folder: '{team}'\n"
+        "    description: 'build {n} of {team}'\n"
+        "- job:\n"
+        "    name: standalone\n"
+        "- project:\n"
+        "    name: project\n"
+        "    team: [team-x, team-y]\n"
+        "    n: [1, 2, 3]\n"
+        "    jobs:\n"
+        "      - '{team}-build-{n}'\n"
+    )
+    config = JJBConfig()
+    config.validate()
+    roots = Roots(config)
+    load_files(config, roots, [tmp_path])
+    expand_spy = mocker.spy(Expander, "expand")
+
+    jobs = roots.generate_jobs(name_filter=lambda name: name.startswith("team-x/"))
+
+    assert [job.name for job in jobs] == [
+        "team-x/team-x-build-1",
+        "team-x/team-x-build-2",
+        "team-x/team-x-build-3",
+    ]
+    descriptions = [
+        call.args[1]["description"]
+        for call in expand_spy.call_args_list
+        if isinstance(call.args[1], dict) and "description" in call.args[1]
+    ]
+    assert len(descriptions) == 3
@@ -70,3 +70,14 @@ def test_location():
         print("keys for item:", key, pos)
     for key, pos in b.value_pos.items():
         print("values for item:", key, pos)
+
+
+def test_positions_share_source():
+    path = fixtures_dir / "sample_01.yaml"
+    loader = LocLoader(path.read_text(), str(path))
+    data = loader.get_single_data()
+
+    template = data[1]["job_template"]
+    positions = [template.pos, *template.key_pos.values(), *template.value_pos.values()]
+    assert len({id(pos.source) for pos in positions}) == 1
+    assert all(pos.path == str(path) for pos in positions)
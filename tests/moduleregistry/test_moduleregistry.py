@@ -1,11 +1,15 @@
 import sys
 from collections import namedtuple
 from operator import attrgetter
+import xml.etree.ElementTree as XML
 
 import pytest
 
 from jenkins.plugins import Plugin, PluginVersion
+import jenkins_jobs.registry
+from jenkins_jobs import entry_points
 from jenkins_jobs.config import JJBConfig
+from jenkins_jobs.entry_points import EntryPoint
 from jenkins_jobs.registry import ModuleRegistry
 
 
@@ -160,3 +164,100 @@ def test_plugin_version_comparison(registry, scenario):
         f"Unexpectedly found {v1} {scenario.op} {scenario.v2} == False"
         " when comparing versions!"
     )
+
+
+def test_dispatch_resolves_component_once(mocker, config):
+    registry = ModuleRegistry(config)
+    getargspec = mocker.spy(jenkins_jobs.registry, "getargspec")
+    xml_parent = XML.Element("builders")
+    for command in ["true", "false"]:
+        registry.dispatch("builder", xml_parent, {"shell": command})
+    assert [el.find("command").text for el in xml_parent] == ["true", "false"]
+    assert getargspec.call_count == 1
+
+    # Dispatch table is rebuilt when macros are set.
+    registry.set_macros({})
+    registry.dispatch("builder", xml_parent, {"shell": "true"})
+    assert getargspec.call_count == 2
+
+
+def test_dispatch_passes_job_data(config):
+    # 'authorization' property requires job_data, others do not accept it.
+    registry = ModuleRegistry(config)
+    xml_parent = XML.Element("properties")
+    job_data = {"project-type": "freestyle"}
+    for component in [
+        {"authorization": {"anonymous": ["job-read"]}},
+        {"least-load": {"disabled": False}},
+    ]:
+        registry.dispatch("property", xml_parent, component, job_data=job_data)
+    assert [el.tag for el in xml_parent] == [
+        "hudson.security.AuthorizationMatrixProperty",
+        "org.bstick12.jenkinsci.plugins.leastload.LeastLoadDisabledProperty",
+    ]
+
+
+def test_dispatch_imports_entry_points_on_first_use(mocker, config):
+    real_iter_entry_points = entry_points.iter_entry_points
+    lazy_ep = EntryPoint("lazy", "not_installed_module:lazy", "jenkins_jobs.builders")
+
+    def iter_entry_points(group, name=None):
+        yield from real_iter_entry_points(group, name)
+        if group == "jenkins_jobs.builders":
+            yield lazy_ep
+
+    mocker.patch(
+        "jenkins_jobs.entry_points.iter_entry_points", side_effect=iter_entry_points
+    )
+    mocker.patch.dict(ModuleRegistry._entry_points_cache, clear=True)
+    registry = ModuleRegistry(config)
+    xml_parent = XML.Element("builders")
+    registry.dispatch("builder", xml_parent, {"shell": "true"})
+    with pytest.raises(ImportError):
+        registry.dispatch("builder", xml_parent, "lazy")
+
+
+def test_amend_job_dicts_calls_modules_for_their_keys(mocker, config):
+    from jenkins_jobs.modules.zuul import Zuul
+
+    registry = ModuleRegistry(config)
+    amend_spy = mocker.spy(Zuul, "amend_job_dict")
+    JobData = namedtuple("JobData", "data")
+    jobs = [
+        JobData({"name": "zuul-job", "triggers": ["zuul"]}),
+        JobData({"name": "plain-job", "builders": [{"shell": "true"}]}),
+    ]
+
+    registry.amend_job_dicts(jobs)
+
+    assert jobs[0].data["triggers"] == []
+    assert len(jobs[0].data["parameters"]) > 0
+    assert "parameters" not in jobs[1].data
+    # Called again for changed job only, until it is not changed.
+    assert [call.args[1]["name"] for call in amend_spy.call_args_list] == [
+        "zuul-job",
+        "zuul-job",
+    ]
+
+
+def test_modules_are_imported_on_first_use(mocker, config):
+    load = mocker.spy(EntryPoint, "load")
+
+    def loaded_modules():
+        return [
+            call.args[0].name
+            for call in load.call_args_list
+            if call.args[0].group == "jenkins_jobs.modules"
+        ]
+
+    registry = ModuleRegistry(config)
+    assert loaded_modules() == []
+
+    registry.dispatch("builder", XML.Element("builders"), {"shell": "true"})
+    assert "builders" in loaded_modules()
+
+    module_names = {ep.name for ep in registry._module_eps}
+    assert len(registry.modules) == len(module_names)
+    # Each module is imported and instantiated once.
+    assert sorted(loaded_modules()) == sorted(module_names)
+    assert registry.modules == sorted(registry.modules, key=attrgetter("sequence"))
@@ -12,10 +12,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import threading
 import time
 from multiprocessing import cpu_count
 
-from jenkins_jobs.parallel import concurrent
+import pytest
+
+from jenkins_jobs.parallel import AdaptiveLimit, concurrent, concurrent_stream
 
 
 def test_parallel_correct_order():
@@ -64,3 +67,89 @@ def test_use_auto_detect_cores(mocker):
     result = parallel_test(concurrent=[{} for _ in range(10)], n_workers=0)
     assert result == [True for _ in range(10)]
     mock.assert_called_once_with()
+
+
+def test_concurrent_stream_window():
+    lock = threading.Lock()
+    in_flight = []
+    max_in_flight = []
+
+    def items():
+        for num in range(20):
+            with lock:
+                in_flight.append(num)
+                max_in_flight.append(len(in_flight))
+            yield num
+
+    def double(num):
+        time.sleep(0.01)
+        return num * 2
+
+    results = []
+    for num, result in concurrent_stream(double, items(), n_workers=2, window=3):
+        with lock:
+            in_flight.remove(num)
+        results.append((num, result))
+    assert sorted(results) == [(num, num * 2) for num in range(20)]
+    assert max(max_in_flight) <= 3
+
+
+def test_concurrent_stream_exception():
+    def fail(num):
+        if num == 3:
+            raise ValueError("failed on 3")
+        return num
+
+    with pytest.raises(ValueError, match="failed on 3"):
+        list(concurrent_stream(fail, range(10), n_workers=2))
+
+
+def test_adaptive_limit():
+    limit = AdaptiveLimit(max_limit=8)
+    assert limit.limit == 2
+
+    # Until first overload, each completed call raises limit by one.
+    for _ in range(3):
+        limit.release(limit.acquire(), 0.01)
+    assert limit.limit == 5
+
+    # Calls failing together lower limit once.
+    tickets = [limit.acquire() for _ in range(5)]
+    limit.release(tickets[0], 0.01, overloaded=True)
+    limit.release(tickets[1], 0.01, overloaded=True)
+    assert limit.limit == 2
+
+    # Then it is raised by one after as many calls as allowed complete.
+    for ticket in tickets[2:4]:
+        limit.release(ticket, 0.01)
+    assert limit.limit == 3
+    limit.release(tickets[4], 0.01)
+    assert limit.limit == 3
+
+    # Rising latency lowers it too, once per round.
+    for _ in range(3):
+        limit.release(limit.acquire(), 1.0)
+    assert limit.limit == 2
+    assert limit.peak_limit == 5
+
+
+def test_adaptive_limit_bounds_running_calls():
+    limit = AdaptiveLimit(max_limit=4)
+    lock = threading.Lock()
+    running = []
+    max_running = []
+
+    @concurrent
+    def call(num):
+        ticket = limit.acquire()
+        with lock:
+            running.append(num)
+            max_running.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(num)
+        limit.release(ticket, 0.01)
+
+    call(concurrent=[{"num": num} for num in range(40)], n_workers=10)
+    assert max(max_running) <= 4
+    assert limit.limit == 4
@@ -0,0 +1,67 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from types import SimpleNamespace
+
+from jenkins_jobs import profiler
+
+
+def test_measure_when_not_profiling():
+    assert not profiler.is_profiling()
+    with profiler.measure("dispatch", "builder", "shell"):
+        pass
+
+
+def test_measure():
+    with profiler.profiling() as profile:
+        assert profiler.is_profiling()
+        for _ in range(3):
+            with profiler.measure("dispatch", "builder", "shell"):
+                with profiler.measure("dispatch", "builder", "inner-macro"):
+                    pass
+        with profiler.measure("stage", "load"):
+            pass
+    assert not profiler.is_profiling()
+
+    report = profile.report()
+    assert report["total"] > 0
+    dispatch = report["categories"]["dispatch"]
+    assert [item["name"] for item in dispatch] == [
+        "builder shell",
+        "builder inner-macro",
+    ]
+    assert [item["count"] for item in dispatch] == [3, 3]
+    summary = profile.summary(top=1)
+    assert summary[0].startswith("Total:")
+    assert "  ... 1 more" in summary
+
+
+def test_profile_http():
+    requests = []
+
+    def jenkins_request(req, add_crumb=True):
+        requests.append(req)
+        return "response"
+
+    client = SimpleNamespace(jenkins_request=jenkins_request)
+    with profiler.profiling() as profile:
+        profiler.profile_http(client)
+        for name in ["foo", "bar"]:
+            req = SimpleNamespace(
+                method="POST", url=f"http://jenkins/job/{name}/config.xml"
+            )
+            assert client.jenkins_request(req, add_crumb=False) == "response"
+
+    assert len(requests) == 2
+    [item] = profile.report()["categories"]["http"]
+    assert item["name"] == "POST /job/*/config.xml"
+    assert item["count"] == 2
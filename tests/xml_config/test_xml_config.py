@@ -13,12 +13,15 @@
 # under the License.
 
 from pathlib import Path
+from xml.dom import minidom
+import xml.etree.ElementTree as XML
 
 import pytest
 
 from jenkins_jobs.config import JJBConfig
 from jenkins_jobs.errors import JenkinsJobsException
-from jenkins_jobs.xml_config import XmlJobGenerator, XmlViewGenerator
+from jenkins_jobs import xml_config
+from jenkins_jobs.xml_config import XmlJob, XmlJobGenerator, XmlViewGenerator
 from jenkins_jobs.roots import Roots
 from jenkins_jobs.loader import load_files
 
@@ -101,3 +104,76 @@ def test_missing_include_j2_param(parser, registry):
         generator.generateXML(jobs)
     message = "'branches' is undefined"
     assert str(excinfo.value) == message
+
+
+def test_render_workers(parser, registry):
+    roots = parser("render_workers.yaml")
+    jobs = roots.generate_jobs()
+    generator = XmlJobGenerator(registry)
+
+    expected = generator.generateXML(jobs)
+    actual = generator.generateXML(jobs, n_workers=3)
+    assert [job.name for job in expected] == [job.name for job in actual]
+    assert [job.output() for job in expected] == [job.output() for job in actual]
+    assert [job.md5() for job in expected] == [job.md5() for job in actual]
+    assert [job.inputs for job in expected] == [job.inputs for job in actual]
+
+
+def test_render_workers_error_context(parser, registry):
+    roots = parser("failure_formatting_component.yaml")
+    jobs = roots.generate_jobs()
+    generator = XmlJobGenerator(registry)
+
+    with pytest.raises(JenkinsJobsException) as serial_excinfo:
+        generator.generateXML(jobs)
+    with pytest.raises(JenkinsJobsException) as excinfo:
+        generator.generateXML(jobs * 2, n_workers=2)
+    assert excinfo.value.lines == serial_excinfo.value.lines
+
+
+@pytest.mark.parametrize(
+    "xml_str",
+    [
+        "<project/>",
+        "<project><description></description><disabled>false</disabled></project>",
+        '<project><a b="&quot;x&quot; &amp; \'y\' &lt;z&gt;">1 &lt; 2 &amp;&amp; "3" &gt; 2</a></project>',
+        "<project><a>text<b>inner</b>tail<c/>  </a></project>",
+        "<project><a>\u043f\u0440\u0438\u0432\u0435\u0442 \U0001f600</a></project>",
+        "<project><a>  leading and trailing  </a><b>\n\n</b></project>",
+        # Line endings are normalized by XML parser.
+        "<project><a>line\r\nline\rline</a></project>",
+        # Cases handled by minidom fallback.
+        '<project><a b="multi\nline">x</a></project>',
+        '<project xmlns:ns="urn:x"><ns:a>x</ns:a></project>',
+    ],
+)
+def test_output_same_as_minidom(xml_str):
+    if "\r" in xml_str:
+        # Parser would normalize line endings; set text directly.
+        xml = XML.fromstring("<project><a/></project>")
+        xml[0].text = "line\r\nline\rline"
+    else:
+        xml = XML.fromstring(xml_str)
+    expected = minidom.parseString(XML.tostring(xml, encoding="UTF-8")).toprettyxml(
+        indent="  ", encoding="utf-8"
+    )
+    assert XmlJob(xml, "job").output() == expected
+
+
+def test_output_tag_with_attributes():
+    # Some modules put attributes into tag name.
+    xml = XML.Element("project")
+    XML.SubElement(xml, 'a plugin="some-plugin"')
+    expected = minidom.parseString(XML.tostring(xml, encoding="UTF-8")).toprettyxml(
+        indent="  ", encoding="utf-8"
+    )
+    assert XmlJob(xml, "job").output() == expected
+
+
+def test_output_memoized(mocker):
+    pretty_xml = mocker.spy(xml_config, "_pretty_xml")
+    job = XmlJob(XML.fromstring("<project><a>x</a></project>"), "job")
+    job.md5()
+    job.output()
+    job.md5()
+    assert pretty_xml.call_count == 1
@@ -212,3 +212,26 @@ def test_dimensions(axes, params, exclude, expected_dimension_params):
         if is_point_included(LocList(exclude), p)
     ]
     assert dimension_params == expected_dimension_params
+
+
+@pytest.mark.parametrize("axes,params,exclude,expected_dimension_params", cases)
+def test_dimensions_pruned(axes, params, exclude, expected_dimension_params):
+    exclude_list = wrap_with_location(exclude)
+    dimension_params = list(
+        enum_dimensions_params(
+            axes, wrap_with_location(params), defaults={}, exclude_list=exclude_list
+        )
+    )
+    assert dimension_params == expected_dimension_params
+
+
+def test_dimensions_not_pruned_by_expanded_values():
+    # Values with parameters are known only after expansion.
+    params = wrap_with_location({"axis1": ["{other}", "val2"], "axis2": ["a", "b"]})
+    exclude = wrap_with_location([{"axis1": "val1", "axis2": "a"}])
+    dimension_params = list(
+        enum_dimensions_params(
+            ["axis1", "axis2"], params, defaults={}, exclude_list=exclude
+        )
+    )
+    assert len(dimension_params) == 4
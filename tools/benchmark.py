@@ -0,0 +1,506 @@
+#!/usr/bin/env python
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark jenkins-jobs on synthetic job definitions.
+
+Generates a corpus of projects, job templates, macros and included files at
+the requested scale, and times each stage of an update separately, against a
+fake Jenkins server running in this process::
+
+    python tools/benchmark.py --projects 100 --output results.json
+
+Results are written as JSON. Pass a file written by an earlier run as
+``--baseline`` to compare against it; the exit code is 1 if any stage got
+slower than the baseline by more than ``--threshold``::
+
+    python tools/benchmark.py --baseline results.json
+
+The "startup" stage runs ``jenkins-jobs test`` on a single job in a new
+interpreter, as pre-commit hooks do; the exit code is also 1 if it takes
+longer than ``--startup-target``.
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+import xml.etree.ElementTree as XML
+
+from jenkins_jobs.builder import JenkinsManager
+from jenkins_jobs.config import JJBConfig
+from jenkins_jobs.loader import load_files
+from jenkins_jobs.registry import ModuleRegistry
+from jenkins_jobs.roots import Roots
+from jenkins_jobs.version import version_info
+from jenkins_jobs.xml_config import XmlJobGenerator
+
+RESULTS_FORMAT = 1
+
+# Number of component dispatches timed by the "dispatch" stage.
+DISPATCH_CALLS = 10000
+
+# Seconds a "jenkins-jobs test" run of a single job should take at most.
+STARTUP_TARGET = 0.5
+
+STAGES = [
+    "startup",
+    "load_files",
+    "generate_jobs",
+    "amend_job_dicts",
+    "generate_xml",
+    "dispatch",
+    "output_md5",
+    "update_jobs",
+    "update_jobs_unchanged",
+]
+
+CORPUS_PARAMS = [
+    # name, default, help
+    ("projects", 20, "number of projects"),
+    ("templates", 5, "number of job templates, each used by all projects"),
+    ("axes", 2, "number of dimension axes of each project"),
+    ("axis_values", 3, "number of values of each axis"),
+    ("macros", 10, "number of builder macros"),
+    ("includes", 5, "number of included script files"),
+    ("j2", 2, "number of job templates with a !j2: description"),
+]
+
+
+def make_corpus(path, projects, templates, axes, axis_values, macros, includes, j2):
+    """Write synthetic job definitions into directory ``path``.
+
+    Each project expands every template over all combinations of its axes,
+    so ``projects * templates * axis_values ** axes`` jobs are defined.
+    Returns the number of jobs.
+    """
+    os.makedirs(os.path.join(path, "includes"), exist_ok=True)
+    axis_names = ["axis{0}".format(i) for i in range(axes)]
+
+    for i in range(includes):
+        filename = os.path.join(path, "includes", "script-{0}.sh".format(i))
+        with io.open(filename, "w", encoding="utf-8") as f:
+            f.write("#!/bin/bash\n")
+            f.write("echo 'script {0} for {{name}}'\n".format(i))
+            for axis in axis_names:
+                f.write("echo '{0}={{{0}}}'\n".format(axis))
+            f.write("make -j{{jobs}} test-{0}\n".format(i))
+
+    lines = [
+        "- defaults:",
+        "    name: global",
+        "    description: 'Generated by the benchmark.'",
+        "    jobs: 4",
+        "    properties:",
+        "      - build-discarder:",
+        "          days-to-keep: 30",
+        "          num-to-keep: 50",
+    ]
+    for i in range(macros):
+        lines += [
+            "- builder:",
+            "    name: macro-{0}".format(i),
+            "    builders:",
+            "      - shell: 'echo macro {0} {{param}}'".format(i),
+            "      - shell: |",
+            "          export PARAM={param}",
+            '          ./run-{0}.sh "$PARAM"'.format(i),
+        ]
+    _write_lines(os.path.join(path, "macros.yaml"), lines)
+
+    name_format = "-".join(["{name}"] + ["{%s}" % axis for axis in axis_names])
+    lines = []
+    for t in range(templates):
+        lines += [
+            "- job-template:",
+            "    name: '{0}-tmpl{1}'".format(name_format, t),
+            "    node: 'builder-{0}'".format(t % 3),
+        ]
+        if t < j2:
+            lines.append(
+                "    description: !j2: 'Job {{ name }}"
+                "{% for i in range(3) %} step{{ i }}{% endfor %}'"
+            )
+        lines += ["    parameters:"]
+        for axis in axis_names:
+            lines += [
+                "      - string:",
+                "          name: {0}".format(axis.upper()),
+                "          default: '{%s}'" % axis,
+            ]
+        lines += ["    builders:"]
+        for k in range(min(macros, 3)):
+            lines += [
+                "      - macro-{0}:".format((t + k) % macros),
+                "          param: '{%s}'" % (axis_names[k % axes] if axes else "name"),
+            ]
+        if includes:
+            lines.append(
+                "      - shell: !include-raw-expand: includes/script-{0}.sh".format(
+                    t % includes
+                )
+            )
+        lines += [
+            "    publishers:",
+            "      - archive:",
+            "          artifacts: 'logs/**'",
+            "      - email:",
+            "          recipients: '{name}@example.com'",
+        ]
+    _write_lines(os.path.join(path, "templates.yaml"), lines)
+
+    values = ["v{0}".format(v) for v in range(axis_values)]
+    per_file = 50
+    for start in range(0, projects, per_file):
+        lines = []
+        for p in range(start, min(start + per_file, projects)):
+            lines += ["- project:", "    name: project-{0}".format(p)]
+            for axis in axis_names:
+                lines.append("    {0}: [{1}]".format(axis, ", ".join(values)))
+            lines.append("    jobs:")
+            for t in range(templates):
+                lines.append("      - '{0}-tmpl{1}'".format(name_format, t))
+        filename = "projects-{0:04d}.yaml".format(start // per_file)
+        _write_lines(os.path.join(path, filename), lines)
+
+    return projects * templates * axis_values**axes
+
+
+def _write_lines(filename, lines):
+    with io.open(filename, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+class FakeJenkinsHandler(BaseHTTPRequestHandler):
+    """Serve the part of Jenkins API used by update, keeping jobs in memory."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, body=b"", content_type="application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_name(self, path):
+        # /job/<name>/api/json or /job/<name>/config.xml
+        parts = path.strip("/").split("/")
+        if len(parts) >= 3 and parts[0] == "job":
+            return unquote(parts[1]), "/".join(parts[2:])
+        return None, None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        jobs = self.server.jobs
+        if url.path == "/api/json":
+            body = {
+                "jobs": [{"name": name, "url": "", "color": "blue"} for name in jobs]
+            }
+            return self._send(200, json.dumps(body).encode("utf-8"))
+        name, rest = self._job_name(url.path)
+        if name in jobs and rest == "api/json":
+            return self._send(200, json.dumps({"name": name}).encode("utf-8"))
+        if name in jobs and rest == "config.xml":
+            return self._send(200, jobs[name], "application/xml")
+        self._send(404)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        jobs = self.server.jobs
+        if url.path == "/createItem":
+            name = parse_qs(url.query)["name"][0]
+            if name in jobs:
+                return self._send(400)
+            jobs[name] = body
+            return self._send(200)
+        name, rest = self._job_name(url.path)
+        if name in jobs and rest == "config.xml":
+            jobs[name] = body
+            return self._send(200)
+        self._send(404)
+
+
+@contextmanager
+def fake_jenkins():
+    """Run a fake Jenkins server in a thread, yielding its URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeJenkinsHandler)
+    server.daemon_threads = True
+    server.jobs = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{0}/".format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class _Timer(object):
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.times[name] = time.perf_counter() - start
+
+
+def run_once(corpus_dir, work_dir, update_workers=1):
+    """Run all stages once, returning dict of stage name to seconds."""
+    timer = _Timer()
+    with fake_jenkins() as url:
+        config_filename = os.path.join(work_dir, "jenkins_jobs.ini")
+        with io.open(config_filename, "w", encoding="utf-8") as f:
+            f.write("[jenkins]\nurl={0}\nquery_plugins_info=False\n".format(url))
+        jjb_config = JJBConfig(config_filename)
+        jjb_config.validate()
+
+        with timer.stage("startup"):
+            run_test_command(config_filename, work_dir)
+        with timer.stage("load_files"):
+            roots = Roots(jjb_config)
+            load_files(jjb_config, roots, [Path(corpus_dir)])
+
+        builder = JenkinsManager(jjb_config)
+        registry = ModuleRegistry(jjb_config, builder.plugins_list)
+        registry.set_macros(roots.macros)
+
+        with timer.stage("generate_jobs"):
+            jobs = roots.generate_jobs()
+        with timer.stage("amend_job_dicts"):
+            registry.amend_job_dicts(jobs)
+        with timer.stage("generate_xml"):
+            xml_jobs = XmlJobGenerator(registry).generateXML(jobs)
+        with timer.stage("dispatch"):
+            dispatch_components(registry, DISPATCH_CALLS)
+        with timer.stage("output_md5"):
+            for xml_job in xml_jobs:
+                xml_job.output()
+                xml_job.md5()
+        with timer.stage("update_jobs"):
+            builder.update_jobs(xml_jobs, n_workers=update_workers)
+        with timer.stage("update_jobs_unchanged"):
+            builder.update_jobs(xml_jobs, n_workers=update_workers)
+        # Release cache lock before the next run.
+        del builder
+    return timer.times, len(xml_jobs)
+
+
+def run_test_command(config_filename, work_dir):
+    """Run 'jenkins-jobs test' on a single job, in a new interpreter."""
+    job_filename = os.path.join(work_dir, "startup.yaml")
+    _write_lines(
+        job_filename,
+        [
+            "- job:",
+            "    name: startup",
+            "    builders:",
+            "      - shell: 'true'",
+        ],
+    )
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "jenkins_jobs",
+            "--conf",
+            config_filename,
+            "test",
+            job_filename,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def dispatch_components(registry, calls):
+    """Dispatch trivial builders, to measure overhead of dispatch itself."""
+    components = [{"shell": "true"}]
+    if "macro-0" in registry.macros.get("builder", {}):
+        components.append({"macro-0": {"param": "value"}})
+    for i in range(calls):
+        if i % 1000 == 0:
+            xml_parent = XML.Element("builders")
+        registry.dispatch(
+            "builder", xml_parent, components[i % len(components)], job_data={}
+        )
+
+
+def summarize(runs):
+    stages = {}
+    for name in STAGES:
+        times = [run[name] for run in runs if name in run]
+        if not times:
+            continue
+        stages[name] = {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "runs": times,
+        }
+    return stages
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Compare median stage times against baseline.
+
+    Returns list of report lines and list of regressed stage names. A stage
+    regresses if it is slower by more than ``threshold`` (a fraction) and by
+    more than ``min_delta`` seconds, which filters out noise of short stages.
+    """
+    lines = ["{0:<24}{1:>12}{2:>12}{3:>9}".format("stage", "baseline", "now", "change")]
+    regressions = []
+    for name, stage in results["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base is None:
+            lines.append("{0:<24}{1:>12}{2:>12.4f}".format(name, "-", stage["median"]))
+            continue
+        old, new = base["median"], stage["median"]
+        change = (new - old) / old if old else 0.0
+        mark = ""
+        if change > threshold and new - old > min_delta:
+            regressions.append(name)
+            mark = "  REGRESSION"
+        lines.append(
+            "{0:<24}{1:>12.4f}{2:>12.4f}{3:>+8.1%}{4}".format(
+                name, old, new, change, mark
+            )
+        )
+    if baseline.get("corpus") != results["corpus"]:
+        lines.append("warning: baseline was measured on a different corpus")
+    return lines, regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+    )
+    for name, default, help in CORPUS_PARAMS:
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=int,
+            default=default,
+            help="{0} (default: {1})".format(help, default),
+        )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="number of runs (default: 3)"
+    )
+    parser.add_argument(
+        "--update-workers",
+        type=int,
+        default=1,
+        help="number of threads updating jobs, 0 for one per CPU (default: 1)",
+    )
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="compare against JSON results file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed slowdown against baseline, as a fraction (default: 0.1)",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.01,
+        help="ignore slowdowns shorter than this, in seconds (default: 0.01)",
+    )
+    parser.add_argument(
+        "--startup-target",
+        type=float,
+        default=STARTUP_TARGET,
+        help="maximum time of startup stage in seconds, 0 to not check"
+        " (default: {0})".format(STARTUP_TARGET),
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.repeat < 1:
+        print("--repeat must be at least 1", file=sys.stderr)
+        return 2
+    logging.basicConfig(level=logging.WARNING)
+    corpus = {name: getattr(args, name) for name, _, _ in CORPUS_PARAMS}
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="jjb-benchmark-") as tmp_dir:
+        corpus_dir = os.path.join(tmp_dir, "corpus")
+        make_corpus(corpus_dir, **corpus)
+        for i in range(args.repeat):
+            work_dir = os.path.join(tmp_dir, "run-{0}".format(i))
+            os.makedirs(work_dir)
+            # Start with empty job cache, away from the real one.
+            os.environ["XDG_CACHE_HOME"] = os.path.join(work_dir, "cache")
+            times, job_count = run_once(corpus_dir, work_dir, args.update_workers)
+            runs.append(times)
+
+    results = {
+        "format": RESULTS_FORMAT,
+        "jjb_version": version_info.version_string(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": corpus,
+        "jobs": job_count,
+        "stages": summarize(runs),
+    }
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    print("{0} jobs, {1} runs".format(job_count, args.repeat))
+    status = 0
+    if not args.baseline:
+        for name, stage in results["stages"].items():
+            print("{0:<24}{1:>12.4f}".format(name, stage["median"]))
+    else:
+        with io.open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.threshold, args.min_delta)
+        print("\n".join(lines))
+        if regressions:
+            print("Regressed: {0}".format(", ".join(regressions)))
+            status = 1
+    startup = results["stages"]["startup"]["median"]
+    if args.startup_target and startup > args.startup_target:
+        print(
+            "Startup took {0:.3f}s, target is {1:.3f}s".format(
+                startup, args.startup_target
+            )
+        )
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())